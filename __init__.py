@@ -1 +1,4 @@
 from .features import *
+from .feature_writer import *
+from .feature_registry import *
+from .feature_result import *
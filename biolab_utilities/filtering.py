@@ -11,7 +11,10 @@ from scipy.signal import butter, filtfilt
 from . import putemg_utilities
 
 
-__all__ = ["apply_filter"]
+__all__ = ["apply_filter", "add_filter_observer"]
+
+
+_filter_observers = []
 
 
 harmonic_x = lambda x, t: x[0] * np.sin(2 * np.pi * x[2] * t) + x[1] * (np.cos(2 * np.pi * x[2] * t))
@@ -82,12 +85,23 @@ def pre_process(signal, window_t=10, freq=5124.07211903, low_pass=20, high_pass=
     return signal
 
 
+def add_filter_observer(observer):
+    """
+    Registers function called after each channel processed by apply_filter, eg. to collect metrics
+    :param observer: function - called with channel name, processing time in seconds and number of samples
+    """
+    _filter_observers.append(observer)
+
+
 def apply_filter(df: pd.DataFrame):
     start = time.time()
     columns = list(filter(lambda k: 'EMG' in k, df.columns))
     print('Processing channel: ', end='', flush=True)
     for channel_name in columns:
         print(' ' + channel_name, end='', flush=True)
+        channel_start = time.time()
         df[channel_name] = pre_process(df[channel_name])
+        for observer in _filter_observers:
+            observer(channel_name, time.time() - channel_start, len(df))
     print('', flush=True)
     print("Elapsed time: {:.2f}s".format(time.time() - start))
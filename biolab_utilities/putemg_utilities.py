@@ -22,7 +22,7 @@ from sklearn.exceptions import DataConversionWarning
 warnings.filterwarnings(action='ignore', category=DataConversionWarning)
 warnings.filterwarnings(action='ignore', category=UserWarning, message='Variables are collinear')
 
-__all__ = ["convert_types_in_dict", "moving_window_stride", "window_trapezoidal",
+__all__ = ["convert_types_in_dict", "moving_window_stride", "window_chunks", "window_trapezoidal",
            "Record", "split", "record_filter", "filter_transitions", "filter_smart", "filter_recognition",
            "vgg_filter",
            "data_per_id", "data_per_id_and_date", "all_data_per_id", "prepare_data", "prepare_force_data",
@@ -62,6 +62,26 @@ def moving_window_stride(array, window, step):
     return strided, index
 
 
+def window_chunks(length, window, step, chunk_windows, lookback=0):
+    """
+    Splits moving window calculation over array of given length into chunks of consecutive windows. Each chunk is
+    extended with up to lookback preceding windows, for calculations depending on previous windows
+    :param length: int - input array length
+    :param window: int - window size
+    :param step: int - step lenght
+    :param chunk_windows: int - maximum number of windows in chunk, excluding lookback windows
+    :param lookback: int - number of preceding windows added to each chunk
+    :return: List[Tuple[int, int, int]] - list of chunks as (first sample, last sample + 1, lookback windows count)
+    """
+    win_count = math.floor((length - window + step) / step)
+    chunks = []
+    for first in range(0, win_count, chunk_windows):
+        last = min(first + chunk_windows, win_count)
+        extra = min(lookback, first)
+        chunks.append(((first - extra) * step, (last - 1) * step + window, extra))
+    return chunks
+
+
 def window_trapezoidal(size, slope):
     """
     Return trapezoidal window of length size, with each slope occupying slope*100% of window
@@ -0,0 +1,296 @@
+import os
+import warnings
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from . import biolab_utilities
+from . import kernels
+from .feature_registry import get_feature, registered_features
+from .reference import reference_kernel
+
+__all__ = ["DEFAULT_TOLERANCE", "TOLERANCES", "DEFAULT_WINDOWINGS", "EXECUTORS", "feature_tolerance",
+           "feature_parameters", "differential_signals", "reference_output", "compare_outputs", "run_differential",
+           "summarize_differential", "check_differential"]
+
+
+# Differential testing of feature implementations against frozen reference implementations (see reference): every
+# registered feature is calculated by each of its backends (implementation variant with kernel backend, or executor
+# splitting windows into chunks or batches) on random and edge-case signals, output is compared with reference
+# output. Value passes if abs(actual - expected) <= atol + rtol * abs(expected), missing values (NaN) and infinities
+# have to be equal.
+
+# (atol, rtol) used for features without entry in TOLERANCES
+DEFAULT_TOLERANCE = (1e-9, 1e-9)
+
+# Per-feature tolerances, (atol, rtol), feature names are lower case
+TOLERANCES: Dict[str, tuple] = {
+    # entropies compare distances of samples with r, compiled kernels may round distances differently
+    'apen': (1e-9, 1e-7),
+    'sampleen': (1e-9, 1e-7),
+    # spectral features are calculated from periodogram with other FFT and normalisation than SciPy one
+    'mnf': (1e-9, 1e-8),
+    'mnp': (1e-9, 1e-8),
+    'ttp': (1e-9, 1e-8),
+    'sm': (1e-9, 1e-8),
+    'fr': (1e-9, 1e-8),
+    'vcf': (1e-9, 1e-8),
+    'psr': (1e-9, 1e-8),
+    'snr': (1e-9, 1e-8),
+    'dpr': (1e-9, 1e-8),
+    'ohm': (1e-9, 1e-8),
+    'smr': (1e-9, 1e-8),
+    # box counting slopes are fitted to logarithms of counts
+    'bc': (1e-9, 1e-7),
+    'psdfd': (1e-9, 1e-7),
+}
+
+# (window, step) configurations, including tiny windows
+DEFAULT_WINDOWINGS = [(256, 128), (100, 37), (16, 5)]
+
+# Executors calculating windows of the same feature function in parts, see _executor_output
+EXECUTORS = ['chunks', 'batch']
+
+_parameters = None
+
+
+def feature_tolerance(name: str):
+    """
+    Returns tolerance of given feature output
+    :param name: string - feature name, case insensitive
+    :return: atol: float - absolute tolerance, rtol: float - relative tolerance
+    """
+    return TOLERANCES.get(name.lower(), DEFAULT_TOLERANCE)
+
+
+def feature_parameters(feature_info) -> List[Dict]:
+    """
+    Returns parameter sets feature is tested with: parameters from all_features.xml, and additionally list of
+    thresholds for features accepting them
+    :param feature_info: FeatureInfo - registered feature
+    :return: List[Dict] - feature parameters
+    """
+    global _parameters
+    if _parameters is None:
+        xml_root = ET.parse(os.path.join(os.path.dirname(__file__), 'all_features.xml')).getroot()
+        _parameters = {}
+        for xml_entry in xml_root.iter('feature'):
+            attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+            _parameters[attrib.pop('name').lower()] = attrib
+
+    params = _parameters.get(feature_info.name.lower(), {})
+    parameter_sets = [params]
+    if np.ndim(params.get('threshold')) == 0 and 'threshold' in params:
+        threshold = params['threshold']
+        parameter_sets.append(dict(params, threshold=[0, threshold, 2 * threshold]))
+    return parameter_sets
+
+
+def differential_signals(length: int = 1000, seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Returns test signals: random, integer valued (ties in thresholds and sorting), constant, zeros (eg. LOG of zero),
+    random with missing values, and random with constant segments (windows of constant and mixed signal)
+    :param length: int - signal length
+    :param seed: int - random seed
+    :return: Dict[str, numpy.ndarray] - signals by name
+    """
+    random_state = np.random.RandomState(seed)
+    signals = {
+        'random': random_state.randn(length) * 100,
+        'integer': np.round(random_state.randn(length) * 3),
+        'constant': np.full(length, 3.0),
+        'zeros': np.zeros(length),
+    }
+
+    nan = random_state.randn(length) * 100
+    nan[random_state.choice(length, max(length // 200, 1), replace=False)] = np.nan
+    signals['nan'] = nan
+
+    segments = random_state.randn(length) * 100
+    segment = max(length // 8, 1)
+    for start in range(0, length, 2 * segment):
+        segments[start:start + segment] = segments[start]
+    signals['segments'] = segments
+    return signals
+
+
+def _call(func, *args, **kwargs):
+    """Returns output of func and None, or None and error message if func raised exception"""
+    try:
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            warnings.simplefilter('ignore')
+            return func(*args, **kwargs), None
+    except Exception as e:
+        return None, type(e).__name__ + ': ' + str(e)
+
+
+def reference_output(feature_info, values: np.ndarray, window, step, **params):
+    """
+    Calculates reference output of given feature, list of thresholds is calculated threshold by threshold, with
+    column for each threshold
+    :return: data: numpy.ndarray - feature values, windows: numpy.ndarray - window end positions
+    """
+    kernel = reference_kernel(feature_info.name, feature_info.kind)
+    if kernel is None:
+        raise ValueError(feature_info.name + ' has no reference implementation')
+    if np.ndim(params.get('threshold', 0)) == 0:
+        return kernel(values, window, step, **params)
+
+    outputs = [kernel(values, window, step, **dict(params, threshold=t)) for t in params['threshold']]
+    return np.column_stack([data for data, _ in outputs]), outputs[0][1]
+
+
+def _executor_output(feature_info, executor, values: np.ndarray, window, step, **params):
+    """Calculates given feature with executor splitting windows into parts, see EXECUTORS"""
+    from . import features
+
+    if executor == 'chunks':
+        feature = features.calculate_in_chunks(feature_info, pd.Series(values), window, step, chunk_windows=3,
+                                               **params)
+        return feature.values, feature.index.values
+    elif executor == 'batch':  # tested record follows other record in the batch
+        column = 'EMG_1' if feature_info.kind == 'emg' else 'FORCE_1'
+        records = [pd.DataFrame({column: values[::-1]}), pd.DataFrame({column: values})]
+        result = features._calculate_feature_batch(records, feature_info, r"(EMG|FORCE)_\d+", 'F_', None, window,
+                                                   step, **params)[1][0]
+        data = result.values[:, 0] if result.values.shape[1] == 1 else result.values
+        return data, result.windows
+    else:
+        raise ValueError(executor + ' is not a valid executor')
+
+
+def compare_outputs(expected, actual, atol: float, rtol: float) -> Dict:
+    """
+    Compares feature output with reference output
+    :param expected: (numpy.ndarray, numpy.ndarray) - reference feature values and window end positions
+    :param actual: (numpy.ndarray, numpy.ndarray) - tested feature values and window end positions
+    :param atol: float - absolute tolerance
+    :param rtol: float - relative tolerance
+    :return: Dict - max_abs_error, max_rel_error (over values finite in both outputs), passed and error describing
+    mismatch other than value error
+    """
+    expected_data = np.asarray(expected[0], dtype=np.float64)
+    actual_data = np.asarray(actual[0], dtype=np.float64)
+    comparison = {'max_abs_error': np.nan, 'max_rel_error': np.nan, 'passed': False, 'error': None}
+    if not np.array_equal(np.asarray(expected[1]), np.asarray(actual[1])):
+        comparison['error'] = 'windows differ'
+        return comparison
+    if expected_data.shape != actual_data.shape:
+        comparison['error'] = 'shape {} differs from {}'.format(actual_data.shape, expected_data.shape)
+        return comparison
+
+    finite = np.isfinite(expected_data) & np.isfinite(actual_data)
+    abs_error = np.abs(actual_data[finite] - expected_data[finite])
+    reference = np.abs(expected_data[finite])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel_error = np.where(abs_error > 0, abs_error / reference, 0.0)
+    if abs_error.size:
+        comparison['max_abs_error'] = np.max(abs_error)
+        comparison['max_rel_error'] = np.max(rel_error)
+
+    if not np.array_equal(np.isnan(expected_data), np.isnan(actual_data)):
+        comparison['error'] = 'missing values differ'
+    elif not np.array_equal(expected_data[np.isinf(expected_data)], actual_data[np.isinf(expected_data)]) or \
+            np.sum(np.isinf(expected_data)) != np.sum(np.isinf(actual_data)):
+        comparison['error'] = 'infinite values differ'
+    else:
+        comparison['passed'] = bool(np.all(abs_error <= atol + rtol * reference))
+    return comparison
+
+
+def _backends(feature_info, kernel_backends, executors):
+    """Yields backend label and function calculating feature of numpy.ndarray"""
+    for variant, func in feature_info.variants.items():
+        kernel = getattr(func, 'kernel', None)
+        if kernel is None:  # third-party feature function
+            kernel = (lambda f: lambda values, window, step, **params: _series_output(
+                f(pd.Series(values), window=window, step=step, **params)))(func)
+        for backend in kernel_backends:
+            yield variant + '/' + backend, backend, kernel
+    for executor in executors:
+        yield executor, kernels.get_backend(), (lambda e: lambda values, window, step, **params: _executor_output(
+            feature_info, e, values, window, step, **params))(executor)
+
+
+def _series_output(feature):
+    return feature.values, feature.index.values
+
+
+def run_differential(names: List[str] = None, kind: str = 'emg', signals: Dict[str, np.ndarray] = None,
+                     windowings=None, kernel_backends: List[str] = None, executors: List[str] = None) -> pd.DataFrame:
+    """
+    Runs differential test of features against their reference implementations
+    :param names: List[str] - feature names, all registered features with reference implementation if None
+    :param kind: string - 'emg' or 'force'
+    :param signals: Dict[str, numpy.ndarray] - test signals by name, see differential_signals
+    :param windowings: List[(int, int)] - (window, step) configurations, DEFAULT_WINDOWINGS if None
+    :param kernel_backends: List[str] - kernel backends, all available backends if None, see kernels
+    :param executors: List[str] - executors, EXECUTORS if None
+    :return: pandas.DataFrame - row for each feature, parameter set, backend, signal and windowing, with
+    max_abs_error, max_rel_error, atol, rtol, passed and error columns
+    """
+    if names is None:
+        feature_infos = [f for f in registered_features(kind) if reference_kernel(f.name, kind) is not None]
+    else:
+        feature_infos = [get_feature(name, kind) for name in names]
+    signals = signals if signals is not None else differential_signals()
+    windowings = windowings if windowings is not None else DEFAULT_WINDOWINGS
+    kernel_backends = kernel_backends if kernel_backends is not None else kernels.available_backends()
+    executors = executors if executors is not None else EXECUTORS
+
+    rows = []
+    previous_backend = kernels.get_backend()
+    try:
+        for feature_info in feature_infos:
+            atol, rtol = feature_tolerance(feature_info.name)
+            for params in feature_parameters(feature_info):
+                for signal_name, values in signals.items():
+                    for window, step in windowings:
+                        expected, expected_error = _call(reference_output, feature_info, values, window, step,
+                                                         **params)
+                        for backend_label, backend, func in _backends(feature_info, kernel_backends, executors):
+                            kernels.set_backend(backend)
+                            actual, actual_error = _call(func, values, window, step, **params)
+                            row = {'feature': feature_info.name, 'parameters': str(params), 'backend': backend_label,
+                                   'signal': signal_name, 'window': window, 'step': step, 'atol': atol, 'rtol': rtol}
+                            if expected_error is not None or actual_error is not None:
+                                # implementations have to fail on the same inputs
+                                row.update(max_abs_error=np.nan, max_rel_error=np.nan,
+                                           passed=expected_error is not None and actual_error is not None,
+                                           error=actual_error or 'reference ' + expected_error)
+                            else:
+                                row.update(compare_outputs(expected, actual, atol, rtol))
+                            rows.append(row)
+    finally:
+        kernels.set_backend(previous_backend)
+
+    return pd.DataFrame(rows, columns=['feature', 'parameters', 'backend', 'signal', 'window', 'step',
+                                       'max_abs_error', 'max_rel_error', 'atol', 'rtol', 'passed', 'error'])
+
+
+def summarize_differential(report: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarizes report of run_differential
+    :param report: pandas.DataFrame - report of run_differential
+    :return: pandas.DataFrame - row for each feature with maximum errors, tolerances, number of failed comparisons and
+    passed flag
+    """
+    report = report.assign(failed=~report['passed'].astype(bool))
+    return report.groupby('feature', sort=False).agg(
+        max_abs_error=('max_abs_error', 'max'), max_rel_error=('max_rel_error', 'max'), atol=('atol', 'first'),
+        rtol=('rtol', 'first'), failed=('failed', 'sum')).assign(passed=lambda s: s['failed'] == 0)
+
+
+def check_differential(**kwargs) -> pd.DataFrame:
+    """
+    Runs differential test (see run_differential for parameters) and raises AssertionError listing failed comparisons
+    :return: pandas.DataFrame - summary, see summarize_differential
+    """
+    report = run_differential(**kwargs)
+    failed = report[~report['passed'].astype(bool)]
+    if len(failed):
+        raise AssertionError("{:d} of {:d} differential comparisons failed:\n{:s}".format(
+            len(failed), len(report), failed.to_string(max_rows=50)))
+    return summarize_differential(report)
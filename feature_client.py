@@ -0,0 +1,155 @@
+import asyncio
+import json
+import struct
+from typing import List
+
+import numpy as np
+
+__all__ = ["FRAME_CONFIG", "FRAME_HEADER", "FRAME_SAMPLES", "FRAME_ROWS", "FRAME_END", "FRAME_ERROR", "read_frame",
+           "write_frame", "encode_samples", "decode_samples", "encode_rows", "decode_rows", "FeatureClient"]
+
+# Protocol of feature extraction service (see feature_service), every frame is 4 bytes of big-endian payload length,
+# 1 byte of frame type and payload. Session starts with CONFIG frame from client, answered with HEADER frame, then
+# each SAMPLES frame is answered with ROWS frame (possibly without rows), and END frame from client is answered with
+# END frame before closing connection. ERROR frame is sent by service instead of any answer and ends session.
+# This module depends only on NumPy, so it can be used on acquisition devices.
+FRAME_CONFIG = ord('C')  # JSON: {"xml": XML config text, "channels": number of EMG channels, "preprocessing": bool}
+FRAME_HEADER = ord('H')  # JSON: {"columns": feature column labels, "window": int, "step": int, "history": int}
+FRAME_SAMPLES = ord('S')  # little-endian float64 samples x channels, row-major
+FRAME_ROWS = ord('R')  # see encode_rows
+FRAME_END = ord('E')  # empty
+FRAME_ERROR = ord('X')  # UTF-8 error message
+
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+_frame_header = struct.Struct('>IB')
+_rows_header = struct.Struct('>I')
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """
+    Reads one frame
+    :param reader: asyncio.StreamReader - connection
+    :return: frame_type: int - FRAME_* constant, payload: bytes
+    """
+    length, frame_type = _frame_header.unpack(await reader.readexactly(_frame_header.size))
+    if length > MAX_FRAME_SIZE:
+        raise ValueError("Frame of {:d} bytes exceeds maximum of {:d}".format(length, MAX_FRAME_SIZE))
+    return frame_type, await reader.readexactly(length)
+
+
+def write_frame(writer: asyncio.StreamWriter, frame_type: int, payload: bytes = b''):
+    """
+    Writes one frame, writer.drain() should be awaited afterwards
+    :param writer: asyncio.StreamWriter - connection
+    :param frame_type: int - FRAME_* constant
+    :param payload: bytes - frame payload
+    """
+    writer.write(_frame_header.pack(len(payload), frame_type) + payload)
+
+
+def encode_samples(chunk: np.ndarray) -> bytes:
+    return np.ascontiguousarray(chunk, dtype='<f8').tobytes()
+
+
+def decode_samples(payload: bytes, channels: int) -> np.ndarray:
+    if len(payload) % (8 * channels):
+        raise ValueError("Samples frame of {:d} bytes is not a whole number of {:d} channel samples"
+                         .format(len(payload), channels))
+    return np.frombuffer(payload, dtype='<f8').reshape(-1, channels)
+
+
+def encode_rows(samples: np.ndarray, values: np.ndarray) -> bytes:
+    """
+    Encodes feature rows as number of rows (4 bytes big-endian), little-endian int64 sample numbers of window ends and
+    little-endian float64 feature values, rows x columns, row-major
+    """
+    return (_rows_header.pack(len(samples)) + np.ascontiguousarray(samples, dtype='<i8').tobytes() +
+            np.ascontiguousarray(values, dtype='<f8').tobytes())
+
+
+def decode_rows(payload: bytes, columns: int):
+    """
+    :param payload: bytes - ROWS frame payload
+    :param columns: int - number of feature columns
+    :return: samples: numpy.ndarray - sample numbers of window ends, values: numpy.ndarray - rows x columns
+    """
+    count, = _rows_header.unpack_from(payload)
+    samples = np.frombuffer(payload, dtype='<i8', count=count, offset=_rows_header.size)
+    values = np.frombuffer(payload, dtype='<f8', offset=_rows_header.size + 8 * count).reshape(count, columns)
+    return samples, values
+
+
+class FeatureClient:
+    """
+    Client of feature extraction service. Samples may be sent ahead of receiving rows, send waits while service
+    applies backpressure.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.columns = None
+        self.window = None
+        self.step = None
+
+    @classmethod
+    async def open_unix(cls, path: str):
+        return cls(*await asyncio.open_unix_connection(path))
+
+    @classmethod
+    async def open_tcp(cls, host: str, port: int):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def _expect(self, expected_type: int) -> bytes:
+        frame_type, payload = await read_frame(self.reader)
+        if frame_type == FRAME_ERROR:
+            raise RuntimeError("Feature service error: " + payload.decode('utf-8'))
+        if frame_type != expected_type:
+            raise ValueError("Unexpected frame type " + chr(frame_type))
+        return payload
+
+    async def configure(self, xml: str, channels: int, preprocessing: bool = False) -> List[str]:
+        """
+        Starts session
+        :param xml: string - XML config text containing feature descriptors, see StreamingFeatureExtractor
+        :param channels: int - number of EMG channels
+        :param preprocessing: bool - filter samples with StreamingFilter before calculating features
+        :return: List[str] - feature column labels
+        """
+        write_frame(self.writer, FRAME_CONFIG, json.dumps({'xml': xml, 'channels': channels,
+                                                           'preprocessing': preprocessing}).encode('utf-8'))
+        await self.writer.drain()
+        header = json.loads((await self._expect(FRAME_HEADER)).decode('utf-8'))
+        self.columns = header['columns']
+        self.window = header['window']
+        self.step = header['step']
+        return self.columns
+
+    async def send(self, chunk: np.ndarray):
+        """
+        Sends chunk of samples, rows of completed windows are returned by receive
+        :param chunk: numpy.ndarray - samples x channels
+        """
+        write_frame(self.writer, FRAME_SAMPLES, encode_samples(chunk))
+        await self.writer.drain()
+
+    async def receive(self):
+        """
+        Receives rows of windows completed by the oldest chunk not received yet
+        :return: samples: numpy.ndarray - sample numbers of window ends, values: numpy.ndarray - rows x columns
+        """
+        return decode_rows(await self._expect(FRAME_ROWS), len(self.columns))
+
+    async def process(self, chunk: np.ndarray):
+        """Sends chunk of samples and receives its rows, see send and receive"""
+        await self.send(chunk)
+        return await self.receive()
+
+    async def close(self):
+        """Ends session, all sent chunks should be received first"""
+        write_frame(self.writer, FRAME_END)
+        await self.writer.drain()
+        await self._expect(FRAME_END)
+        self.writer.close()
+        await self.writer.wait_closed()
@@ -0,0 +1,195 @@
+import json
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["ENCODINGS", "METADATA_COLUMNS", "column_encodings", "encode_frame", "decode_frame", "encoded_nbytes",
+           "codec_report"]
+
+
+# Lossy storage codec of feature columns. Rows are encoded in blocks, each column of each block with its own scale
+# and offset, so blocks can be encoded as they are written and decoded independently:
+# 'float32', 'float16' - value / scale cast to float, scale is power of 2 keeping values within float16 range,
+# 'int16', 'int8' - round((value - offset) / scale), range of finite values of block mapped to symmetric code range,
+# the lowest code stands for NaN, infinite values are clipped to finite range.
+# Relative precision: float16 ~ 5e-4 of value, int16 ~ 1.5e-5 and int8 ~ 4e-3 of block range.
+ENCODINGS = {'float64': np.float64, 'float32': np.float32, 'float16': np.float16, 'int16': np.int16, 'int8': np.int8}
+
+# Columns of records and prepare_data output which are never encoded
+METADATA_COLUMNS = ['TRAJ_1', 'TRAJ_GT', 'VIDEO_STAMP', 'type', 'subject', 'trajectory', 'date_time', 'original_time',
+                    'output_0']
+
+_params_columns = ['start', 'stop', 'column', 'encoding', 'scale', 'offset']
+
+
+def column_encodings(frame: pd.DataFrame, codec: Union[str, Dict[str, str]]) -> Dict[str, str]:
+    """
+    Returns encoding of each encoded column of given frame
+    :param frame: pandas.DataFrame - feature DataFrame
+    :param codec: string - encoding of all float columns except METADATA_COLUMNS, see ENCODINGS, or Dict[str, str] -
+    encoding of each encoded column
+    :return: Dict[str, str] - encoding of each encoded column
+    """
+    if isinstance(codec, dict):
+        encodings = dict(codec)
+    else:
+        encodings = {column: codec for column in frame.columns
+                     if column not in METADATA_COLUMNS and np.issubdtype(frame[column].dtype, np.floating)}
+    for column, encoding in encodings.items():
+        if encoding not in ENCODINGS:
+            raise ValueError(encoding + ' is not a valid feature encoding')
+    return encodings
+
+
+def _block_params(values: np.ndarray, encoding: str):
+    """Returns scale and offset of each column of 2D block"""
+    finite = np.isfinite(values)
+    any_finite = np.any(finite, axis=0)
+    minimum = np.where(any_finite, np.min(np.where(finite, values, np.inf), axis=0), 0.)
+    maximum = np.where(any_finite, np.max(np.where(finite, values, -np.inf), axis=0), 0.)
+    if encoding in ('float64', 'float32'):
+        return np.ones(values.shape[1]), np.zeros(values.shape[1])
+    if encoding == 'float16':
+        magnitude = np.maximum(np.abs(minimum), np.abs(maximum))
+        exponent = np.where(magnitude > 0, np.ceil(np.log2(np.where(magnitude > 0, magnitude, 1))) - 15, 0)
+        return np.exp2(exponent), np.zeros(values.shape[1])
+
+    top = np.iinfo(ENCODINGS[encoding]).max
+    offset = (maximum + minimum) / 2
+    scale = (maximum - minimum) / (2 * top)
+    return np.where(scale > 0, scale, 1.), offset
+
+
+def _encode_block(values: np.ndarray, encoding: str, scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    dtype = ENCODINGS[encoding]
+    scaled = (values - offset) / scale
+    if encoding.startswith('float'):
+        return scaled.astype(dtype)
+
+    top = np.iinfo(dtype).max
+    codes = np.rint(np.clip(scaled, -top, top))
+    codes[np.isnan(values)] = -top - 1
+    return codes.astype(dtype)
+
+
+def _decode_block(codes: np.ndarray, encoding: str, scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    values = codes.astype(np.float64) * scale + offset
+    if not encoding.startswith('float'):
+        values[codes == np.iinfo(ENCODINGS[encoding]).min] = np.nan
+    return values
+
+
+def encode_frame(frame: pd.DataFrame, codec: Union[str, Dict[str, str]], block_rows: int = 65536, start: int = 0):
+    """
+    Encodes feature columns of given DataFrame in blocks of rows
+    :param frame: pandas.DataFrame - feature DataFrame, eg. output of features_from_xml_on_df or prepare_data
+    :param codec: string or Dict[str, str] - encoding, see column_encodings
+    :param block_rows: int - number of rows of each block
+    :param start: int - position of first row, eg. number of rows already written to file
+    :return: encoded: pandas.DataFrame - frame with encoded columns replaced with codes, params: pandas.DataFrame -
+    scale and offset of each column of each block, with block start and stop row positions
+    """
+    encodings = column_encodings(frame, codec)
+    encoded = frame.copy()
+    params = []
+    for encoding in set(encodings.values()):
+        columns = [column for column in frame.columns if encodings.get(column) == encoding]
+        values = frame[columns].to_numpy(dtype=np.float64)
+        codes = np.empty(values.shape, dtype=ENCODINGS[encoding])
+        for block_start in range(0, len(frame), block_rows):
+            block = slice(block_start, block_start + block_rows)
+            scale, offset = _block_params(values[block], encoding)
+            codes[block] = _encode_block(values[block], encoding, scale, offset)
+            params.append(pd.DataFrame({'start': start + block_start,
+                                        'stop': start + min(block_start + block_rows, len(frame)),
+                                        'column': columns, 'encoding': encoding, 'scale': scale, 'offset': offset}))
+        for i, column in enumerate(columns):
+            encoded[column] = codes[:, i]
+    params = pd.concat(params, ignore_index=True) if params else pd.DataFrame(columns=_params_columns)
+    return encoded, params
+
+
+def decode_frame(encoded: pd.DataFrame, params: pd.DataFrame, start: int = 0) -> pd.DataFrame:
+    """
+    Decodes columns encoded by encode_frame, block by block with all columns of the same encoding at once
+    :param encoded: pandas.DataFrame - encoded frame, possibly with subset of columns
+    :param params: pandas.DataFrame - block parameters returned by encode_frame
+    :param start: int - position of first row of encoded frame
+    :return: pandas.DataFrame - frame with decoded float64 columns
+    """
+    params = params[params['column'].isin(encoded.columns)]
+    decoded_values = {column: encoded[column].to_numpy(dtype=np.float64) for column in params['column'].unique()}
+    for (block_start, block_stop, encoding), block_params in params.groupby(['start', 'stop', 'encoding'], sort=False):
+        rows = slice(max(block_start - start, 0), max(block_stop - start, 0))
+        columns = list(block_params['column'])
+        codes = encoded[columns].to_numpy()[rows]
+        if len(codes) == 0:
+            continue
+        values = _decode_block(codes, encoding, block_params['scale'].values, block_params['offset'].values)
+        for i, column in enumerate(columns):
+            decoded_values[column][rows] = values[:, i]
+
+    decoded = encoded.copy()
+    for column, values in decoded_values.items():
+        decoded[column] = values
+    return decoded
+
+
+def _params_to_json(params: pd.DataFrame) -> str:
+    """Returns block parameters as JSON, eg. for Arrow record batch metadata"""
+    return json.dumps({column: params[column].tolist() for column in _params_columns})
+
+
+def _params_from_json(text: str) -> pd.DataFrame:
+    return pd.DataFrame(json.loads(text), columns=_params_columns)
+
+
+def encoded_nbytes(frame: pd.DataFrame, codec: Union[str, Dict[str, str]]) -> int:
+    """Returns size of encoded columns of given frame, without block parameters"""
+    return sum(len(frame) * np.dtype(ENCODINGS[encoding]).itemsize
+               for encoding in column_encodings(frame, codec).values())
+
+
+def codec_report(data: Dict[str, pd.DataFrame], features: List[str], encodings: List[str] = ('float32', 'float16',
+                 'int16', 'int8'), predictor: str = 'LDA', block_rows: int = 65536, **predictor_args) -> pd.DataFrame:
+    """
+    Compares size and classification accuracy of features stored with each encoding: both 'train' and 'test' sets
+    are encoded and decoded, predictor is trained and tested on decoded features, see pruning.subset_accuracy
+    :param data: Dict[str, pandas.DataFrame] - output of prepare_data with 'train' and 'test' sets
+    :param features: List[str] - feature names, eg. ['RMS', 'WL']
+    :param encodings: List[str] - encodings to compare with float64, see ENCODINGS
+    :param predictor: string - predictor name, see prepare_pipeline
+    :param block_rows: int - rows of each encoded block
+    :param predictor_args: predictor parameters, see prepare_pipeline
+    :return: pandas.DataFrame - row for each encoding with bytes of feature columns of both sets, size_ratio (bytes of
+    float64 / bytes), max_error (maximum absolute error relative to column range), accuracy and accuracy_change
+    """
+    from .pruning import _input_columns_regex, subset_accuracy
+
+    columns_regex = _input_columns_regex(features)
+    rows = []
+    for encoding in ['float64'] + [e for e in encodings if e != 'float64']:
+        decoded_data = {}
+        total_bytes = 0
+        max_error = 0.
+        for name, frame in data.items():
+            codec = {column: encoding for column in frame.filter(regex=columns_regex).columns}
+            encoded, params = encode_frame(frame, codec, block_rows=block_rows)
+            decoded_data[name] = decode_frame(encoded, params)
+            total_bytes += encoded_nbytes(frame, codec)
+
+            values = frame[list(codec)].to_numpy(dtype=np.float64)
+            errors = np.abs(decoded_data[name][list(codec)].to_numpy() - values)
+            ranges = np.nanmax(values, axis=0) - np.nanmin(values, axis=0) if len(values) else np.zeros(0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative = np.where(ranges > 0, np.nanmax(errors, axis=0) / ranges, 0.) if len(values) else ranges
+            max_error = max([max_error] + list(relative[np.isfinite(relative)]))
+
+        accuracy = subset_accuracy(decoded_data, features, predictor, **predictor_args)
+        rows.append({'encoding': encoding, 'bytes': total_bytes, 'max_error': max_error, 'accuracy': accuracy})
+
+    report = pd.DataFrame(rows).set_index('encoding')
+    report.insert(1, 'size_ratio', report.loc['float64', 'bytes'] / report['bytes'])
+    report['accuracy_change'] = report['accuracy'] - report.loc['float64', 'accuracy']
+    return report
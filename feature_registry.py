@@ -0,0 +1,135 @@
+from typing import Dict, List
+
+__all__ = ["FeatureInfo", "register_feature", "register_variant", "get_feature", "registered_features"]
+
+
+class FeatureInfo:
+    """
+    Feature implementation together with its capabilities and rough cost model. Cost and memory of feature calculation
+    for each window are assumed to grow as window**complexity. Feature can have alternative implementations (variants)
+    with the same signature and output, eg. 'prefix' variants calculated from prefix sums shared between windowing
+    configurations. Default implementation is available as 'direct' variant.
+    """
+
+    def __init__(self, name: str, func, kind: str = 'emg', spectral: bool = False, complexity: int = 1,
+                 batched: bool = True, multi_column: bool = False, lookback: int = 0, window_local: bool = True,
+                 ns_per_sample: float = 1.0, bytes_per_sample: float = 8.0):
+        """
+        :param name: string - feature name as used in XML config, eg. 'ApEn'
+        :param func: function - feature function taking pandas.Series, window, step and feature parameters
+        :param kind: string - 'emg' for features of EMG_* columns, 'force' for features of FORCE_* columns, 'cross'
+        for features of pairs of EMG_* columns, calculated from all channels at once by kernel taking 2D array
+        (channels x samples), see calculate_cross_feature
+        :param spectral: bool - feature is calculated from power spectrum of each window
+        :param complexity: int - exponent of window length in cost of single window, eg. 2 for ApEn
+        :param batched: bool - all windows are calculated at once by vectorised operations, not in Python loop
+        :param multi_column: bool - feature returns pandas.DataFrame with multiple columns, eg. AR
+        :param lookback: int - number of preceding windows feature value depends on, eg. 1 for MAVSLP
+        :param window_local: bool - value of each window depends only on its samples and lookback windows, not on
+        other windows calculated in the same call, so windows can be calculated in chunks or batches
+        :param ns_per_sample: float - calculation time in nanoseconds per window**complexity
+        :param bytes_per_sample: float - temporary memory in bytes per window**complexity
+        """
+        self.name = name
+        self.func = func
+        self.kind = kind
+        self.spectral = spectral
+        self.complexity = complexity
+        self.batched = batched
+        self.multi_column = multi_column
+        self.lookback = lookback
+        self.window_local = window_local
+        self.ns_per_sample = ns_per_sample
+        self.bytes_per_sample = bytes_per_sample
+        self.variants = {'direct': func}
+
+    def implementation(self, variant: str = None):
+        """
+        Returns feature function of given variant, or default implementation if feature has no such variant
+        :param variant: string - variant name, eg. 'prefix'
+        :return: function - feature function
+        """
+        return self.variants.get(variant, self.func)
+
+    def cost(self, window: int, windows: int = 1) -> float:
+        """
+        Estimated calculation time of given number of windows of single channel
+        :param window: int - window size
+        :param windows: int - number of windows
+        :return: float - time in nanoseconds
+        """
+        return self.ns_per_sample * window ** self.complexity * windows
+
+    def memory(self, window: int, windows: int = 1) -> float:
+        """
+        Estimated peak temporary memory used by calculation of given number of windows of single channel
+        :param window: int - window size
+        :param windows: int - number of windows
+        :return: float - memory in bytes
+        """
+        return self.bytes_per_sample * window ** self.complexity * windows
+
+    def __repr__(self):
+        return "FeatureInfo(" + self.kind + ":" + self.name + ")"
+
+
+_registry: Dict[str, Dict[str, FeatureInfo]] = {'emg': {}, 'force': {}, 'cross': {}}
+
+
+def register_feature(name: str, kind: str = 'emg', replace: bool = False, **traits):
+    """
+    Decorator registering feature function under given name, see FeatureInfo for available traits. Can also be used
+    to register third-party features, eg. register_feature('MyFeature', ns_per_sample=5.0)(feature_my_feature)
+    :param name: string - feature name as used in XML config, lookup is case insensitive
+    :param kind: string - 'emg', 'force' or 'cross'
+    :param replace: bool - allow replacing already registered feature
+    :param traits: FeatureInfo parameters
+    :return: decorator returning registered function unchanged
+    """
+    if kind not in _registry:
+        raise ValueError(kind + ' is not a valid feature kind')
+
+    def decorator(func):
+        if name.lower() in _registry[kind] and not replace:
+            raise ValueError(name + ' feature is already registered')
+        _registry[kind][name.lower()] = FeatureInfo(name, func, kind=kind, **traits)
+        return func
+
+    return decorator
+
+
+def register_variant(name: str, variant: str, kind: str = 'emg'):
+    """
+    Decorator registering alternative implementation of already registered feature
+    :param name: string - feature name
+    :param variant: string - variant name, eg. 'prefix'
+    :param kind: string - 'emg', 'force' or 'cross'
+    :return: decorator returning registered function unchanged
+    """
+    def decorator(func):
+        get_feature(name, kind).variants[variant] = func
+        return func
+
+    return decorator
+
+
+def get_feature(name: str, kind: str = 'emg') -> FeatureInfo:
+    """
+    Returns registered feature of given name
+    :param name: string - feature name, case insensitive
+    :param kind: string - 'emg', 'force' or 'cross'
+    :return: FeatureInfo - feature description
+    """
+    try:
+        return _registry[kind][name.lower()]
+    except KeyError:
+        raise ValueError(name + ' is not a valid ' + kind + ' feature')
+
+
+def registered_features(kind: str = 'emg') -> List[FeatureInfo]:
+    """
+    Returns all registered features of given kind, in order of registration
+    :param kind: string - 'emg', 'force' or 'cross'
+    :return: List[FeatureInfo] - feature descriptions
+    """
+    return list(_registry[kind].values())
@@ -0,0 +1,169 @@
+import functools
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["FeatureResult", "join_results", "concat_results", "window_kernel"]
+
+
+class FeatureResult:
+    """
+    Feature values of record windows kept as single NumPy block (windows x columns, column-major, so each column is
+    contiguous), vector of window end positions in record and column labels. pandas.DataFrame is built only on
+    to_pandas, Arrow table is exported without copying feature columns, raw arrays are available directly as values
+    and extra, eg. for model training.
+    """
+
+    def __init__(self, values: np.ndarray, windows: np.ndarray, columns: List[str], index: pd.Index = None,
+                 dtypes: List = None, extra: Dict[str, np.ndarray] = None):
+        """
+        :param values: numpy.ndarray - 2D array of feature values, row for each window, column for each feature column
+        :param windows: numpy.ndarray - positions of last sample of each window in record, see moving_window_stride
+        :param columns: List[str] - feature column labels
+        :param index: pandas.Index - record index labelling rows in to_pandas, positions are used if None
+        :param dtypes: List[numpy.dtype] - dtype of each column as returned by feature function, restored by
+        to_pandas for columns without missing values, float64 by default
+        :param extra: Dict[str, numpy.ndarray] - additional columns of any dtype aligned with windows, eg. TRAJ_GT
+        """
+        self.values = values
+        self.windows = windows
+        self.columns = list(columns)
+        self.index = index
+        self.dtypes = list(dtypes) if dtypes is not None else [values.dtype] * len(self.columns)
+        self.extra = dict(extra) if extra is not None else {}
+
+    @classmethod
+    def from_feature(cls, data: np.ndarray, windows: np.ndarray, label: str, index: pd.Index = None):
+        """
+        Wraps output of window kernel, see window_kernel
+        :param data: numpy.ndarray - 1D feature values, or 2D values of multi-column feature
+        :param windows: numpy.ndarray - window end positions
+        :param label: string - column label, multi-column features are labelled <label>_0, <label>_1, ...
+        :param index: pandas.Index - record index
+        :return: FeatureResult
+        """
+        data = np.asarray(data)
+        if data.ndim == 1:
+            columns = [label]
+            data = data[:, np.newaxis]
+        else:
+            columns = [label + '_' + str(i) for i in range(data.shape[1])]
+        return cls(np.asfortranarray(data, dtype=np.float64), np.asarray(windows), columns, index,
+                   dtypes=[data.dtype] * data.shape[1])
+
+    @classmethod
+    def from_pandas(cls, feature, label: str, index: pd.Index):
+        """
+        Wraps output of feature function without window kernel
+        :param feature: pandas.Series or pandas.DataFrame - feature function output indexed with record labels
+        :param label: string - column label, DataFrame columns are labelled <label>_<column>
+        :param index: pandas.Index - record index
+        :return: FeatureResult
+        """
+        windows = index.get_indexer(feature.index)
+        if isinstance(feature, pd.Series):
+            return cls.from_feature(feature.values, windows, label, index)
+        return cls(np.asfortranarray(feature.values, dtype=np.float64), windows,
+                   [label + '_' + str(c) for c in feature.columns], index, dtypes=list(feature.dtypes))
+
+    def __len__(self):
+        return len(self.windows)
+
+    @property
+    def labels(self) -> pd.Index:
+        """Record index labels of window ends"""
+        if self.index is None:
+            return pd.Index(self.windows)
+        return self.index[self.windows]
+
+    def to_numpy(self) -> np.ndarray:
+        """Returns feature values block, row for each window"""
+        return self.values
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        Builds DataFrame of feature and extra columns indexed with record labels of window ends, equal to the one
+        produced by joining feature function outputs
+        """
+        frame = pd.DataFrame(self.values, index=self.labels, columns=self.columns, copy=False)
+        casts = {c: dtype for i, (c, dtype) in enumerate(zip(self.columns, self.dtypes))
+                 if dtype != self.values.dtype and not np.isnan(self.values[:, i]).any()}
+        if casts:
+            frame = frame.astype(casts)
+        if self.extra:
+            frame = pd.concat([frame, pd.DataFrame(self.extra, index=frame.index)], axis=1)
+        return frame
+
+    def to_arrow(self):
+        """
+        Exports feature and extra columns to pyarrow.Table, with record labels of window ends in last column named
+        as record index (or '__index_level_0__'). Feature columns share memory with values. Requires pyarrow.
+        """
+        import pyarrow as pa
+
+        arrays = [pa.array(self.values[:, i]) for i in range(len(self.columns))]
+        arrays += [pa.array(data) for data in self.extra.values()]
+        labels = self.labels
+        arrays.append(pa.array(np.asarray(labels)))
+        names = self.columns + list(self.extra.keys()) + [labels.name or '__index_level_0__']
+        return pa.Table.from_arrays(arrays, names=names)
+
+
+def join_results(results: List[FeatureResult]) -> FeatureResult:
+    """
+    Joins columns of given results. Results with different windows (eg. MAVSLP missing first window) are outer joined,
+    missing values are NaN.
+    :param results: List[FeatureResult] - results of the same record
+    :return: FeatureResult - joined result
+    """
+    if not results:
+        return FeatureResult(np.empty((0, 0)), np.empty(0, dtype=np.int64), [])
+
+    windows = results[0].windows
+    if not all(np.array_equal(result.windows, windows) for result in results[1:]):
+        windows = functools.reduce(np.union1d, [result.windows for result in results])
+
+    values = np.full((len(windows), sum(len(result.columns) for result in results)), np.nan, order='F')
+    column = 0
+    extra = {}
+    for result in results:
+        rows = slice(None) if result.windows is windows else np.searchsorted(windows, result.windows)
+        values[rows, column:column + len(result.columns)] = result.values
+        column += len(result.columns)
+        extra.update(result.extra)
+
+    return FeatureResult(values, windows, [c for result in results for c in result.columns], results[0].index,
+                         dtypes=[dtype for result in results for dtype in result.dtypes], extra=extra)
+
+
+def concat_results(results: List[FeatureResult]) -> FeatureResult:
+    """
+    Concatenates rows of given results with the same columns, eg. calculated for consecutive parts of record
+    :param results: List[FeatureResult] - results with consecutive, not overlapping windows
+    :return: FeatureResult - concatenated result
+    """
+    first = results[0]
+    return FeatureResult(np.asfortranarray(np.concatenate([result.values for result in results])),
+                         np.concatenate([result.windows for result in results]), first.columns, first.index,
+                         dtypes=first.dtypes,
+                         extra={c: np.concatenate([result.extra[c] for result in results]) for c in first.extra})
+
+
+def window_kernel(kernel):
+    """
+    Decorator turning window kernel into feature function. Kernel takes numpy.ndarray of signal values instead of
+    pandas.Series, and returns feature values of each window (2D for multi-column features) and positions of window
+    ends, see moving_window_stride. Feature function returns pandas.Series (or pandas.DataFrame with columns '0',
+    '1', ...) indexed with labels of window ends. Kernel is kept as kernel attribute of feature function, so
+    calculate_feature can skip building pandas objects.
+    """
+    @functools.wraps(kernel)
+    def feature_func(series, window, step, *args, **kwargs):
+        data, windows = kernel(series.values, window, step, *args, **kwargs)
+        if np.ndim(data) == 1:
+            return pd.Series(data=data, index=series.index[windows])
+        return pd.DataFrame(data, index=series.index[windows], columns=[str(i) for i in range(data.shape[1])])
+
+    feature_func.kernel = kernel
+    return feature_func
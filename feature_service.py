@@ -0,0 +1,143 @@
+import asyncio
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .feature_client import FRAME_CONFIG, FRAME_END, FRAME_ERROR, FRAME_HEADER, FRAME_ROWS, FRAME_SAMPLES, \
+    decode_samples, encode_rows, read_frame, write_frame
+from .realtime import StreamingFeatureExtractor, StreamingFilter
+
+__all__ = ["FeatureService", "serve"]
+
+
+class _Session:
+    def __init__(self, config: dict, fs: float):
+        channels = int(config['channels'])
+        self.extractor = StreamingFeatureExtractor(io.StringIO(config['xml']), channels, fs)
+        self.preprocessing = StreamingFilter(channels, fs) if config.get('preprocessing') else None
+
+    def process(self, payload: bytes) -> bytes:
+        chunk = decode_samples(payload, len(self.extractor.channels))
+        if self.preprocessing is not None:
+            chunk = self.preprocessing.process(chunk)
+        return encode_rows(*self.extractor.process(chunk))
+
+
+class FeatureService:
+    """
+    Asyncio service calculating features of EMG sample streams sent over Unix or TCP socket, see feature_client for
+    protocol and client. Each connection is a session with its own XML config and StreamingFeatureExtractor. Feature
+    calculation runs on executor, so event loop keeps serving other sessions. Each session has bounded queue of
+    received chunks, when it is full (or rows are not read by client) service stops reading from the connection, so
+    client sends are blocked by socket flow control.
+    Invalid config, eg. unknown feature or feature which is not window local (see StreamingFeatureExtractor), ends the
+    session with error frame.
+    """
+
+    def __init__(self, executor=None, max_workers: int = None, queue_size: int = 8, fs: float = 5120):
+        """
+        :param executor: concurrent.futures.Executor - executor of feature calculation, ThreadPoolExecutor if None
+        :param max_workers: int - number of threads of default executor
+        :param queue_size: int - maximum number of chunks received and not processed yet in each session
+        :param fs: float - sampling frequency
+        """
+        self._own_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=max_workers)
+        self.queue_size = queue_size
+        self.fs = fs
+        self.sessions = 0  # number of active sessions
+
+    async def _receive(self, reader, queue: asyncio.Queue):
+        while True:
+            frame_type, payload = await read_frame(reader)
+            if frame_type == FRAME_END:
+                await queue.put(None)
+                return
+            if frame_type != FRAME_SAMPLES:
+                raise ValueError("Unexpected frame type " + chr(frame_type))
+            await queue.put(payload)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves one session, see asyncio.start_server"""
+        loop = asyncio.get_running_loop()
+        receiving = None
+        self.sessions += 1
+        try:
+            frame_type, payload = await read_frame(reader)
+            if frame_type != FRAME_CONFIG:
+                raise ValueError("Session has to start with config frame")
+            session = await loop.run_in_executor(self.executor, _Session, json.loads(payload.decode('utf-8')),
+                                                 self.fs)
+            extractor = session.extractor
+            write_frame(writer, FRAME_HEADER, json.dumps({'columns': extractor.columns, 'window': extractor.window,
+                                                          'step': extractor.step,
+                                                          'history': extractor.history}).encode('utf-8'))
+            await writer.drain()
+
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            receiving = asyncio.ensure_future(self._receive(reader, queue))
+            while True:
+                get = asyncio.ensure_future(queue.get())
+                await asyncio.wait([get, receiving], return_when=asyncio.FIRST_COMPLETED)
+                if not get.done():  # connection failed before end frame
+                    get.cancel()
+                    receiving.result()
+                    return
+                payload = get.result()
+                if payload is None:
+                    write_frame(writer, FRAME_END)
+                    await writer.drain()
+                    return
+                rows = await loop.run_in_executor(self.executor, session.process, payload)
+                write_frame(writer, FRAME_ROWS, rows)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # client disconnected
+        except Exception as e:
+            write_frame(writer, FRAME_ERROR, "{:s}: {:s}".format(type(e).__name__, str(e)).encode('utf-8'))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            self.sessions -= 1
+            if receiving is not None and not receiving.done():
+                receiving.cancel()
+            writer.close()
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        return await asyncio.start_unix_server(self.handle, path)
+
+    async def start_tcp(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        """Starts TCP server, port 0 selects free port, see server.sockets[0].getsockname()"""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
+
+
+def serve(path: str = None, host: str = '127.0.0.1', port: int = 5120, max_workers: int = None, queue_size: int = 8,
+          fs: float = 5120):
+    """
+    Runs feature extraction service until interrupted
+    :param path: string - Unix socket path, TCP socket is used if None
+    :param host: string - TCP host
+    :param port: int - TCP port
+    :param max_workers: int - number of feature calculation threads
+    :param queue_size: int - see FeatureService
+    :param fs: float - sampling frequency
+    """
+    service = FeatureService(max_workers=max_workers, queue_size=queue_size, fs=fs)
+
+    async def run():
+        server = await (service.start_unix(path) if path is not None else service.start_tcp(host, port))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
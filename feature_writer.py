@@ -0,0 +1,140 @@
+import pandas as pd
+
+from .feature_codec import _params_from_json, _params_to_json, decode_frame, encode_frame
+
+__all__ = ["FeatureWriter", "read_features"]
+
+
+class FeatureWriter:
+    """
+    Appends feature DataFrames to columnar output file as they are calculated, so complete output of long record
+    never has to be kept in memory. Supported formats:
+    'hdf5' - chunked PyTables table written with pandas.HDFStore, readable with pandas.read_hdf (also partially, with
+    where/columns selection),
+    'arrow' - uncompressed Arrow IPC file (Feather v2), readable without parsing by memory-mapping, see read_features.
+    Requires pyarrow.
+    All appended frames must have the same columns with the same dtypes, as produced by iter_features_from_xml_on_df.
+    Feature columns can be stored quantized with codec, see feature_codec, scale and offset of each column of each
+    written frame are stored in '<key>_codec' table of 'hdf5' file or in metadata of each Arrow record batch, and
+    read_features decodes them.
+    """
+
+    def __init__(self, path: str, file_format: str = 'hdf5', key: str = 'features', min_itemsize=None,
+                 codec=None):
+        """
+        :param path: string - url to output file, existing file is overwritten
+        :param file_format: string - 'hdf5' or 'arrow'
+        :param key: string - HDF5 group identifier, used only by 'hdf5' format
+        :param min_itemsize: int or Dict - minimal width of string columns, used only by 'hdf5' format
+        :param codec: string or Dict[str, str] - encoding of feature columns, eg. 'float16' or 'int8', see
+        feature_codec.column_encodings, columns are stored as float64 if None
+        """
+        self.path = path
+        self.file_format = file_format
+        self.key = key
+        self.min_itemsize = min_itemsize
+        self.codec = codec
+        self.rows = 0
+
+        self._store = None
+        self._sink = None
+        self._arrow_writer = None
+        self._arrow_schema = None
+
+        if file_format == 'hdf5':
+            self._store = pd.HDFStore(path, mode='w')
+        elif file_format == 'arrow':
+            import pyarrow as pa
+            self._sink = pa.OSFile(path, 'wb')
+        else:
+            raise ValueError(file_format + ' is not a valid output file format')
+
+    def write(self, frame: pd.DataFrame):
+        """
+        Appends rows of given DataFrame to output file
+        :param frame: pandas.DataFrame - feature DataFrame
+        """
+        if frame.empty:
+            return
+
+        params = None
+        if self.codec is not None:
+            frame, params = encode_frame(frame, self.codec, block_rows=len(frame), start=self.rows)
+
+        if self.file_format == 'hdf5':
+            self._store.append(self.key, frame, format='table', index=False, min_itemsize=self.min_itemsize)
+            if params is not None:
+                self._store.append(self.key + '_codec', params, format='table', index=False,
+                                   min_itemsize={'column': 128, 'encoding': 8})
+        else:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(frame, schema=self._arrow_schema, preserve_index=True)
+            if self._arrow_writer is None:
+                self._arrow_schema = table.schema
+                if params is not None:
+                    self._arrow_schema = table.schema.with_metadata(dict(table.schema.metadata, putemg_codec='1'))
+                self._arrow_writer = pa.ipc.new_file(self._sink, self._arrow_schema)
+            if params is None:
+                self._arrow_writer.write_table(table)
+            else:  # single batch, so parameters of whole frame are stored in its metadata
+                batch = table.combine_chunks().to_batches()[0]
+                self._arrow_writer.write_batch(batch, custom_metadata={'putemg_codec': _params_to_json(params)})
+
+        self.rows += len(frame)
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        if self._arrow_writer is not None:
+            self._arrow_writer.close()
+            self._arrow_writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_features(path: str, file_format: str = 'hdf5', key: str = 'features', columns=None) -> pd.DataFrame:
+    """
+    Reads feature file written by FeatureWriter. Arrow files are memory-mapped, so only requested columns are read
+    from disk. Columns stored with codec are decoded to float64.
+    :param path: string - url to feature file
+    :param file_format: string - 'hdf5' or 'arrow'
+    :param key: string - HDF5 group identifier, used only by 'hdf5' format
+    :param columns: List[str] - columns to read, all if None
+    :return: pandas.DataFrame - feature DataFrame
+    """
+    if file_format == 'hdf5':
+        with pd.HDFStore(path, mode='r') as store:
+            frame = store.select(key, columns=columns)
+            if '/' + key + '_codec' in store.keys():
+                frame = decode_frame(frame, store.select(key + '_codec'))
+        return frame
+    elif file_format == 'arrow':
+        import pyarrow as pa
+        with pa.memory_map(path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            params = None
+            if b'putemg_codec' in (reader.schema.metadata or {}):
+                batches, params = [], []
+                for i in range(reader.num_record_batches):
+                    batch, metadata = reader.get_batch_with_custom_metadata(i)
+                    batches.append(batch)
+                    params.append(_params_from_json(metadata[b'putemg_codec'].decode()))
+                table = pa.Table.from_batches(batches, schema=reader.schema)
+                params = pd.concat(params, ignore_index=True)
+            else:
+                table = reader.read_all()
+            if columns is not None:
+                index_columns = [c for c in table.schema.pandas_metadata['index_columns'] if isinstance(c, str)]
+                table = table.select(list(columns) + index_columns)
+            frame = table.to_pandas()
+        return decode_frame(frame, params) if params is not None else frame
+    else:
+        raise ValueError(file_format + ' is not a valid output file format')
@@ -1,6 +1,13 @@
 from . import biolab_utilities
-
-from .pyeeg import pyeeg
+from .feature_writer import FeatureWriter
+from .feature_result import FeatureResult, join_results, concat_results, window_kernel
+from .feature_registry import register_feature, register_variant, get_feature
+from . import spectrum
+from . import kernels
+from . import tuning
+from . import instrumentation
+from . import metrics
+from . import profiling
 
 import pandas as pd
 import numpy as np
@@ -11,67 +18,367 @@ from scipy import interpolate
 
 import xml.etree.ElementTree as ET
 
+import os
 import time
+import math
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+_print_lock = threading.Lock()
+
+biolab_utilities.add_filter_observer(metrics.record_filter)  # preprocessing metrics of biolab_utilities.apply_filter
+
 
+def _print_progress(*lines):
+    """Prints given lines at once, so progress of features calculated in parallel threads is not interleaved"""
+    with _print_lock:
+        print(*lines, sep='\n', flush=True)
 
-def calculate_feature(record: pd.DataFrame, name, **kwargs):
+
+def calculate_feature(record: pd.DataFrame, name, threads=1, verbose=True, variant=None, output='pandas', **kwargs):
     """
     Calculates feature given name of given pandas.DataFrame. Feature is calculated for each Series with
     column name of "EMG_\d". Feature parameters are passed by **kwargs, eg. window=500, step=250
     :param record: pandas.DataFrame - input DataFrame with data to calculate features from
     :param name: string - name of the requested feature
+    :param threads: int - number of threads calculating chunks of windows in parallel, see calculate_in_chunks
+    :param verbose: bool - print calculated channels and elapsed time
+    :param variant: string - feature implementation variant, eg. 'prefix', if None variant selected by tuning.calibrate
+    is used, default implementation if feature has no such variant, see FeatureInfo.variants
+    :param output: string - 'pandas' for pandas.DataFrame, 'result' for FeatureResult holding raw arrays
     :param kwargs: parameters for feature calculation.
     :return: pandas.DataFrame - DataFrame containing output of desired feature
     """
-    feature_func_name = 'feature_' + name.lower()  # Get feature function name based on name
-    feature_values = pd.DataFrame()  # Create empty DataFrame
+    result = _calculate_feature_columns(record, get_feature(name), r"EMG_\d+", name + '_', threads, verbose, variant,
+                                        **kwargs)
+    return _convert_result(result, output)
+
+
+def calculate_force_feature(record: pd.DataFrame, name, threads=1, verbose=True, variant=None, output='pandas',
+                            **kwargs):
+    """
+    Calculates force feature given name of given pandas.DataFrame, for each Series with column name of "FORCE_\d".
+    See calculate_feature
+    """
+    result = _calculate_feature_columns(record, get_feature(name, kind='force'), r"FORCE_\d+", 'FORCE_' + name + '_',
+                                        threads, verbose, variant, **kwargs)
+    return _convert_result(result, output)
+
+
+def calculate_cross_feature(record: pd.DataFrame, name, verbose=True, output='pandas', **kwargs):
+    """
+    Calculates cross-channel feature given name of given pandas.DataFrame, for each pair of Series with column name of
+    "EMG_\d". Feature kernel is called once with all channels stacked into 2D array (channels x samples), and returns
+    channels x channels matrix of each window, so pairs are calculated by batched matrix products instead of call per
+    pair. Columns are labelled <name>_<channel>_<channel> for each pair of upper triangle of the matrix (without
+    diagonal), features returning matrix for each of parameter groups (eg. frequency bands) are labelled
+    <name>_<group>_<channel>_<channel>. Windows are calculated in chunks fitting in memory budget of all channels,
+    see set_memory_budget.
+    :param record: pandas.DataFrame - input DataFrame with data to calculate features from
+    :param name: string - name of the requested cross-channel feature
+    :param verbose: bool - print elapsed time
+    :param output: string - 'pandas' for pandas.DataFrame, 'result' for FeatureResult holding raw arrays
+    :param kwargs: parameters for feature calculation, including window and step
+    :return: pandas.DataFrame - DataFrame containing output of desired feature
+    """
+    feature_info = get_feature(name, kind='cross')
+    window, step = kwargs.pop('window'), kwargs.pop('step')
+    columns = list(record.filter(regex=r"EMG_\d+"))
+    channels = [column.split('_')[1] for column in columns]
+    values = np.ascontiguousarray(record[columns].values.T, dtype=np.float64)
 
     start = time.time()
-    print('Calculating feature ' + name + ':', end='', flush=True)
-    for column in record.filter(regex=r"EMG_\d+"):  # For each column containing EMG data (for each Series)
-        print(' ' + column.split('_')[1], end='', flush=True)
-        feature_label = name + '_' + column.split('_')[1]  # Prepare feature column label
-        # Call feature calculation by function name, and add to output DataFrame
-        feature = globals()[feature_func_name](record[column], **kwargs)
-        if isinstance(feature, pd.Series):
-            feature_values[feature_label] = feature
-        elif isinstance(feature, pd.DataFrame):
-            d = {}
-            for c in feature.columns:
-                d[c] = feature_label + "_" + c
-            feature = feature.rename(columns=d)
-            feature_values = feature_values.join(feature, how='outer')
-
-    print('', flush=True)
-    print("Elapsed time: {:.2f}s".format(time.time() - start))
-
-    return feature_values
-
-
-def calculate_force_feature(record: pd.DataFrame, name, **kwargs):
-    feature_func_name = 'force_feature_' + name.lower()  # Get feature function name based on name
-    feature_values = pd.DataFrame()  # Create empty DataFrame
+    # memory budget is shared by all channels, as each window of all channels is calculated at once
+    chunk_windows = min(_budget_chunk_windows(feature_info, window, threads=max(len(columns), 1)),
+                        max(_window_count(len(record), window, step), 1))
+    chunks = biolab_utilities.window_chunks(len(record), window, step, chunk_windows)
+    data = []
+    windows = []
+    with profiling.profiled(feature_info.name):
+        for chunk_start, chunk_stop, _ in chunks or [(0, len(record), 0)]:  # no chunks if record shorter than window
+            chunk_data, chunk_ends = feature_info.func(values[:, chunk_start:chunk_stop], window, step, **kwargs)
+            data.append(np.asarray(chunk_data))
+            windows.append(np.asarray(chunk_ends) + chunk_start)
+    data = np.concatenate(data)
+    windows = np.concatenate(windows)
+
+    rows, cols = np.triu_indices(len(columns), 1)
+    pairs = [channels[i] + '_' + channels[j] for i, j in zip(rows, cols)]
+    if data.ndim == 3:
+        labels = [name + '_' + pair for pair in pairs]
+        data = data[:, rows, cols]
+    else:
+        labels = [name + '_' + str(group) + '_' + pair for group in range(data.shape[1]) for pair in pairs]
+        data = data[:, :, rows, cols].reshape(len(windows), len(labels))
+    result = FeatureResult(np.asfortranarray(data), windows, labels, record.index)
+
+    metrics.record_feature(feature_info.name, time.time() - start, len(result) * len(labels))
+    if verbose:
+        _print_progress('Calculating cross-channel feature ' + feature_info.name + ': ' + ' '.join(channels),
+                        "Elapsed time: {:.2f}s".format(time.time() - start))
+    return _convert_result(result, output)
+
+
+def _convert_result(result: FeatureResult, output):
+    if output == 'pandas':
+        return result.to_pandas()
+    elif output == 'result':
+        return result
+    else:
+        raise ValueError(output + ' is not a valid output type')
+
+
+def _calculate_feature_columns(record: pd.DataFrame, feature_info, column_regex, label_prefix, threads, verbose,
+                               variant, **kwargs) -> FeatureResult:
+    if variant is None and 'window' in kwargs and 'step' in kwargs:
+        variant = tuning.tuned_variant(feature_info.name, kwargs['window'], kwargs['step'])
+    feature_func = feature_info.implementation(variant)
+    kernel = getattr(feature_func, 'kernel', None)
+
+    # Features which would exceed memory budget on whole record are calculated in chunks fitting in the budget
+    chunked = threads > 1 or ('window' in kwargs and 'step' in kwargs and
+                              _budget_chunk_windows(feature_info, kwargs['window'], threads) <
+                              _window_count(len(record), kwargs['window'], kwargs['step']))
 
     start = time.time()
-    print('Calculating force feature ' + name + ':', end='', flush=True)
-    for column in record.filter(regex=r"FORCE_\d+"):  # For each column containing EMG data (for each Series)
-        print(' ' + column.split('_')[1], end='', flush=True)
-        feature_label = 'FORCE_' + name + '_' + column.split('_')[1]  # Prepare feature column label
-        # Call feature calculation by function name, and add to output DataFrame
-        feature = globals()[feature_func_name](record[column], **kwargs)
-        if isinstance(feature, pd.Series):
-            feature_values[feature_label] = feature
-        elif isinstance(feature, pd.DataFrame):
-            d = {}
-            for c in feature.columns:
-                d[c] = feature_label + "_" + c
-            feature = feature.rename(columns=d)
-            feature_values = feature_values.join(feature, how='outer')
-
-    print('', flush=True)
-    print("Elapsed time: {:.2f}s".format(time.time() - start))
-
-    return feature_values
+    channels = []
+    results = []
+    for column in record.filter(regex=column_regex):  # For each column containing data (for each Series)
+        channels.append(column.split('_')[1])
+        feature_label = label_prefix + column.split('_')[1]  # Prepare feature column label
+        # Call feature calculation function, window kernels skip building pandas objects
+        with profiling.profiled(label_prefix[:-1]):
+            if chunked:
+                feature = calculate_in_chunks(feature_info, record[column], threads=threads, variant=variant,
+                                              **kwargs)
+                results.append(FeatureResult.from_pandas(feature, feature_label, record.index))
+            elif kernel is not None:
+                data, windows = kernel(record[column].values, **kwargs)
+                results.append(FeatureResult.from_feature(data, windows, feature_label, record.index))
+            else:
+                results.append(FeatureResult.from_pandas(feature_func(record[column], **kwargs), feature_label,
+                                                         record.index))
+
+    metrics.record_feature(feature_info.name, time.time() - start, sum(len(result) for result in results))
+    if verbose:
+        _print_progress('Calculating ' + ('force ' if feature_info.kind == 'force' else '') + 'feature ' +
+                        feature_info.name + ': ' + ' '.join(channels),
+                        "Elapsed time: {:.2f}s".format(time.time() - start))
+
+    return join_results(results)
+
+
+def calculate_in_chunks(feature_info, series: pd.Series, window, step, chunk_windows=None, threads=1, variant=None,
+                        **kwargs):
+    """
+    Calculates feature of given Series in chunks of consecutive windows, optionally in parallel threads. Chunks are
+    views of input Series, so record is not copied. Output is equal to output of feature function called on whole
+    Series. Parallel threads speed up calculation only for features spending most of the time in NumPy/SciPy calls
+    releasing GIL (see FeatureInfo.batched), for spectral features consider spectrum.set_spectrum_workers(1). Chunks
+    are limited to fit in memory budget, see set_memory_budget, chosen chunking is recorded as 'chunking'
+    instrumentation event.
+    :param feature_info: FeatureInfo - registered feature, see get_feature
+    :param series: pandas.Series - input Series
+    :param window: int - window size
+    :param step: int - step lenght
+    :param chunk_windows: int - maximum number of windows in chunk, by default windows are split evenly into
+    4 chunks per thread, or not split in single thread
+    :param threads: int - number of threads
+    :param variant: string - feature implementation variant, see calculate_feature
+    :param kwargs: parameters for feature calculation
+    :return: pandas.Series or pandas.DataFrame - output of feature function
+    """
+    win_count = max(_window_count(len(series), window, step), 1)
+    if chunk_windows is None:
+        chunk_windows = math.ceil(win_count / (4 * threads)) if threads > 1 else win_count
+    chunk_windows = min(chunk_windows, _budget_chunk_windows(feature_info, window, threads))
+
+    feature_func = feature_info.implementation(variant)
+    if not feature_info.window_local:  # chunks would change output
+        chunk_windows = win_count
+    chunks = biolab_utilities.window_chunks(len(series), window, step, chunk_windows, feature_info.lookback)
+    if _memory_budget is not None:
+        instrumentation.record_event('chunking', feature=feature_info.name, window=window, step=step,
+                                     windows=win_count, chunk_windows=chunk_windows, chunks=len(chunks),
+                                     threads=threads, memory=feature_info.memory(window, chunk_windows) * threads,
+                                     memory_budget=_memory_budget)
+    if len(chunks) <= 1:
+        return feature_func(series, window=window, step=step, **kwargs)
+
+    def calculate_chunk(chunk):
+        chunk_start, chunk_stop, lookback = chunk
+        feature = feature_func(series.iloc[chunk_start:chunk_stop], window=window, step=step, **kwargs)
+        return feature.drop(index=_lookback_index(series, chunk_start, window, step, lookback), errors='ignore')
+
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return pd.concat(list(executor.map(calculate_chunk, chunks)))
+    else:
+        return pd.concat([calculate_chunk(chunk) for chunk in chunks])
+
+
+_memory_budget = int(os.environ['PUTEMG_MEMORY_BUDGET']) if os.environ.get('PUTEMG_MEMORY_BUDGET') else None
+
+
+def set_memory_budget(budget):
+    """
+    Sets global limit of temporary memory used by calculation of single feature of single channel, shared by its
+    threads. Windows of features whose estimated memory (see FeatureInfo.memory) exceeds the budget are calculated in
+    chunks fitting in it, see calculate_in_chunks. Initial budget is taken from PUTEMG_MEMORY_BUDGET environment
+    variable.
+    :param budget: int - memory budget in bytes, None for no limit
+    """
+    global _memory_budget
+    _memory_budget = budget
+
+
+def get_memory_budget():
+    return _memory_budget
+
+
+def _window_count(length, window, step):
+    return max(math.floor((length - window + step) / step), 0)
+
+
+def _budget_chunk_windows(feature_info, window, threads=1):
+    """Returns maximum number of windows (with lookback windows) per chunk fitting in memory budget, at least 1"""
+    window_memory = feature_info.memory(window)
+    if _memory_budget is None or window_memory <= 0:
+        return math.inf
+    chunk_windows = math.floor(_memory_budget / threads / window_memory) - feature_info.lookback
+    return max(chunk_windows, 1)
+
+
+_shared_signal_cache = None
+
+
+@contextmanager
+def shared_signals():
+    """
+    Context in which signals derived from record columns (eg. rectified signal prefix sums) are calculated once and
+    shared between feature calls on the same data, eg. for different windowing configurations. Record must not be
+    modified within the context.
+    """
+    global _shared_signal_cache
+    previous_cache = _shared_signal_cache
+    if previous_cache is None:
+        _shared_signal_cache = {}
+    try:
+        yield
+    finally:
+        _shared_signal_cache = previous_cache
+
+
+def _shared_signal(values: np.ndarray, key, func):
+    """
+    Returns func(values), cached within shared_signals context under given key. Data is identified by its memory
+    address, so different views of the same record column share signals, and each entry holds reference to its
+    values, so that memory is not freed and reused by other data within the context
+    """
+    if _shared_signal_cache is None:
+        return func(values)
+
+    cache_key = (values.__array_interface__['data'][0], values.strides, len(values), values.dtype.str) + key
+    entry = _shared_signal_cache.get(cache_key)
+    metrics.record_cache('shared_signals', entry is not None)
+    if entry is None:
+        entry = (values, func(values))
+        _shared_signal_cache[cache_key] = entry
+    return entry[1]
+
+
+def _window_sums(values: np.ndarray, window, step, key, func, lag=0):
+    """
+    Returns sums of signal func(values) over each window, calculated from its prefix sums. Signals derived
+    from differences of consecutive samples are shorter, so their window spans window - lag samples. Non-finite
+    values would spread to prefix sums of all following windows, so such signals are summed window by window.
+    """
+    prefix_sums = _shared_signal(values, ('prefix_sums',) + key, lambda x: np.concatenate(([0], np.cumsum(func(x)))))
+    if not np.isfinite(prefix_sums[-1]):
+        windows_strided, _ = biolab_utilities.moving_window_stride(values, window, step)
+        return np.sum(func(windows_strided), axis=1)
+    win_count = _window_count(len(values), window, step)
+    window_starts = np.arange(win_count) * step
+    return prefix_sums[window_starts + window - lag] - prefix_sums[window_starts]
+
+
+def _threshold_counts(statistic: np.ndarray, thresholds, inclusive=False):
+    """
+    Counts values of statistic over each of given thresholds in each row, in single pass over statistic: each value
+    is assigned number of thresholds it exceeds (searchsorted in sorted thresholds), counts of these numbers in each
+    row are cumulated from the highest
+    :param statistic: numpy.ndarray - 2D array, row for each window
+    :param thresholds: List[float] - thresholds
+    :param inclusive: bool - count values equal to threshold
+    :return: numpy.ndarray - counts, row for each window, column for each threshold
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    order = np.argsort(thresholds)
+    exceeded = np.searchsorted(thresholds[order], statistic, side='right' if inclusive else 'left')
+    exceeded[np.isnan(statistic)] = 0  # NaN is sorted after all thresholds, but exceeds none of them
+    rows = np.arange(len(statistic))[:, np.newaxis] * (len(thresholds) + 1)
+    histogram = np.bincount((exceeded + rows).ravel(), minlength=len(statistic) * (len(thresholds) + 1))
+    histogram = histogram.reshape(len(statistic), len(thresholds) + 1)
+    # values exceeding sorted threshold j are those exceeding more than j thresholds
+    counts = np.cumsum(histogram[:, :0:-1], axis=1)[:, ::-1]
+    output = np.empty_like(counts)
+    output[:, order] = counts
+    return output
+
+
+def _zero_crossings(values: np.ndarray, window, step, thresholds):
+    """
+    Returns number of sign changes between consecutive samples exceeding threshold (in absolute value) in each
+    window, column for each of given thresholds. Sign changes are marked once for whole signal, each kept sample
+    against previous kept sample, and summed over windows with prefix sums, except change of the first kept sample of
+    window, made with sample preceding window. All thresholds are handled in the same vectorised steps, with row of
+    kept samples for each threshold, so time and memory still grow linearly with number of thresholds.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64).reshape(-1, 1)
+    rows = np.arange(len(thresholds))[:, np.newaxis]
+    positions = np.arange(len(values))
+    kept = (values < -thresholds) | (values > thresholds)
+    positive = values > 0
+
+    previous = np.maximum.accumulate(np.where(kept, positions, -1), axis=1)
+    previous = np.concatenate((np.full((len(thresholds), 1), -1), previous[:, :-1]), axis=1)
+    changes = kept & (previous >= 0) & (positive[previous] != positive)
+    changes = np.concatenate((changes, np.zeros((len(thresholds), 1), dtype=bool)), axis=1)
+    change_sums = np.concatenate((np.zeros((len(thresholds), 1), dtype=np.int64), np.cumsum(changes, axis=1)), axis=1)
+
+    starts = np.arange(_window_count(len(values), window, step)) * step
+    ends = starts + window
+    first_kept = np.minimum.accumulate(np.where(kept, positions, len(values))[:, ::-1], axis=1)[:, ::-1]
+    first_kept = np.concatenate((first_kept, np.full((len(thresholds), 1), len(values))), axis=1)[:, starts]
+    counts = change_sums[:, ends] - change_sums[:, starts] - (changes[rows, first_kept] & (first_kept < ends))
+    return counts.T
+
+
+@lru_cache(maxsize=64)
+def _window_weights(shape, window, *params):
+    """
+    Returns weights of window samples of given shape, cached per window size (read-only), as building them in Python
+    costs more than applying them to small blocks of windows
+    :param shape: string - 'mav1' for MAV1 weights, 'trapezoidal' for trapezoidal window with slope given in params
+    """
+    if shape == 'mav1':
+        weights = np.array([1 if ((0.25*window <= i) & (i <= 0.75*window)) else 0.5 for i in range(1, window+1)])
+    else:
+        weights = biolab_utilities.window_trapezoidal(window, *params)
+    weights.setflags(write=False)
+    return weights
+
+
+metrics.register_lru_cache('window_weights', _window_weights)
+
+
+def _lookback_index(data, chunk_start, window, step, lookback):
+    """Returns index labels of lookback windows of chunk starting at given sample, see window_chunks"""
+    return data.index[chunk_start + window - 1:chunk_start + window - 1 + lookback * step:step]
 
 
 def features_from_xml(xml_file_url, hdf5_file_url):
@@ -87,29 +394,322 @@ def features_from_xml(xml_file_url, hdf5_file_url):
     return features_from_xml_on_df(xml_file_url, record)
 
 
-def features_from_xml_on_df(xml_file_url, record: pd.DataFrame):
-    feature_frame = pd.DataFrame()
+def features_from_xml_on_df(xml_file_url, record: pd.DataFrame, threads=1, output='pandas', profile_dir=None):
+    """
+    Calculates feature defined in given XML file containing feature names and parameters for given record.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - putEMG record
+    :param threads: int - number of threads calculating chunks of windows of each feature, see calculate_in_chunks
+    :param output: string - 'pandas' for pandas.DataFrame, 'result' for FeatureResult with feature values as single
+    NumPy block and remaining record columns (eg. TRAJ_GT) in FeatureResult.extra, eg. for model training
+    :param profile_dir: string - directory to write cProfile profile of each feature to, see profiling
+    :return: pandas.DataFrame - DataFrame containing output for all desired features
+    """
+    xml_root = ET.parse(xml_file_url).getroot()  # Load XML file with feature config
 
+    metrics.record_record(record)
+    if profile_dir is None:
+        return _features_from_xml_root_on_df(xml_root, record, threads=threads, output=output)
+    with profiling.profile_features(profile_dir):
+        return _features_from_xml_root_on_df(xml_root, record, threads=threads, output=output)
+
+
+def features_from_xml_on_df_multi(xml_file_url, record: pd.DataFrame, threads=1):
+    """
+    Calculates feature defined in given XML file for each of its windowing entries (eg. <windowing window="500"
+    step="250" /> and <windowing window="2500" step="1250" />) in one pass. Signals derived from record columns are
+    calculated once and shared between windowing configurations (see shared_signals), features having 'prefix' variant
+    are calculated from shared prefix sums.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - putEMG record
+    :param threads: int - number of threads calculating chunks of windows of each feature, see calculate_in_chunks
+    :return: Dict[Tuple[int, int], pandas.DataFrame] - DataFrame containing output for all desired features for each
+    (window, step) windowing configuration
+    """
+    xml_root = ET.parse(xml_file_url).getroot()  # Load XML file with feature config
+
+    metrics.record_record(record)
+    feature_frames = {}
+    with shared_signals():
+        for windowing_entry in xml_root.iter('windowing'):
+            windowing_options = biolab_utilities.convert_types_in_dict(windowing_entry.attrib)
+            feature_frames[(windowing_options['window'], windowing_options['step'])] = \
+                _features_from_xml_root_on_df(xml_root, record, threads=threads, windowing_options=windowing_options,
+                                              variant='prefix')
+    return feature_frames
+
+
+def iter_features_from_xml_on_df(xml_file_url, record: pd.DataFrame, chunk_windows=1000, threads=1):
+    """
+    Calculates feature defined in given XML file for given record in chunks of consecutive windows. Yields
+    DataFrames of at most chunk_windows rows each, concatenation of all yielded frames is equal to output of
+    features_from_xml_on_df. Memory used by feature calculation is proportional to chunk_windows, not record length,
+    except features which are not window local (see FeatureInfo.window_local, eg. MDF), calculated on whole record
+    before the first chunk and sliced to windows of each chunk.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - putEMG record
+    :param chunk_windows: int - maximum number of windows calculated at once
+    :param threads: int - number of threads calculating each feature of chunk, see calculate_in_chunks
+    :return: generator of pandas.DataFrame - DataFrames containing output for all desired features
+    """
     xml_root = ET.parse(xml_file_url).getroot()  # Load XML file with feature config
 
     windowing_entry = list(xml_root.iter('windowing'))[0]
     windowing_options = biolab_utilities.convert_types_in_dict(windowing_entry.attrib)
+    window = windowing_options['window']
+    step = windowing_options['step']
+
+    # Each chunk is extended with preceding windows required by features depending on previous windows, eg. MAVSLP
+    entries = _xml_feature_entries(xml_root)
+    lookback = max([feature_info.lookback for feature_info, _ in entries if feature_info.window_local] + [0])
+    metrics.record_record(record)
+    chunks = biolab_utilities.window_chunks(len(record), window, step, chunk_windows, lookback)
+    whole = {i: _calculate_entry(record, feature_info, attrib, window, step, threads=threads)
+             for i, (feature_info, attrib) in enumerate(entries) if not feature_info.window_local and chunks}
+
+    for start, stop, chunk_lookback in chunks:
+        first_window = start + window - 1 + chunk_lookback * step  # windows before are lookback windows
+        results = []
+        for i, (feature_info, attrib) in enumerate(entries):
+            if i in whole:
+                result = whole[i]
+                rows = (result.windows >= first_window) & (result.windows < stop)
+                results.append(FeatureResult(result.values[rows], result.windows[rows], result.columns,
+                                             dtypes=result.dtypes))
+            else:
+                result = _calculate_entry(record.iloc[start:stop], feature_info, attrib, window, step,
+                                          threads=threads)
+                rows = result.windows >= first_window - start
+                results.append(FeatureResult(result.values[rows], result.windows[rows] + start, result.columns,
+                                             dtypes=result.dtypes))
+        yield _join_record_results(xml_root, record, results).to_pandas()
+
+
+def features_from_xml_on_df_sharded(xml_file_url, record: pd.DataFrame, shards=None, workers=None,
+                                    executor='process', output='pandas'):
+    """
+    Calculates feature defined in given XML file for given record split into time shards calculated in parallel
+    workers. Shards are ranges of consecutive windows, so they start at multiples of step and overlap by window - step
+    samples, each shard is extended with preceding windows required by features depending on previous windows, eg.
+    MAVSLP. Output is equal to output of features_from_xml_on_df. Features which are not window local (see
+    FeatureInfo.window_local, eg. MDF) are calculated on whole record in calling process.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - putEMG record
+    :param shards: int - number of shards, number of workers by default
+    :param workers: int - number of parallel workers, number of CPUs by default
+    :param executor: string - 'process' for worker processes, also for features holding GIL (see
+    FeatureInfo.batched), or 'thread' for threads, avoiding copying shards to worker processes
+    :param output: string - 'pandas' for pandas.DataFrame, 'result' for FeatureResult, see features_from_xml_on_df
+    :return: pandas.DataFrame - DataFrame containing output for all desired features
+    """
+    xml_root = ET.parse(xml_file_url).getroot()  # Load XML file with feature config
+    windowing_options = biolab_utilities.convert_types_in_dict(list(xml_root.iter('windowing'))[0].attrib)
+    window = windowing_options['window']
+    step = windowing_options['step']
+
+    entries = _xml_feature_entries(xml_root)
+    sharded = [(feature_info, attrib) for feature_info, attrib in entries if feature_info.window_local]
+    lookback = max([feature_info.lookback for feature_info, _ in sharded] + [0])
+
+    metrics.record_record(record)
+    workers = workers or os.cpu_count()
+    shards = shards or workers
+    win_count = max(_window_count(len(record), window, step), 1)
+    chunks = biolab_utilities.window_chunks(len(record), window, step, math.ceil(win_count / shards), lookback)
+    if not chunks:  # record shorter than one window, empty output of serial calculation
+        return _features_from_xml_root_on_df(xml_root, record, output=output)
+
+    if executor == 'process':
+        pool = ProcessPoolExecutor(max_workers=workers)
+    elif executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=workers)
+    else:
+        raise ValueError(executor + ' is not a valid executor type')
+    with pool:
+        # Features are passed by name, so worker processes do not have to unpickle feature functions
+        names = [(feature_info.kind, feature_info.name, attrib) for feature_info, attrib in sharded]
+        futures = [pool.submit(_calculate_shard, names, record.iloc[start:stop], start, window, step, chunk_lookback)
+                   for start, stop, chunk_lookback in chunks]
+        shard_results = [future.result() for future in futures]
+
+    results = []
+    sharded_results = iter(zip(*shard_results))
+    for feature_info, attrib in entries:
+        if feature_info.window_local:
+            results.append(concat_results(next(sharded_results)))
+        else:
+            results.append(_calculate_entry(record, feature_info, attrib, window, step))
+    return _convert_result(_join_record_results(xml_root, record, results), output)
+
+
+def features_from_xml_on_df_fused(xml_file_url, record: pd.DataFrame, cache_bytes=2 ** 22, output='pandas'):
+    """
+    Calculates feature defined in given XML file for given record with time-domain features fused: windows of each
+    channel are split into blocks whose temporary memory (see FeatureInfo.memory) fits in cache, and all time-domain
+    features are calculated on a block before moving to the next one, so record is read from memory once instead of
+    once per feature. Spectral features and features which are not window local are calculated as usual. Output is
+    equal to output of features_from_xml_on_df. Processed bytes, time, achieved bandwidth (bytes of record channels
+    per second) and window throughput (bytes of windows of all fused features per second, overlapping samples counted
+    in each window) are recorded as 'fused_execution' instrumentation event.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - putEMG record
+    :param cache_bytes: int - cache size available for temporary arrays of single feature, eg. L2 or L3 size per core,
+    smaller blocks increase per-call overhead of NumPy operations
+    :param output: string - 'pandas' for pandas.DataFrame, 'result' for FeatureResult, see features_from_xml_on_df
+    :return: pandas.DataFrame - DataFrame containing output for all desired features
+    """
+    xml_root = ET.parse(xml_file_url).getroot()  # Load XML file with feature config
+    windowing_options = biolab_utilities.convert_types_in_dict(list(xml_root.iter('windowing'))[0].attrib)
+    window = windowing_options['window']
+    step = windowing_options['step']
+
+    entries = _xml_feature_entries(xml_root)
+    kernels = {}
+    for i, (feature_info, attrib) in enumerate(entries):
+        kernel = getattr(feature_info.implementation(tuning.tuned_variant(feature_info.name, window, step)), 'kernel',
+                         None)
+        if kernel is not None and feature_info.batched and not feature_info.spectral and feature_info.window_local:
+            kernels[i] = kernel
+
+    lookback = max([entries[i][0].lookback for i in kernels] + [0])
+    block_windows = max(math.floor(cache_bytes / max([entries[i][0].memory(window) for i in kernels] + [1])), 1)
+    blocks = biolab_utilities.window_chunks(len(record), window, step, block_windows, lookback)
+    if not blocks:  # record shorter than window
+        kernels = {}
+
+    metrics.record_record(record)
+    column_regexes = {'emg': r"EMG_\d+", 'force': r"FORCE_\d+"}
+    fused = {}  # (entry, column) -> list of (data, windows) of blocks
+    feature_seconds = dict.fromkeys(kernels, 0.0)
+    start_time = time.perf_counter()
+    window_bytes = 0
+    for kind, column_regex in column_regexes.items():
+        kind_kernels = [(i, kernels[i]) for i in kernels if entries[i][0].kind == kind]
+        for column in (record.filter(regex=column_regex) if kind_kernels else []):
+            values = record[column].values
+            for block_start, block_stop, block_lookback in blocks:
+                block = values[block_start:block_stop]
+                first_window = window - 1 + block_lookback * step  # windows before are lookback windows
+                for i, kernel in kind_kernels:
+                    kernel_start = time.perf_counter()
+                    data, windows = kernel(block, window, step, **entries[i][1])
+                    rows = np.asarray(windows) >= first_window
+                    fused.setdefault((i, column), []).append((np.asarray(data)[rows], np.asarray(windows)[rows] +
+                                                              block_start))
+                    feature_seconds[i] += time.perf_counter() - kernel_start
+                window_bytes += len(kind_kernels) * _window_count(len(block), window, step) * window * \
+                    values.itemsize
+    elapsed = time.perf_counter() - start_time
+    if kernels:
+        record_bytes = sum(record.filter(regex=column_regexes[kind]).values.nbytes
+                           for kind in {entries[i][0].kind for i in kernels})
+        instrumentation.record_event('fused_execution', features=[entries[i][0].name for i in kernels],
+                                     window=window, step=step, block_windows=block_windows, blocks=len(blocks),
+                                     record_bytes=record_bytes, window_bytes=window_bytes, seconds=elapsed,
+                                     bandwidth=record_bytes / elapsed if elapsed > 0 else math.inf,
+                                     window_throughput=window_bytes / elapsed if elapsed > 0 else math.inf)
+
+    results = []
+    for i, (feature_info, attrib) in enumerate(entries):
+        if i not in kernels:
+            results.append(_calculate_entry(record, feature_info, attrib, window, step))
+            continue
+        label_prefix = ('FORCE_' if feature_info.kind == 'force' else '') + feature_info.name + '_'
+        column_results = []
+        for column in record.filter(regex=column_regexes[feature_info.kind]):
+            data, windows = zip(*fused[(i, column)])
+            column_results.append(FeatureResult.from_feature(np.concatenate(data), np.concatenate(windows),
+                                                             label_prefix + column.split('_')[1], record.index))
+        results.append(join_results(column_results))
+        metrics.record_feature(feature_info.name, feature_seconds[i], sum(len(r) for r in column_results))
+    return _convert_result(_join_record_results(xml_root, record, results), output)
+
+
+def _xml_feature_entries(xml_root):
+    """Returns FeatureInfo and attributes (without name) of each feature and force feature entry in XML config"""
+    entries = []
+    for tag, kind in [('feature', 'emg'), ('force_feature', 'force'), ('cross_feature', 'cross')]:
+        for xml_entry in xml_root.iter(tag):
+            attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+            entries.append((get_feature(attrib.pop('name'), kind=kind), attrib))
+    return entries
+
+
+def _calculate_entry(record: pd.DataFrame, feature_info, attrib, window, step, threads=1) -> FeatureResult:
+    if feature_info.kind == 'force':
+        return calculate_force_feature(record, feature_info.name, threads=threads, verbose=False, output='result',
+                                       window=window, step=step, **attrib)
+    if feature_info.kind == 'cross':
+        return calculate_cross_feature(record, feature_info.name, verbose=False, output='result', window=window,
+                                       step=step, **attrib)
+    return calculate_feature(record, feature_info.name, threads=threads, verbose=False, output='result',
+                             window=window, step=step, **attrib)
+
+
+def _calculate_shard(entries, shard: pd.DataFrame, start, window, step, lookback):
+    """Returns result of each feature entry for record shard starting at given sample, without lookback windows"""
+    results = []
+    for kind, name, attrib in entries:
+        result = _calculate_entry(shard, get_feature(name, kind=kind), attrib, window, step)
+        rows = result.windows >= window - 1 + lookback * step
+        results.append(FeatureResult(result.values[rows], result.windows[rows] + start, result.columns,
+                                     dtypes=result.dtypes))
+    return results
+
+
+def features_from_xml_to_file(xml_file_url, record: pd.DataFrame, output_url, file_format='hdf5',
+                              chunk_windows=1000, **writer_kwargs):
+    """
+    Calculates feature defined in given XML file for given record and appends them to columnar output file chunk by
+    chunk, see iter_features_from_xml_on_df and FeatureWriter.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - putEMG record
+    :param output_url: string - url to output file
+    :param file_format: string - 'hdf5' or 'arrow', see FeatureWriter
+    :param chunk_windows: int - maximum number of windows calculated and written at once
+    :param writer_kwargs: additional FeatureWriter parameters
+    :return: int - number of rows written
+    """
+    with FeatureWriter(output_url, file_format=file_format, **writer_kwargs) as writer:
+        for feature_frame in iter_features_from_xml_on_df(xml_file_url, record, chunk_windows=chunk_windows):
+            writer.write(feature_frame)
+        return writer.rows
+
+
+def _features_from_xml_root_on_df(xml_root, record: pd.DataFrame, threads=1, windowing_options=None, variant=None,
+                                  output='pandas'):
+    results = []
+
+    if windowing_options is None:  # Use first windowing entry by default
+        windowing_entry = list(xml_root.iter('windowing'))[0]
+        windowing_options = biolab_utilities.convert_types_in_dict(windowing_entry.attrib)
 
     for xml_entry in xml_root.iter('feature'):  # For each feature entry in XML file
         # Convert attribute dictionary to Python literals
-        xml_entry.attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
-        # add to output frame values calculated by each feature function
-        feature_frame = feature_frame.join(calculate_feature(record, **xml_entry.attrib,
-                                                             window=windowing_options['window'],
-                                                             step=windowing_options['step']), how="outer")
+        attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+        # add to output values calculated by each feature function
+        results.append(calculate_feature(record, **attrib, threads=threads, variant=variant, output='result',
+                                         window=windowing_options['window'], step=windowing_options['step']))
 
     for xml_entry in xml_root.iter('force_feature'):  # For each force feature entry in XML file
         # Convert attribute dictionary to Python literals
-        xml_entry.attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
-        # add to output frame values calculated by each feature function
-        feature_frame = feature_frame.join(calculate_force_feature(record, **xml_entry.attrib,
-                                                                   window=windowing_options['window'],
-                                                                   step=windowing_options['step']), how="outer")
+        attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+        # add to output values calculated by each feature function
+        results.append(calculate_force_feature(record, **attrib, threads=threads, variant=variant, output='result',
+                                               window=windowing_options['window'], step=windowing_options['step']))
+
+    for xml_entry in xml_root.iter('cross_feature'):  # For each cross-channel feature entry in XML file
+        attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+        results.append(calculate_cross_feature(record, **attrib, verbose=False, output='result',
+                                               window=windowing_options['window'], step=windowing_options['step']))
+
+    return _convert_result(_join_record_results(xml_root, record, results), output)
+
+
+def _join_record_results(xml_root, record: pd.DataFrame, results) -> FeatureResult:
+    """Joins feature results of record, adding values of its other columns (eg. TRAJ_GT) at window ends"""
+    result = join_results(results)
+    result.index = record.index
 
     if len(list(xml_root.iter('force_feature'))):
         re = "(^(?!EMG_|FORCE_).*)"
@@ -117,39 +717,159 @@ def features_from_xml_on_df(xml_file_url, record: pd.DataFrame):
         re = "^(?!EMG_).*"
 
     for other_data in list(record.filter(regex=re)):
-        feature_frame[other_data] = record.loc[feature_frame.index, other_data]
+        result.extra[other_data] = record[other_data].values[result.windows]
+
+    return result
+
+
+def calculate_feature_batch(records: List[pd.DataFrame], name, variant=None, output='pandas', **kwargs):
+    """
+    Calculates feature given name of many records at once, see calculate_feature. Channels of all records are stacked
+    into single signal, so feature kernel is called once per batch instead of once per channel of each record, which
+    saves per-call overhead for short records or small windows. Output of each record is equal to calculate_feature.
+    :param records: List[pandas.DataFrame] - input DataFrames
+    :param name: string - name of the requested feature
+    :param variant: string - feature implementation variant, see calculate_feature
+    :param output: string - 'pandas' for pandas.DataFrame, 'result' for FeatureResult holding raw arrays
+    :param kwargs: parameters for feature calculation, including window and step
+    :return: List[pandas.DataFrame] - output of desired feature for each record
+    """
+    results = _calculate_feature_batch(records, get_feature(name), r"EMG_\d+", name + '_', variant, **kwargs)
+    return [_convert_result(join_results(record_results), output) for record_results in results]
 
-    return feature_frame
 
+def _calculate_feature_batch(records: List[pd.DataFrame], feature_info, column_regex, label_prefix, variant, window,
+                             step, **kwargs) -> List[List[FeatureResult]]:
+    """Returns results of each column of each record, see calculate_feature_batch"""
+    if variant is None:
+        variant = tuning.tuned_variant(feature_info.name, window, step)
+    feature_func = feature_info.implementation(variant)
+    kernel = getattr(feature_func, 'kernel', None)
+    if kernel is None or not feature_info.window_local:  # calculated per record
+        return [[_calculate_feature_columns(record, feature_info, column_regex, label_prefix, 1, False, variant,
+                                            window=window, step=step, **kwargs)] for record in records]
 
-def feature_iav(series, window, step):
+    start = time.time()
+    results = [[] for _ in records]
+    # Windows of stacked signal start at multiples of step, so each column is padded to multiple of step, to keep
+    # windows of each column aligned with its own windows. Windows crossing columns boundaries and windows without
+    # their lookback windows in the same column are dropped.
+    min_length = window + feature_info.lookback * step
+    max_windows = _budget_chunk_windows(feature_info, window)
+    batch = []
+    batch_windows = 0
+    columns = [(r, column) for r, record in enumerate(records) for column in record.filter(regex=column_regex)]
+    for position, (r, column) in enumerate(columns):
+        record = records[r]
+        if len(record) < min_length:  # no complete window, calculated alone for the same output shape
+            data, windows = kernel(record[column].values, window, step, **kwargs)
+            results[r].append(FeatureResult.from_feature(data, windows, label_prefix + column.split('_')[1],
+                                                         record.index))
+        else:
+            batch.append((r, column))
+            batch_windows += math.ceil(len(record) / step)
+        if batch and (batch_windows >= max_windows or position == len(columns) - 1):
+            _calculate_batch(records, batch, kernel, feature_info.lookback, label_prefix, window, step, results,
+                             **kwargs)
+            batch = []
+            batch_windows = 0
+    metrics.record_feature(feature_info.name, time.time() - start,
+                           sum(len(result) for record_results in results for result in record_results))
+    return results
+
+
+def _calculate_batch(records, batch, kernel, lookback, label_prefix, window, step, results, **kwargs):
+    lengths = np.array([len(records[r]) for r, _ in batch])
+    offsets = np.concatenate(([0], np.cumsum(np.ceil(lengths / step).astype(np.int64) * step)[:-1]))
+    values = np.concatenate([np.pad(records[r][column].values, (0, math.ceil(length / step) * step - length),
+                                    mode='edge') for (r, column), length in zip(batch, lengths)])
+
+    data, windows = kernel(values, window, step, **kwargs)
+    data = np.asarray(data)
+    windows = np.asarray(windows)
+
+    segments = np.searchsorted(offsets, windows, side='right') - 1
+    local_windows = windows - offsets[segments]
+    keep = (local_windows < lengths[segments]) & (local_windows - window + 1 >= lookback * step)
+    data, local_windows, segments = data[keep], local_windows[keep], segments[keep]
+
+    bounds = np.searchsorted(segments, np.arange(len(batch) + 1))
+    for segment, (r, column) in enumerate(batch):
+        rows = slice(bounds[segment], bounds[segment + 1])
+        results[r].append(FeatureResult.from_feature(data[rows], local_windows[rows],
+                                                     label_prefix + column.split('_')[1], records[r].index))
+
+
+def features_from_xml_on_dfs(xml_file_url, records: List[pd.DataFrame], output='pandas'):
+    """
+    Calculates features defined in given XML file for many records at once, each feature kernel is called once per
+    batch of stacked records, see calculate_feature_batch. Useful for many short records, eg. all sessions of subject.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param records: List[pandas.DataFrame] - input DataFrames
+    :param output: string - 'pandas' for pandas.DataFrame, 'result' for FeatureResult holding raw arrays
+    :return: List[pandas.DataFrame] - output of features_from_xml_on_df for each record
+    """
+    xml_root = ET.parse(xml_file_url).getroot()
+    windowing_options = biolab_utilities.convert_types_in_dict(list(xml_root.iter('windowing'))[0].attrib)
+
+    for record in records:
+        metrics.record_record(record)
+    results = [[] for _ in records]
+    for tag, column_regex, prefix, kind in [('feature', r"EMG_\d+", '', 'emg'),
+                                            ('force_feature', r"FORCE_\d+", 'FORCE_', 'force')]:
+        for xml_entry in xml_root.iter(tag):
+            attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+            name = attrib.pop('name')
+            feature_results = _calculate_feature_batch(records, get_feature(name, kind=kind), column_regex,
+                                                       prefix + name + '_', None, window=windowing_options['window'],
+                                                       step=windowing_options['step'], **attrib)
+            for record_results, feature_result in zip(results, feature_results):
+                record_results.append(join_results(feature_result))
+    for xml_entry in xml_root.iter('cross_feature'):  # all channels of each record are already calculated at once
+        attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+        for record, record_results in zip(records, results):
+            record_results.append(calculate_cross_feature(record, **attrib, verbose=False, output='result',
+                                                          window=windowing_options['window'],
+                                                          step=windowing_options['step']))
+
+    return [_convert_result(_join_record_results(xml_root, record, record_results), output)
+            for record, record_results in zip(records, results)]
+
+
+@register_feature('IAV', ns_per_sample=3, bytes_per_sample=8)
+@window_kernel
+def feature_iav(values, window, step):
     """Integral Absolute Value"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sum(np.abs(windows_strided), axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.abs(windows_strided), axis=1), indexes
 
 
-def feature_aac(series, window, step):
+@register_feature('AAC', ns_per_sample=3, bytes_per_sample=16)
+@window_kernel
+def feature_aac(values, window, step):
     """Average Amplitude Change"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.divide(np.sum(np.abs(np.diff(windows_strided)), axis=1), window),
-                     index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.divide(np.sum(np.abs(np.diff(windows_strided)), axis=1), window), indexes
 
 
-def feature_apen(series, window, step, m, r):
+@register_feature('ApEn', complexity=2, batched=False, ns_per_sample=80, bytes_per_sample=60)
+@window_kernel
+def feature_apen(values, window, step, m, r):
     """Approximate Entropy
     AnEn feature is using PyEEG library v0.4.0 as it is, licensed with GNU GPL v3
-    http://pyeeg.org"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.apply_along_axis(lambda win: pyeeg.ap_entropy(win, m, r),
-                                              axis=1, arr=windows_strided), index=series.index[indexes])
+    http://pyeeg.org
+    or its equivalent compiled implementation, see kernels.ap_entropy"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.apply_along_axis(lambda win: kernels.ap_entropy(win, m, r), axis=1, arr=windows_strided), indexes
 
 
-def feature_ar(series, window, step, order) -> pd.DataFrame:
+@register_feature('AR', batched=False, multi_column=True, ns_per_sample=80, bytes_per_sample=64)
+@window_kernel
+def feature_ar(values, window, step, order):
     """Auto-Regressive Coefficients"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
 
-    column_names = [str(i) for i in range(0, order)]
-    win_coefs = pd.DataFrame(index=series.index[indexes], columns=column_names, dtype=np.float64)
+    win_coefs = np.empty((len(windows_strided), order), dtype=np.float64)
 
     for widx in range(len(windows_strided)):
         stride = windows_strided[widx].strides[0]
@@ -159,312 +879,365 @@ def feature_ar(series, window, step, order) -> pd.DataFrame:
 
         a, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
 
-        win_coefs.loc[series.index[indexes[widx]], :] = a
-    return win_coefs
+        win_coefs[widx, :] = a
+    return win_coefs, indexes
 
 
-def feature_cc(series, window, step, order):
+@register_feature('CC', batched=False, multi_column=True, ns_per_sample=90, bytes_per_sample=64)
+@window_kernel
+def feature_cc(values, window, step, order):
     """Cepstral Coefficients"""
-    win_coefs = feature_ar(series, window, step, order)
-    coefs = win_coefs.values
+    coefs, indexes = feature_ar.kernel(values, window, step, order)
     coefs[:, 0] = -coefs[:, 0]
     for r in range(0, coefs.shape[0]):
         for p in range(1, order):
             coefs[r, p] = -coefs[r, p] - np.sum(
                 [1 - (l / (p + 1)) for l in range(1, p + 1)] * np.full(p, coefs[r, p] * coefs[r, p - 1]))
-    win_coefs.loc[:, :] = coefs
-    return win_coefs
+    return coefs, indexes
 
 
-def feature_dasdv(series, window, step):
+@register_feature('DASDV', ns_per_sample=4, bytes_per_sample=16)
+@window_kernel
+def feature_dasdv(values, window, step):
     """Difference Absolute Standard Deviation Value"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sqrt(np.mean(np.square(np.diff(windows_strided)), axis=1)), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sqrt(np.mean(np.square(np.diff(windows_strided)), axis=1)), indexes
 
 
-def feature_kurt(series, window, step):
+@register_feature('Kurt', ns_per_sample=22, bytes_per_sample=24)
+@window_kernel
+def feature_kurt(values, window, step):
     """Kurtosis"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=stats.kurtosis(windows_strided, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return stats.kurtosis(windows_strided, axis=1), indexes
 
 
-def feature_log(series, window, step):
+@register_feature('LOG', ns_per_sample=3, bytes_per_sample=16)
+@window_kernel
+def feature_log(values, window, step):
     """Log Detector"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.exp(np.mean(np.log(np.abs(windows_strided)), axis=1)), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.exp(np.mean(np.log(np.abs(windows_strided)), axis=1)), indexes
 
 
-def feature_mav1(series, window, step):
+@register_feature('MAV1', ns_per_sample=16, bytes_per_sample=16)
+@window_kernel
+def feature_mav1(values, window, step):
     """Modified Mean Absolute Value Type 1"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    win_weight = [1 if ((0.25*window <= i) & (i <= 0.75*window)) else 0.5 for i in range(1, window+1)]
-    return pd.Series(data=np.mean(np.abs(windows_strided) * win_weight, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.mean(np.abs(windows_strided) * _window_weights('mav1', window), axis=1), indexes
 
 
-def feature_mav2(series, window, step):
+@register_feature('MAV2', ns_per_sample=23, bytes_per_sample=16)
+@window_kernel
+def feature_mav2(values, window, step):
     """Modified Mean Absolute Value Type 2"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    win_weight = biolab_utilities.window_trapezoidal(window, 0.25)
-    return pd.Series(data=np.mean(np.abs(windows_strided) * win_weight, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.mean(np.abs(windows_strided) * _window_weights('trapezoidal', window, 0.25), axis=1), indexes
 
 
-def feature_mav(series, window, step):
+@register_feature('MAV', ns_per_sample=2, bytes_per_sample=8)
+@window_kernel
+def feature_mav(values, window, step):
     """Mean Absolute Value"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.mean(np.abs(windows_strided), axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.mean(np.abs(windows_strided), axis=1), indexes
 
 
-def feature_mavslp(series, window, step):
+@register_feature('MAVSLP', lookback=1, ns_per_sample=2, bytes_per_sample=8)
+@window_kernel
+def feature_mavslp(values, window, step):
     """Mean Absolute Value Slope"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.diff(np.mean(np.abs(windows_strided), axis=1)), index=series.index[indexes[1:]])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.diff(np.mean(np.abs(windows_strided), axis=1)), indexes[1:]
 
 
-def feature_mhw(series, window, step):
+@register_feature('MHW', ns_per_sample=3, bytes_per_sample=16)
+@window_kernel
+def feature_mhw(values, window, step):
     """Multiple Hamming Windows"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sum(np.square(windows_strided * np.hamming(window)), axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.square(windows_strided * np.hamming(window)), axis=1), indexes
 
 
-def feature_mtw(series, window, step, windowslope):
+@register_feature('MTW', ns_per_sample=22, bytes_per_sample=16)
+@window_kernel
+def feature_mtw(values, window, step, windowslope):
     """Multiple Trapezoidal Windows"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sum(np.square(windows_strided) * biolab_utilities.window_trapezoidal(window, windowslope),
-                                 axis=1),
-                     index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.square(windows_strided) * _window_weights('trapezoidal', window, windowslope), axis=1), indexes
 
 
-def feature_myop(series, window, step, threshold):
-    """Myopulse Percentage Rate"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sum(windows_strided > threshold, axis=1) / window, index=series.index[indexes])
+@register_feature('MYOP', ns_per_sample=2, bytes_per_sample=1)
+@window_kernel
+def feature_myop(values, window, step, threshold):
+    """Myopulse Percentage Rate
+    threshold can be list of thresholds, counted in single pass, with column for each threshold"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    if np.ndim(threshold) == 0:
+        return np.sum(windows_strided > threshold, axis=1) / window, indexes
+    return _threshold_counts(windows_strided, threshold, inclusive=False) / window, indexes
 
 
-def feature_rms(series, window, step):
+@register_feature('RMS', ns_per_sample=2, bytes_per_sample=8)
+@window_kernel
+def feature_rms(values, window, step):
     """Root Mean Square"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sqrt(np.mean(np.square(windows_strided), axis=1)), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sqrt(np.mean(np.square(windows_strided), axis=1)), indexes
 
 
-def feature_sampleen(series, window, step, m, r):
+@register_feature('SampleEn', complexity=2, batched=False, ns_per_sample=83, bytes_per_sample=60)
+@window_kernel
+def feature_sampleen(values, window, step, m, r):
     """Sample Entropy
     SampEn feature is using PyEEG library v 0.02_r2 as it is, licensed with GNU GPL v3
-    http://pyeeg.sourceforge.net/"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.apply_along_axis(lambda win: pyeeg.samp_entropy(win, m, r), axis=1, arr=windows_strided),
-                     index=series.index[indexes])
+    http://pyeeg.sourceforge.net/
+    or its equivalent compiled implementation, see kernels.samp_entropy"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.apply_along_axis(lambda win: kernels.samp_entropy(win, m, r), axis=1, arr=windows_strided), indexes
 
 
-def feature_skew(series, window, step):
+@register_feature('Skew', ns_per_sample=25, bytes_per_sample=24)
+@window_kernel
+def feature_skew(values, window, step):
     """Skewness"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=stats.skew(windows_strided, axis=1), index=series.index[indexes])
-
-
-def feature_ssc(series, window, step, threshold):
-    """Slope Sign Change"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.apply_along_axis(lambda x: np.sum((np.diff(x[:-1]) * np.diff(x[1:])) <= -threshold),
-                                              axis=1, arr=windows_strided), index=series.index[indexes])
-
-
-def feature_ssi(series, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return stats.skew(windows_strided, axis=1), indexes
+
+
+@register_feature('SSC', ns_per_sample=10, bytes_per_sample=24)
+@window_kernel
+def feature_ssc(values, window, step, threshold):
+    """Slope Sign Change
+    threshold can be list of thresholds, counted in single pass, with column for each threshold"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    differences = np.diff(windows_strided)
+    slope_products = differences[:, :-1] * differences[:, 1:]
+    if np.ndim(threshold) == 0:
+        return np.sum(slope_products <= -threshold, axis=1), indexes
+    return _threshold_counts(-slope_products, threshold, inclusive=True), indexes
+
+
+@register_feature('SSI', ns_per_sample=3, bytes_per_sample=8)
+@window_kernel
+def feature_ssi(values, window, step):
     """Simple Square Integral"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sum(np.square(windows_strided), axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.square(windows_strided), axis=1), indexes
 
 
-def feature_tm(series, window, step, order):
+@register_feature('TM', ns_per_sample=71, bytes_per_sample=8)
+@window_kernel
+def feature_tm(values, window, step, order):
     """Absolute Temporal Moment"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.abs(np.mean(np.power(windows_strided, order), axis=1)), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.abs(np.mean(np.power(windows_strided, order), axis=1)), indexes
 
 
-def feature_var(series, window, step):
+@register_feature('VAR', ns_per_sample=6, bytes_per_sample=16)
+@window_kernel
+def feature_var(values, window, step):
     """Variance"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.var(windows_strided, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.var(windows_strided, axis=1), indexes
 
 
-def feature_v(series, window, step, v):
+@register_feature('V', ns_per_sample=82, bytes_per_sample=8)
+@window_kernel
+def feature_v(values, window, step, v):
     """V-Order"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.power(np.abs(np.mean(np.power(windows_strided, v), axis=1)), 1./v),
-                     index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.power(np.abs(np.mean(np.power(windows_strided, v), axis=1)), 1./v), indexes
 
 
-def feature_wamp(series, window, step, threshold):
-    """Willison Amplitude"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sum(np.diff(windows_strided) >= threshold, axis=1), index=series.index[indexes])
+@register_feature('WAMP', ns_per_sample=9, bytes_per_sample=9)
+@window_kernel
+def feature_wamp(values, window, step, threshold):
+    """Willison Amplitude
+    threshold can be list of thresholds, counted in single pass, with column for each threshold"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    if np.ndim(threshold) == 0:
+        return np.sum(np.diff(windows_strided) >= threshold, axis=1), indexes
+    return _threshold_counts(np.diff(windows_strided), threshold, inclusive=True), indexes
 
 
-def feature_wl(series, window, step):
+@register_feature('WL', ns_per_sample=4, bytes_per_sample=8)
+@window_kernel
+def feature_wl(values, window, step):
     """Waveform Length"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.sum(np.diff(windows_strided), axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.diff(windows_strided), axis=1), indexes
 
 
-def feature_zc(series, window, step, threshold):
-    """Zero Crossing"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    zc = np.apply_along_axis(lambda x: np.sum(np.diff(x[(x < -threshold) | (x > threshold)] > 0)), axis=1,
-                             arr=windows_strided)
-    return pd.Series(data=zc, index=series.index[indexes])
+@register_feature('ZC', ns_per_sample=23, bytes_per_sample=10)
+@window_kernel
+def feature_zc(values, window, step, threshold):
+    """Zero Crossing
+    Sign changes between consecutive samples of window exceeding threshold, counted once for whole signal, see
+    _zero_crossings. threshold can be list of thresholds, with column for each threshold, all calculated at once"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    counts = _zero_crossings(values, window, step, threshold)
+    return (counts[:, 0] if np.ndim(threshold) == 0 else counts), indexes
 
 
-def feature_mnf(series, window, step):
+@register_feature('MNF', spectral=True, ns_per_sample=28, bytes_per_sample=24)
+@window_kernel
+def feature_mnf(values, window, step):
     """Mean Frequency"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-    return pd.Series(data=np.sum(power*freq, axis=1) / np.sum(power, axis=1), index=series.index[indexes])
-
-
-def feature_mdf(series, window, step):
-    """Median Frequency"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-    ttp_half = np.sum(power, axis=1)/2
-    mdf = np.zeros(len(windows_strided))
-    for w in range(len(power)):
-        for s in range(1, len(power) + 1):
-            if np.sum(power[w, :s]) > ttp_half[w]:
-                mdf[w] = freq[s - 1]
-                break
-    return pd.Series(data=mdf, index=series.index[indexes])
-
-
-def feature_pkf(series, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
+    return np.sum(power*freq, axis=1) / np.sum(power, axis=1), indexes
+
+
+@register_feature('MDF', spectral=True, batched=False, window_local=False, ns_per_sample=57,
+                  bytes_per_sample=24)
+@window_kernel
+def feature_mdf(values, window, step):
+    """Median Frequency
+    As in original implementation, only the first (number of windows) frequency bins are searched, so the value of
+    each window depends on the number of windows calculated at once"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
+    return kernels.median_frequency(freq, power), indexes
+
+
+@register_feature('PKF', spectral=True, ns_per_sample=25, bytes_per_sample=24)
+@window_kernel
+def feature_pkf(values, window, step):
     """Peak Frequency"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-    return pd.Series(data=freq[np.argmax(power, axis=1)], index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
+    return freq[np.argmax(power, axis=1)], indexes
 
 
-def feature_mnp(series, window, step):
+@register_feature('MNP', spectral=True, ns_per_sample=6, bytes_per_sample=16)
+@window_kernel
+def feature_mnp(values, window, step):
     """Mean Power"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-    return pd.Series(data=np.mean(power, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return spectrum.total_power(windows_strided, 5120) / len(spectrum.periodogram_frequencies(window, 5120)), indexes
 
 
-def feature_ttp(series, window, step):
+@register_feature('TTP', spectral=True, ns_per_sample=6, bytes_per_sample=16)
+@window_kernel
+def feature_ttp(values, window, step):
     """Total Power"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-    return pd.Series(data=np.sum(power, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return spectrum.total_power(windows_strided, 5120), indexes
 
 
-def feature_sm(series, window, step, order):
+@register_feature('SM', spectral=True, ns_per_sample=28, bytes_per_sample=24)
+@window_kernel
+def feature_sm(values, window, step, order):
     """Spectral Moment"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-    return pd.Series(data=np.sum(power * np.power(freq, order), axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
+    return np.sum(power * np.power(freq, order), axis=1), indexes
 
 
-def feature_fr(series, window, step, flb, fhb):
+@register_feature('FR', spectral=True, ns_per_sample=26, bytes_per_sample=24)
+@window_kernel
+def feature_fr(values, window, step, flb, fhb):
     """Frequency Ratio"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120, max_frequency=max(flb[1], fhb[1]))
     lb = np.sum(power[:, (flb[0] < freq) & (freq < flb[1])], axis=1)
     hb = np.sum(power[:, (fhb[0] < freq) & (freq < fhb[1])], axis=1)
-    return pd.Series(data=(lb / hb), index=series.index[indexes])
+    return lb / hb, indexes
 
 
-def feature_vcf(series, window, step):
+@register_feature('VCF', spectral=True, ns_per_sample=29, bytes_per_sample=24)
+@window_kernel
+def feature_vcf(values, window, step):
     """Variance of Central Frequency"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
 
     def sm(order):
         return np.sum(power * np.power(freq, order), axis=1)
 
-    return pd.Series(data=sm(2)/sm(0) - np.square(sm(1)/sm(0)), index=series.index[indexes])
+    return sm(2)/sm(0) - np.square(sm(1)/sm(0)), indexes
 
 
-def feature_psr(series, window, step, n):
+@register_feature('PSR', spectral=True, batched=False, ns_per_sample=29, bytes_per_sample=24)
+@window_kernel
+def feature_psr(values, window, step, n):
     """Power Spectrum Ratio"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
     PKF_id = np.argmax(power, axis=1)
     lb = np.where(PKF_id - 20 < 0, 0, PKF_id - 20)
     hb = np.where(PKF_id + 20 > window, window, PKF_id + 20)
-    return pd.Series(data=[sum(p[l:h]) for p, l, h in zip(power, lb, hb)] / np.sum(power, axis=1),
-                     index=series.index[indexes])
+    return [sum(p[l:h]) for p, l, h in zip(power, lb, hb)] / np.sum(power, axis=1), indexes
 
 
-def feature_snr(series, window, step, powerband, noiseband):
+@register_feature('SNR', spectral=True, batched=False, ns_per_sample=41, bytes_per_sample=24)
+@window_kernel
+def feature_snr(values, window, step, powerband, noiseband):
     """Signal-to-Noise Ratio"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120, max_frequency=max(powerband[1], noiseband[1]))
+    max_freq = spectrum.periodogram_frequencies(window, 5120)[-1]
     snr = np.apply_along_axis(lambda p:
                               np.sum(p[(freq > powerband[0]) & (freq < powerband[1])]) /
-                              (np.sum(p[(freq > noiseband[0]) & (freq < noiseband[1])]) * np.max(freq)),
+                              (np.sum(p[(freq > noiseband[0]) & (freq < noiseband[1])]) * max_freq),
                               axis=1, arr=power)
-    return pd.Series(data=snr, index=series.index[indexes])
+    return snr, indexes
 
 
-def feature_dpr(series, window, step, band, n):
+@register_feature('DPR', spectral=True, batched=False, ns_per_sample=175, bytes_per_sample=24)
+@window_kernel
+def feature_dpr(values, window, step, band, n):
     """Maximum-to-minimum Drop in Power Density Ratio"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-
-    dpr = pd.Series()
-    for pidx in range(len(power)):
-        power_b = power[pidx][(freq > band[0]) & (freq < band[1])]
-        stride = power_b.strides[0]
-        stride_count = len(power_b) - n + 1
-        p_strided = as_strided(power_b, shape=[stride_count, n], strides=(stride, stride))
-        means = np.mean(p_strided, axis=1)
-        dpr.at[series.index[indexes[pidx]]] = np.max(means) / np.min(means)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120, max_frequency=band[1])
 
-    return pd.Series(data=dpr, index=series.index[indexes])
+    means_max, _, means_min = kernels.moving_mean_extrema(power[:, (freq > band[0]) & (freq < band[1])], n)
+    return means_max / means_min, indexes
 
 
-def feature_ohm(series, window, step):
+@register_feature('OHM', spectral=True, ns_per_sample=28, bytes_per_sample=24)
+@window_kernel
+def feature_ohm(values, window, step):
     """Power Spectrum Deformation"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
 
     def sm(order):
         return np.sum(power * np.power(freq, order), axis=1)
 
-    return pd.Series(data=np.sqrt(sm(2)/sm(0)) / (sm(1)/sm(0)), index=series.index[indexes])
+    return np.sqrt(sm(2)/sm(0)) / (sm(1)/sm(0)), indexes
 
 
-def feature_max(series, window, step, order, cutoff):
+@register_feature('MAX', ns_per_sample=20, bytes_per_sample=16)
+@window_kernel
+def feature_max(values, window, step, order, cutoff):
     """Maximum Amplitude"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
     fs = 5120
     b, a = signal.butter(order, cutoff / (0.5 * fs), btype='lowpass', analog=False, output='ba')
-    return pd.Series(data=np.max(signal.lfilter(b, a, np.abs(windows_strided), axis=1), axis=1),
-                     index=series.index[indexes])
+    return np.max(signal.lfilter(b, a, np.abs(windows_strided), axis=1), axis=1), indexes
 
 
-def feature_smr(series, window, step, n):
+@register_feature('SMR', spectral=True, batched=False, ns_per_sample=172, bytes_per_sample=24)
+@window_kernel
+def feature_smr(values, window, step, n):
     """Signal-to-Motion Artifact Ratio"""
     # TODO: Verification Needed
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
 
     freq_over35 = freq > 35
     freq_over35_idx = np.argmax(freq_over35)
 
-    smr = pd.Series()
-    for pidx in range(len(power)):
-        power_b = power[pidx][freq_over35]
-        stride = power_b.strides[0]
-        stride_count = len(power_b) - n + 1
-        p_strided = as_strided(power_b, shape=[stride_count, n], strides=(stride, stride))
-        mean = np.mean(p_strided, axis=1)
-        max = np.max(mean)
-        max_idx = np.argmax(mean) + int(np.floor(n / 2.0)) + freq_over35_idx
-        a = max / freq[max_idx]
+    means_max, means_max_idx, _ = kernels.moving_mean_extrema(power[:, freq_over35], n)
+    max_idx = means_max_idx + int(np.floor(n / 2.0)) + freq_over35_idx
+    a = means_max / freq[max_idx]
 
-        smr.at[series.index[indexes[pidx]]] =\
-            np.sum(power[pidx][freq < 600]) / np.sum(power[pidx][power[pidx] > (freq*a)])
-
-    return pd.Series(data=smr, index=series.index[indexes])
+    smr = np.sum(power[:, freq < 600], axis=1) / \
+        np.sum(np.where(power > freq * a[:, np.newaxis], power, 0), axis=1)
+    return smr, indexes
 
 
 def box_counting_dimension(sig, y_box_size_multiplier, subsampling):
@@ -474,60 +1247,286 @@ def box_counting_dimension(sig, y_box_size_multiplier, subsampling):
     n = int(np.log(n) / np.log(2))
     sizes = 2 ** np.arange(n, 1, -1)
 
+    sig_minimum = np.min(sig)
+
+    interp_func = interpolate.interp1d(np.arange(0, len(sig), 1), sig.reshape(1, len(sig))[0])
+    x_interp = np.arange(0, len(sig) - 1 + 1 / subsampling, 1 / subsampling)
+    sig_interp = interp_func(x_interp)
+
     box_count = []
     for box_size in sizes:
         x_box_size = box_size
         y_box_size = box_size * y_box_size_multiplier
 
-        sig_minimum = np.min(sig)
-
-        box_occupation = np.zeros(
-            [int(len(sig) / x_box_size) + 1, int((np.max(sig) - sig_minimum) / y_box_size) + 1])
-
-        interp_func = interpolate.interp1d(np.arange(0, len(sig), 1), sig.reshape(1, len(sig))[0])
-        x_interp = np.arange(0, len(sig) - 1 + 1 / subsampling, 1 / subsampling)
-        sig_interp = interp_func(x_interp)
-
-        for i in range(len(sig_interp)):
-            x_box_id = int(x_interp[i] / x_box_size)
-            y_box_id = int((sig_interp[i] - sig_minimum) / y_box_size)
-            box_occupation[x_box_id, y_box_id] = 1
-
-        box_count.append(np.sum(box_occupation))
+        box_count.append(kernels.box_count(x_interp, sig_interp, sig_minimum, x_box_size, y_box_size,
+                                           int(len(sig) / x_box_size) + 1,
+                                           int((np.max(sig) - sig_minimum) / y_box_size) + 1))
 
     coefs = np.polyfit(np.log(1 / sizes), np.log(box_count), 1)
     return coefs[0]
 
 
-def feature_bc(series, window, step, y_box_size_multiplier, subsampling):
+@register_feature('BC', batched=False, ns_per_sample=180000, bytes_per_sample=600)
+@window_kernel
+def feature_bc(values, window, step, y_box_size_multiplier, subsampling):
     """Box-Counting Dimension"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.apply_along_axis(lambda sig:
-                                              box_counting_dimension(sig, y_box_size_multiplier, subsampling),
-                                              axis=1, arr=windows_strided), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.apply_along_axis(lambda sig: box_counting_dimension(sig, y_box_size_multiplier, subsampling),
+                               axis=1, arr=windows_strided), indexes
 
 
-def feature_psdfd(series, window, step, power_box_size_multiplier, subsampling):
+@register_feature('PSDFD', spectral=True, batched=False, ns_per_sample=155000, bytes_per_sample=600)
+@window_kernel
+def feature_psdfd(values, window, step, power_box_size_multiplier, subsampling):
     """Power Spectral Density Fractal Dimension"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    freq, power = signal.periodogram(windows_strided, 5120)
-    return pd.Series(data=np.apply_along_axis(lambda sig:
-                                              box_counting_dimension(sig, power_box_size_multiplier, subsampling),
-                                              axis=1, arr=power), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = spectrum.periodogram(windows_strided, 5120)
+    return np.apply_along_axis(lambda sig: box_counting_dimension(sig, power_box_size_multiplier, subsampling),
+                               axis=1, arr=power), indexes
+
+
+@register_variant('IAV', 'prefix')
+@window_kernel
+def _feature_iav_prefix(values, window, step):
+    """Integral Absolute Value from prefix sums of rectified signal"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return _window_sums(values, window, step, ('abs',), np.abs), indexes
+
+
+@register_variant('MAV', 'prefix')
+@window_kernel
+def _feature_mav_prefix(values, window, step):
+    """Mean Absolute Value from prefix sums of rectified signal"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return _window_sums(values, window, step, ('abs',), np.abs) / window, indexes
+
+
+@register_variant('SSI', 'prefix')
+@window_kernel
+def _feature_ssi_prefix(values, window, step):
+    """Simple Square Integral from prefix sums of squared signal"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return _window_sums(values, window, step, ('square',), np.square), indexes
+
+
+@register_variant('RMS', 'prefix')
+@window_kernel
+def _feature_rms_prefix(values, window, step):
+    """Root Mean Square from prefix sums of squared signal"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sqrt(_window_sums(values, window, step, ('square',), np.square) / window), indexes
+
+
+@register_variant('AAC', 'prefix')
+@window_kernel
+def _feature_aac_prefix(values, window, step):
+    """Average Amplitude Change from prefix sums of rectified signal difference"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return _window_sums(values, window, step, ('abs_diff',), lambda x: np.abs(np.diff(x)), lag=1) / window, \
+        indexes
+
+
+@register_variant('DASDV', 'prefix')
+@window_kernel
+def _feature_dasdv_prefix(values, window, step):
+    """Difference Absolute Standard Deviation Value from prefix sums of squared signal difference"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sqrt(_window_sums(values, window, step, ('square_diff',),
+                                lambda x: np.square(np.diff(x)), lag=1) / (window - 1)), indexes
 
 
-def force_feature_mean(series, window, step):
+@register_variant('MYOP', 'prefix')
+@window_kernel
+def _feature_myop_prefix(values, window, step, threshold):
+    """Myopulse Percentage Rate from prefix counts of samples over threshold"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+
+    def counts(t):
+        return _window_sums(values, window, step, ('over', t), lambda x: x > t) / window
+
+    if np.ndim(threshold) == 0:
+        return counts(threshold), indexes
+    return np.column_stack([counts(t) for t in threshold]), indexes
+
+
+@register_variant('WAMP', 'prefix')
+@window_kernel
+def _feature_wamp_prefix(values, window, step, threshold):
+    """Willison Amplitude from prefix counts of signal differences over threshold"""
+    _, indexes = biolab_utilities.moving_window_stride(values, window, step)
+
+    def counts(t):
+        return _window_sums(values, window, step, ('diff_over', t), lambda x: np.diff(x) >= t, lag=1)
+
+    if np.ndim(threshold) == 0:
+        return counts(threshold), indexes
+    return np.column_stack([counts(t) for t in threshold]), indexes
+
+
+@register_variant('MAV1', 'matmul')
+@window_kernel
+def _feature_mav1_matmul(values, window, step):
+    """Modified Mean Absolute Value Type 1 as product of rectified windows and weight vector"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.abs(windows_strided) @ _window_weights('mav1', window) / window, indexes
+
+
+@register_variant('MAV2', 'matmul')
+@window_kernel
+def _feature_mav2_matmul(values, window, step):
+    """Modified Mean Absolute Value Type 2 as product of rectified windows and weight vector"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.abs(windows_strided) @ _window_weights('trapezoidal', window, 0.25) / window, indexes
+
+
+@register_variant('MHW', 'matmul')
+@window_kernel
+def _feature_mhw_matmul(values, window, step):
+    """Multiple Hamming Windows as product of squared windows and squared Hamming window"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.square(windows_strided) @ np.square(np.hamming(window)), indexes
+
+
+@register_variant('MTW', 'matmul')
+@window_kernel
+def _feature_mtw_matmul(values, window, step, windowslope):
+    """Multiple Trapezoidal Windows as product of squared windows and trapezoidal window"""
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.square(windows_strided) @ _window_weights('trapezoidal', window, windowslope), indexes
+
+
+@register_feature('Mean', kind='force', ns_per_sample=2, bytes_per_sample=8)
+@window_kernel
+def force_feature_mean(values, window, step):
     """Mean value"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.mean(windows_strided, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.mean(windows_strided, axis=1), indexes
 
 
-def force_feature_median(series, window, step):
+@register_feature('Median', kind='force', ns_per_sample=30, bytes_per_sample=8)
+@window_kernel
+def force_feature_median(values, window, step):
     """Median value"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=np.median(windows_strided, axis=1), index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.median(windows_strided, axis=1), indexes
+
 
-def force_feature_last(series, window, step):
+@register_feature('Last', kind='force', ns_per_sample=0, bytes_per_sample=8)
+@window_kernel
+def force_feature_last(values, window, step):
     """Last value of the window - resampling"""
-    windows_strided, indexes = biolab_utilities.moving_window_stride(series.values, window, step)
-    return pd.Series(data=windows_strided[::, -1], index=series.index[indexes])
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return windows_strided[::, -1], indexes
+
+
+def _channel_windows(values, window, step):
+    """Returns strided view (channels x windows x window) of 2D array of channel signals and positions of window ends"""
+    win_count = _window_count(values.shape[1], window, step)
+    windows_strided = as_strided(values, shape=(values.shape[0], win_count, window),
+                                 strides=(values.strides[0], values.strides[1] * step, values.strides[1]))
+    return windows_strided, np.arange(window - 1, window + (win_count - 1) * step, step)
+
+
+def _channel_covariance(values, window, step):
+    """Returns covariance matrix (population, as VAR) of channels of each window, by single batched matrix product"""
+    windows_strided, indexes = _channel_windows(values, window, step)
+    centered = np.array(windows_strided.transpose(1, 0, 2))  # windows x channels x samples
+    centered -= np.mean(centered, axis=2, keepdims=True)
+    return np.matmul(centered, centered.transpose(0, 2, 1)) / window, indexes
+
+
+@register_feature('COV', kind='cross', ns_per_sample=16, bytes_per_sample=8)
+def cross_feature_cov(values, window, step):
+    """Covariance"""
+    return _channel_covariance(values, window, step)
+
+
+@register_feature('CORR', kind='cross', ns_per_sample=16, bytes_per_sample=8)
+def cross_feature_corr(values, window, step):
+    """Pearson Correlation Coefficient, NaN for constant channels"""
+    covariance, indexes = _channel_covariance(values, window, step)
+    deviation = np.sqrt(np.diagonal(covariance, axis1=1, axis2=2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return covariance / deviation[:, :, np.newaxis] / deviation[:, np.newaxis, :], indexes
+
+
+@register_feature('COH', kind='cross', spectral=True, ns_per_sample=34, bytes_per_sample=24)
+def cross_feature_coh(values, window, step, bands, segments=4):
+    """Magnitude-Squared Coherence averaged over frequency bins of each band
+    Cross spectra are averaged over non-overlapping segments of window (Welch method without overlap, trailing samples
+    are dropped), as coherence of single segment is always 1. Matrices of all windows and frequency bins of all bands
+    are calculated by one batched matrix product. NaN for bands without bins and for constant channels."""
+    windows_strided, indexes = _channel_windows(values, window, step)
+    length = window // segments
+    segmented = windows_strided[:, :, :segments * length].reshape(values.shape[0], len(indexes), segments, length)
+    freq, cross_spectrum = spectrum.window_spectrum(segmented, 5120, max_frequency=max(band[1] for band in bands))
+    cross_spectrum = cross_spectrum.transpose(3, 1, 2, 0)  # bins x windows x segments x channels
+
+    band_masks = np.array([(freq > low) & (freq < high) for low, high in bands]).reshape(len(bands), len(freq))
+    used_bins = np.flatnonzero(np.any(band_masks, axis=0))
+    selected = cross_spectrum[used_bins]
+    density = np.matmul(selected.conj().swapaxes(-1, -2), selected)  # bins x windows x channels x channels
+    power = np.diagonal(density, axis1=-2, axis2=-1).real
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bin_coherence = np.square(np.abs(density)) / power[..., :, np.newaxis] / power[..., np.newaxis, :]
+
+    coherence = np.full((len(indexes), len(bands), values.shape[0], values.shape[0]), np.nan)
+    for b, band_mask in enumerate(band_masks[:, used_bins]):
+        if np.any(band_mask):
+            coherence[:, b] = np.mean(bin_coherence[band_mask], axis=0)
+    return coherence, indexes
+
+
+def _word_codes(values, n):
+    """
+    Returns word of n consecutive symbols (1 for rising, 0 for not rising sample) starting at each sample of each
+    channel, bit-packed into integer with first symbol in the most significant bit, so codes are positions of words in
+    sorted word list of pyeeg.information_based_similarity
+    """
+    rising = (np.diff(values, axis=1) > 0).astype(np.int64)
+    length = max(rising.shape[1] - n + 1, 0)
+    codes = np.zeros((values.shape[0], length), dtype=np.int64)
+    for k in range(n):
+        codes <<= 1
+        codes |= rising[:, k:k + length]
+    return codes
+
+
+@register_feature('IBS', kind='cross', ns_per_sample=45, bytes_per_sample=24)
+def cross_feature_ibs(values, window, step, n):
+    """Information Based Similarity
+    Equal to pyeeg.information_based_similarity of each pair of channels for n > 1 (pyeeg returns NaN for n = 1).
+    Words of all windows of all channels are counted by single bincount of bit-packed word codes, ranks of words are
+    calculated for all windows at once, and each channel is compared with all following channels at once."""
+    if n >= window:
+        raise ValueError('IBS word order must be lower than window size')
+    channels, words = values.shape[0], 2 ** n
+    codes = _word_codes(values, n)
+    win_count = _window_count(values.shape[1], window, step)
+    indexes = np.arange(window - 1, window + (win_count - 1) * step, step)
+
+    # words of window starting at sample p are codes[p:p + window - n]
+    window_codes = as_strided(codes, shape=(channels, win_count, window - n),
+                              strides=(codes.strides[0], codes.strides[1] * step, codes.strides[1]))
+    offsets = np.arange(channels * win_count).reshape(channels, win_count, 1) * words
+    counts = np.bincount((window_codes + offsets).ravel(), minlength=channels * win_count * words)
+    counts = counts.reshape(channels, win_count, words)
+
+    probability = counts / (window - n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = np.where(counts > 0, probability * np.log2(probability), 0)
+    # equal counts are ranked in order of words
+    order = np.argsort(-counts, axis=2, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(words), axis=2)
+
+    similarity = np.zeros((win_count, channels, channels))
+    for i in range(channels - 1):
+        shared = (counts[i] > 0) & (counts[i + 1:] > 0)
+        weights = np.where(shared, -entropy[i] - entropy[i + 1:], 0)
+        distance = np.sum(np.abs(ranks[i] - ranks[i + 1:]) * weights, axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ibs = distance / np.sum(weights, axis=2) / np.sum(shared, axis=2)
+        similarity[:, i, i + 1:] = ibs.T
+        similarity[:, i + 1:, i] = ibs.T
+    return similarity, indexes
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+__all__ = ["record_event", "get_events", "clear_events", "add_listener", "remove_listener"]
+
+
+_events = deque(maxlen=10000)  # most recent events, older are discarded
+_listeners = []
+_lock = threading.Lock()
+
+
+def record_event(name: str, **fields):
+    """
+    Records instrumentation event, eg. chunking chosen for feature calculation, and passes it to registered listeners
+    :param name: string - event name, eg. 'chunking'
+    :param fields: event data
+    """
+    event = dict(fields, event=name, time=time.time())
+    with _lock:
+        _events.append(event)
+        listeners = list(_listeners)
+    for listener in listeners:
+        listener(event)
+
+
+def get_events(name: str = None) -> List[Dict]:
+    """
+    Returns recorded events, oldest first
+    :param name: string - event name, all events if None
+    :return: List[Dict] - events with 'event' name, 'time' and event specific fields
+    """
+    with _lock:
+        return [event for event in _events if name is None or event['event'] == name]
+
+
+def clear_events():
+    with _lock:
+        _events.clear()
+
+
+def add_listener(listener):
+    """
+    Registers function called with each recorded event, eg. logging.info or metrics exporter
+    :param listener: function - called with event dictionary, from thread recording event
+    """
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        _listeners.remove(listener)
@@ -0,0 +1,343 @@
+import os
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .pyeeg import pyeeg
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+__all__ = ["available_backends", "set_backend", "get_backend", "warmup",
+           "box_count", "median_frequency", "moving_mean_extrema",
+           "ap_entropy", "samp_entropy", "permutation_entropy", "hfd", "hurst"]
+
+
+# Loop-heavy kernels have two implementations: NumPy one (vectorised, or original PyEEG code) and explicit loop one
+# (functions with _loop suffix), written for Numba. Backends:
+# 'numpy' - NumPy implementations,
+# 'numba' - loop implementations compiled with Numba, default if Numba is installed,
+# 'python' - loop implementations run by Python interpreter, very slow, for testing loop implementations only.
+_backend = os.environ.get('PUTEMG_KERNEL_BACKEND', 'numba' if numba is not None else 'numpy')
+_compiled = {}  # per-process cache of compiled loop kernels, None if compilation failed
+_uncached = set()  # loop kernels compiled without disk cache, as it could not be loaded
+
+
+def available_backends():
+    """
+    Returns kernel backends available in current environment
+    :return: List[str] - backend names
+    """
+    return ['numpy', 'python'] + (['numba'] if numba is not None else [])
+
+
+def set_backend(backend: str):
+    """
+    Sets backend used by loop-heavy kernels, see available_backends
+    :param backend: string - 'numpy', 'numba' or 'python'
+    """
+    global _backend
+    if backend not in available_backends():
+        raise ValueError(backend + ' is not an available kernel backend')
+    _backend = backend
+
+
+def get_backend() -> str:
+    return _backend if _backend in available_backends() else 'numpy'
+
+
+def _loop_kernel(func):
+    """Returns implementation of loop kernel for current backend, or None if NumPy implementation should be used"""
+    backend = get_backend()
+    if backend == 'python':
+        return func
+    if backend != 'numba':
+        return None
+
+    if func.__name__ not in _compiled:
+        # Compiled machine code is additionally cached on disk, so other processes do not compile it again
+        _compiled[func.__name__] = numba.njit(cache=True, nogil=True)(func)
+    return _compiled[func.__name__]
+
+
+def _call(loop_func, numpy_func, *args):
+    result = _kernel_result(loop_func, *args)
+    return numpy_func(*args) if result is None else result
+
+
+def _kernel_result(loop_func, *args):
+    """
+    Returns result of loop kernel of current backend, or None if NumPy implementation should be used, also when Numba
+    compilation fails. Disk cache which cannot be loaded, eg. written when package was imported under other module
+    name, is skipped and kernel is compiled again without it.
+    """
+    kernel = _loop_kernel(loop_func)
+    if kernel is None:
+        return None
+    try:
+        return kernel(*args)
+    except Exception as e:
+        if get_backend() != 'numba' or not isinstance(e, (numba.core.errors.NumbaError, ImportError)):
+            raise
+        if isinstance(e, ImportError) and loop_func.__name__ not in _uncached:
+            warnings.warn("Numba disk cache of " + loop_func.__name__ + " could not be loaded, compiling without it")
+            _uncached.add(loop_func.__name__)
+            _compiled[loop_func.__name__] = numba.njit(nogil=True)(loop_func)
+            return _kernel_result(loop_func, *args)
+        warnings.warn("Numba compilation of " + loop_func.__name__ + " failed, using NumPy implementation")
+        _compiled[loop_func.__name__] = None
+        return None
+
+
+def warmup():
+    """
+    Compiles (or loads from disk cache) all loop kernels of current backend, eg. in initializer of worker process,
+    so first feature calculations are not delayed by compilation
+    """
+    x = np.sin(np.arange(64, dtype=np.float64))
+    box_count(np.arange(64, dtype=np.float64), x, -1.0, 4, 0.5, 17, 5)
+    median_frequency(np.arange(33, dtype=np.float64), np.abs(np.tile(x[:33], (2, 1))))
+    moving_mean_extrema(np.abs(np.tile(x, (2, 1))), 3)
+    ap_entropy(x, 2, 0.2)
+    samp_entropy(x, 2, 0.2)
+    permutation_entropy(x, 3, 1)
+    hfd(x, 4)
+    hurst(x)
+
+
+def _box_count_numpy(x_interp, sig_interp, sig_minimum, x_box_size, y_box_size, x_boxes, y_boxes):
+    box_ids = (x_interp / x_box_size).astype(np.int64) * y_boxes + \
+              ((sig_interp - sig_minimum) / y_box_size).astype(np.int64)
+    return float(np.unique(box_ids).size)
+
+
+def _box_count_loop(x_interp, sig_interp, sig_minimum, x_box_size, y_box_size, x_boxes, y_boxes):
+    box_occupation = np.zeros((x_boxes, y_boxes), dtype=np.bool_)
+    for i in range(len(sig_interp)):
+        box_occupation[int(x_interp[i] / x_box_size), int((sig_interp[i] - sig_minimum) / y_box_size)] = True
+    return float(np.sum(box_occupation))
+
+
+def box_count(x_interp, sig_interp, sig_minimum, x_box_size, y_box_size, x_boxes, y_boxes):
+    """
+    Counts boxes of x_box_size x y_box_size grid occupied by interpolated signal, see box_counting_dimension
+    :return: float - number of occupied boxes
+    """
+    return _call(_box_count_loop, _box_count_numpy, np.asarray(x_interp, dtype=np.float64),
+                 np.asarray(sig_interp, dtype=np.float64), float(sig_minimum), float(x_box_size),
+                 float(y_box_size), int(x_boxes), int(y_boxes))
+
+
+def _median_frequency_numpy(freq, power):
+    # As in original implementation, only the first len(power) (number of windows) bins are searched
+    searched = min(len(power), power.shape[1])
+    ttp_half = np.sum(power, axis=1) / 2
+    over_half = np.cumsum(power[:, :searched], axis=1) > ttp_half[:, np.newaxis]
+    return np.where(np.any(over_half, axis=1), freq[np.argmax(over_half, axis=1)], 0.)
+
+
+def _median_frequency_loop(freq, power):
+    searched = min(len(power), power.shape[1])
+    mdf = np.zeros(len(power))
+    for w in range(len(power)):
+        ttp_half = np.sum(power[w]) / 2
+        cumulative = 0.
+        for s in range(searched):
+            cumulative += power[w, s]
+            if cumulative > ttp_half:
+                mdf[w] = freq[s]
+                break
+    return mdf
+
+
+def median_frequency(freq, power):
+    """
+    Median frequency of each window, first frequency at which cumulated power exceeds half of total power
+    :param freq: numpy.ndarray - sample frequencies
+    :param power: numpy.ndarray - power spectral density of each window
+    :return: numpy.ndarray - median frequency of each window
+    """
+    return _call(_median_frequency_loop, _median_frequency_numpy, np.asarray(freq, dtype=np.float64),
+                 np.ascontiguousarray(power, dtype=np.float64))
+
+
+def _moving_mean_extrema_numpy(power, n):
+    means = np.mean(sliding_window_view(power, n, axis=1), axis=2)
+    return np.max(means, axis=1), np.argmax(means, axis=1), np.min(means, axis=1)
+
+
+def _moving_mean_extrema_loop(power, n):
+    maximum = np.empty(len(power))
+    maximum_idx = np.empty(len(power), dtype=np.int64)
+    minimum = np.empty(len(power))
+    for w in range(len(power)):
+        for p in range(power.shape[1] - n + 1):
+            mean = np.sum(power[w, p:p + n]) / n
+            if p == 0 or mean > maximum[w]:
+                maximum[w] = mean
+                maximum_idx[w] = p
+            if p == 0 or mean < minimum[w]:
+                minimum[w] = mean
+    return maximum, maximum_idx, minimum
+
+
+def moving_mean_extrema(power, n):
+    """
+    Maximum, its position and minimum of moving average of n consecutive bins of each window
+    :param power: numpy.ndarray - 2D array, eg. power spectral density of each window
+    :param n: int - moving average length
+    :return: maximum: numpy.ndarray, maximum_idx: numpy.ndarray, minimum: numpy.ndarray - one value per window
+    """
+    if np.shape(power)[-1] < n:  # loop implementation would return uninitialised values
+        raise ValueError("Moving average of {:d} bins exceeds {:d} bins".format(int(n), np.shape(power)[-1]))
+    return _call(_moving_mean_extrema_loop, _moving_mean_extrema_numpy,
+                 np.ascontiguousarray(power, dtype=np.float64), int(n))
+
+
+def _match_counts_loop(x, m, r, self_match):
+    n = len(x)
+    rows = n - m + 1
+    cm = np.zeros(rows)
+    cmp = np.zeros(n - m)
+    for i in range(rows):
+        for j in range(i if self_match else i + 1, rows):
+            in_range = True
+            for k in range(m):
+                if not abs(x[i + k] - x[j + k]) <= r:
+                    in_range = False
+                    break
+            if in_range:
+                cm[j] += 1
+                if i != j:
+                    cm[i] += 1
+                if j < n - m and abs(x[i + m] - x[j + m]) <= r:
+                    cmp[j] += 1
+                    if i != j:
+                        cmp[i] += 1
+    return cm, cmp
+
+
+def _ap_entropy_from_counts(cm, cmp):
+    n_m = len(cmp)
+    phi_m, phi_mp = np.sum(np.log(cm / (n_m + 1))), np.sum(np.log(cmp / n_m))
+    return (phi_m - phi_mp) / n_m
+
+
+def _match_counts_numpy(x, m, r, self_match):
+    em = sliding_window_view(x, m)
+    in_range = np.max(np.abs(em[:, np.newaxis, :] - em[np.newaxis, :, :]), axis=2) <= r
+    in_range_p = in_range[:-1, :-1] & (np.abs(x[m:, np.newaxis] - x[np.newaxis, m:]) <= r)
+    if not self_match:
+        np.fill_diagonal(in_range, False)
+        np.fill_diagonal(in_range_p, False)
+    return np.sum(in_range, axis=0, dtype=np.float64), np.sum(in_range_p, axis=0, dtype=np.float64)
+
+
+def ap_entropy(x, m, r):
+    """
+    Approximate entropy, equal to pyeeg.ap_entropy. Loop implementation counts matching templates with O(N) instead
+    of O(N^2) memory
+    """
+    return _ap_entropy_from_counts(*_call(_match_counts_loop, _match_counts_numpy,
+                                          np.asarray(x, dtype=np.float64), int(m), float(r), True))
+
+
+def samp_entropy(x, m, r):
+    """
+    Sample entropy, equal to pyeeg.samp_entropy. Loop implementation counts matching templates with O(N) instead
+    of O(N^2) memory
+    """
+    cm, cmp = _call(_match_counts_loop, _match_counts_numpy, np.asarray(x, dtype=np.float64), int(m), float(r), False)
+    return np.log(np.sum(cm + 1e-100) / np.sum(cmp + 1e-100))
+
+
+def _permutation_codes_loop(x, n, tau):
+    count = len(x) - tau * (n - 1)
+    codes = np.empty(count, dtype=np.int64)
+    z = np.empty(n)
+    for i in range(count):
+        for j in range(n):
+            z[j] = x[i + j * tau]
+        code = 0
+        for j in range(n):
+            # Same ranking procedure as pyeeg.permutation_entropy, including marking used values with -1
+            z.sort()
+            idx = 0
+            while z[idx] != x[i + j * tau]:
+                idx += 1
+            code = code * n + idx
+            z[idx] = -1
+        codes[i] = code
+    return codes
+
+
+def permutation_entropy(x, n, tau):
+    """Permutation entropy, equal to pyeeg.permutation_entropy, n up to 15 in loop implementation"""
+    codes = _kernel_result(_permutation_codes_loop, np.asarray(x, dtype=np.float64), int(n), int(tau))
+    if codes is None:
+        return pyeeg.permutation_entropy(x, n, tau)
+
+    _, first_idx, counts = np.unique(codes, return_index=True, return_counts=True)
+    rank_mat = counts[np.argsort(first_idx)]  # patterns in order of first occurrence
+
+    rank_mat = np.true_divide(rank_mat, rank_mat.sum())
+    return -1 * np.multiply(np.log2(rank_mat), rank_mat).sum()
+
+
+def _hfd_curve_loop(x, kmax):
+    n = len(x)
+    lk = np.zeros((kmax - 1, kmax - 1))
+    for k in range(1, kmax):
+        for m in range(0, k):
+            lmk = 0.
+            for i in range(1, int(np.floor((n - m) / k))):
+                lmk += abs(x[m + i * k] - x[m + i * k - k])
+            lk[k - 1, m] = lmk * (n - 1) / np.floor((n - m) / float(k)) / k
+    return lk
+
+
+def hfd(x, kmax):
+    """Higuchi Fractal Dimension, equal to pyeeg.hfd"""
+    lk = _kernel_result(_hfd_curve_loop, np.asarray(x, dtype=np.float64), int(kmax))
+    if lk is None:
+        return pyeeg.hfd(x, kmax)
+
+    curve = [np.log(np.mean(lk[k - 1, :k])) for k in range(1, kmax)]
+    a = [[np.log(float(1) / k), 1] for k in range(1, kmax)]
+    (p, _, _, _) = np.linalg.lstsq(a, curve, rcond=None)
+    return p[0]
+
+
+def _hurst_range_std_loop(x):
+    n = x.size
+    t = np.arange(1, n + 1).astype(np.float64)
+    y = np.cumsum(x)
+    ave_t = y / t
+    s_t = np.zeros(n)
+    r_t = np.zeros(n)
+    for i in range(n):
+        s_t[i] = np.std(x[:i + 1])
+        low = high = y[0] - t[0] * ave_t[i]
+        for j in range(1, i + 1):
+            x_t = y[j] - t[j] * ave_t[i]
+            low = min(low, x_t)
+            high = max(high, x_t)
+        r_t[i] = high - low
+    return r_t, s_t
+
+
+def hurst(x):
+    """Hurst exponent, equal to pyeeg.hurst"""
+    range_std = _kernel_result(_hurst_range_std_loop, np.asarray(x, dtype=np.float64))
+    if range_std is None:
+        return pyeeg.hurst(x)
+
+    r_t, s_t = range_std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_s = np.log(r_t / s_t)[1:]
+    n = np.log(np.arange(1, len(r_t) + 1))[1:]
+    a = np.column_stack((n, np.ones(n.size)))
+    return np.linalg.lstsq(a, r_s, rcond=None)[0][0]
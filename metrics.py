@@ -0,0 +1,272 @@
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+__all__ = ["Counter", "Histogram", "RECORDS", "SAMPLES", "WINDOWS", "CACHE_HITS", "CACHE_MISSES", "FEATURE_SECONDS",
+           "FILTER_SECONDS", "record_record", "record_feature", "record_filter", "record_cache", "register_lru_cache",
+           "generate_metrics", "write_metrics", "start_file_export", "start_http_server", "reset_metrics"]
+
+
+# Metrics of feature extraction in Prometheus text exposition format, without dependency on Prometheus client.
+# Metrics are collected in the calling process, work done in worker processes (eg. features_from_xml_on_df_sharded
+# with process executor) is not counted. Metrics are written to file given by PUTEMG_METRICS_FILE environment variable
+# (eg. for node_exporter textfile collector) every PUTEMG_METRICS_INTERVAL seconds, and served over HTTP on port given
+# by PUTEMG_METRICS_PORT, see start_file_export and start_http_server.
+
+_lock = threading.Lock()
+_metrics = []
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = ('{:s}="{:s}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+               for k, v in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, optionally labelled, eg. windows calculated by each feature"""
+
+    def __init__(self, name: str, documentation: str, labels: List[str] = (), collect=None):
+        """
+        :param name: string - metric name
+        :param documentation: string - HELP text
+        :param labels: List[str] - label names
+        :param collect: function - returns {label values tuple: value} added at exposition, eg. from lru_cache
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.values = {}
+        self.reset()
+        _metrics.append(self)
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def get(self, **labels) -> float:
+        key = tuple(str(labels[label]) for label in self.labels)
+        values = self._collected()
+        return values.get(key, 0)
+
+    def _collected(self):
+        with _lock:
+            values = dict(self.values)
+        for key, value in (self.collect() if self.collect is not None else {}).items():
+            values[key] = values.get(key, 0) + value
+        return values
+
+    def reset(self):
+        with _lock:
+            self.values.clear()
+            if not self.labels:  # unlabelled counter is exposed from start
+                self.values[()] = 0
+
+    def expose(self) -> List[str]:
+        lines = ['# HELP ' + self.name + ' ' + self.documentation, '# TYPE ' + self.name + ' counter']
+        for key, value in sorted(self._collected().items()):
+            lines.append(self.name + _format_labels(dict(zip(self.labels, key))) + ' ' + _format_value(value))
+        return lines
+
+
+class Histogram:
+    """Histogram of observed values with fixed cumulative buckets, eg. feature calculation latency"""
+
+    # seconds, from single small feature call to whole long record
+    default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+    def __init__(self, name: str, documentation: str, labels: List[str] = (), buckets=None):
+        """
+        :param name: string - metric name
+        :param documentation: string - HELP text
+        :param labels: List[str] - label names
+        :param buckets: List[float] - upper bounds of buckets, +Inf is added
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets if buckets is not None else self.default_buckets) + (math.inf,)
+        self.values = {}  # label values -> [bucket counts (not cumulative), sum]
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        bucket = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with _lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bucket] += 1
+            self.values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels[label]) for label in self.labels)
+        with _lock:
+            return sum(self.values.get(key, ([0], 0.0))[0])
+
+    def reset(self):
+        with _lock:
+            self.values.clear()
+
+    def expose(self) -> List[str]:
+        lines = ['# HELP ' + self.name + ' ' + self.documentation, '# TYPE ' + self.name + ' histogram']
+        with _lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(self.name + '_bucket' + _format_labels(dict(labels, le=_format_value(bound))) + ' ' +
+                             str(cumulative))
+            lines.append(self.name + '_sum' + _format_labels(labels) + ' ' + repr(total))
+            lines.append(self.name + '_count' + _format_labels(labels) + ' ' + str(cumulative))
+        return lines
+
+
+_lru_caches = {}
+
+
+def _collect_lru(field):
+    return lambda: {(name,): getattr(func.cache_info(), field) for name, func in list(_lru_caches.items())}
+
+
+RECORDS = Counter('putemg_records_total', 'Records processed by feature extraction')
+SAMPLES = Counter('putemg_samples_total', 'Samples (of all EMG and force channels) processed', ['stage'])
+WINDOWS = Counter('putemg_windows_total', 'Windows calculated by each feature, of all channels', ['feature'])
+CACHE_HITS = Counter('putemg_cache_hits_total', 'Cache hits', ['cache'], collect=_collect_lru('hits'))
+CACHE_MISSES = Counter('putemg_cache_misses_total', 'Cache misses', ['cache'], collect=_collect_lru('misses'))
+FEATURE_SECONDS = Histogram('putemg_feature_seconds', 'Calculation time of feature of all channels of record',
+                            ['feature'])
+FILTER_SECONDS = Histogram('putemg_filter_seconds', 'Preprocessing time of single channel')
+
+
+def record_record(record, stage: str = 'features'):
+    """
+    Counts record processed by feature extraction and its samples of EMG and force channels
+    :param record: pandas.DataFrame - putEMG record
+    :param stage: string - processing stage label of samples
+    """
+    RECORDS.inc()
+    SAMPLES.inc(len(record) * len(record.filter(regex=r"^(EMG|FORCE)_\d+").columns), stage=stage)
+
+
+def record_feature(name: str, seconds: float, windows: int):
+    """
+    Records calculation of feature of all channels of record
+    :param name: string - feature name
+    :param seconds: float - calculation time
+    :param windows: int - number of calculated windows of all channels
+    """
+    WINDOWS.inc(windows, feature=name)
+    FEATURE_SECONDS.observe(seconds, feature=name)
+
+
+def record_filter(channel: str, seconds: float, samples: int):
+    """
+    Records preprocessing of single channel, see biolab_utilities.add_filter_observer
+    :param channel: string - channel name
+    :param seconds: float - processing time
+    :param samples: int - number of processed samples
+    """
+    FILTER_SECONDS.observe(seconds)
+    SAMPLES.inc(samples, stage='filter')
+
+
+def record_cache(cache: str, hit: bool):
+    (CACHE_HITS if hit else CACHE_MISSES).inc(cache=cache)
+
+
+def register_lru_cache(name: str, func):
+    """
+    Exports hits and misses of function decorated with functools.lru_cache as cache metrics
+    :param name: string - cache label
+    :param func: function - lru_cache wrapper
+    """
+    _lru_caches[name] = func
+
+
+def generate_metrics() -> str:
+    """Returns all metrics in Prometheus text exposition format"""
+    return '\n'.join(line for metric in list(_metrics) for line in metric.expose()) + '\n'
+
+
+def write_metrics(metrics_file_url: str):
+    """
+    Writes all metrics to file in Prometheus text exposition format, file is replaced atomically, so it is never read
+    partially written, eg. by node_exporter textfile collector
+    :param metrics_file_url: string - url to metrics file, eg. ending with .prom
+    """
+    temporary_url = metrics_file_url + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary_url, 'w') as metrics_file:
+        metrics_file.write(generate_metrics())
+    os.replace(temporary_url, metrics_file_url)
+
+
+def start_file_export(metrics_file_url: str, interval: float = 15.0) -> threading.Event:
+    """
+    Writes metrics to file periodically in background thread, see write_metrics
+    :param metrics_file_url: string - url to metrics file
+    :param interval: float - seconds between writes
+    :return: threading.Event - set to stop export, metrics are written once more on stop
+    """
+    stop = threading.Event()
+
+    def export():
+        while not stop.wait(interval):
+            write_metrics(metrics_file_url)
+        write_metrics(metrics_file_url)
+
+    threading.Thread(target=export, name='metrics-export', daemon=True).start()
+    return stop
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = generate_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # scrapes are not logged to stderr
+        pass
+
+
+def start_http_server(port: int = 9120, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Serves metrics on http://host:port/metrics from background thread
+    :param port: int - TCP port, 0 selects free port, see server.server_address
+    :param host: string - interface address, '0.0.0.0' to allow remote scraping
+    :return: http.server.ThreadingHTTPServer - running server, stopped by shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def reset_metrics():
+    """Resets all counters and histograms, except hits and misses of lru caches"""
+    for metric in _metrics:
+        metric.reset()
+
+
+if os.environ.get('PUTEMG_METRICS_FILE'):
+    start_file_export(os.environ['PUTEMG_METRICS_FILE'], float(os.environ.get('PUTEMG_METRICS_INTERVAL', 15)))
+if os.environ.get('PUTEMG_METRICS_PORT'):
+    start_http_server(int(os.environ['PUTEMG_METRICS_PORT']))
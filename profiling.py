@@ -0,0 +1,103 @@
+import cProfile
+import glob
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+__all__ = ["set_profile_dir", "get_profile_dir", "profile_features", "profiled", "profile_summary"]
+
+
+# Profiling capture mode: when profile directory is set (by set_profile_dir, profile_features, profile_dir argument of
+# features_from_xml_on_df or PUTEMG_PROFILE_DIR environment variable), each feature calculation of each channel is
+# run under cProfile, and profiles of all calls of the same feature are merged into <feature>.prof file in the
+# directory, readable by pstats, snakeviz etc. Only calls in the calling thread are profiled, chunks calculated in
+# parallel threads or worker processes are not.
+_profile_dir = None
+_profiles = {}  # profile file url -> merged pstats.Stats
+_lock = threading.Lock()
+
+
+def set_profile_dir(profile_dir: str):
+    """
+    Enables profiling capture mode, see profiled
+    :param profile_dir: string - directory of profile files, created if missing, None disables profiling
+    """
+    global _profile_dir
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+    _profile_dir = profile_dir
+
+
+def get_profile_dir():
+    return _profile_dir
+
+
+@contextmanager
+def profile_features(profile_dir: str):
+    """Context in which feature calculations are profiled into given directory, see set_profile_dir"""
+    previous_dir = _profile_dir
+    set_profile_dir(profile_dir)
+    try:
+        yield
+    finally:
+        set_profile_dir(previous_dir)
+
+
+def _profile_file_url(profile_dir, name):
+    return os.path.join(profile_dir, "".join(c if c.isalnum() or c in '-_' else '_' for c in name) + '.prof')
+
+
+@contextmanager
+def profiled(name: str):
+    """
+    Runs enclosed code under cProfile if profiling capture mode is enabled, profile is merged into profile file of
+    given name, written after each call, so profiles of long running job can be inspected while it runs. Profile file
+    existing before first call in current process is overwritten.
+    :param name: string - profile name, eg. feature name
+    """
+    profile_dir = _profile_dir
+    if profile_dir is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile_file_url = _profile_file_url(profile_dir, name)
+        with _lock:
+            stats = _profiles.get(profile_file_url)
+            if stats is None:
+                _profiles[profile_file_url] = stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            stats.dump_stats(profile_file_url)
+
+
+def profile_summary(profile_dir: str = None, top: int = 20) -> pd.DataFrame:
+    """
+    Returns functions taking most self time (excluding time of called functions) in profile files of given directory
+    :param profile_dir: string - directory of profile files, current profile directory if None
+    :param top: int - number of functions of each profile
+    :return: pandas.DataFrame - row for each function of each profile (feature), with calls, self_seconds (tottime) and
+    cumulative_seconds (cumtime), sorted by feature and self time
+    """
+    profile_dir = profile_dir if profile_dir is not None else _profile_dir
+    rows = []
+    for profile_file_url in sorted(glob.glob(os.path.join(profile_dir, '*.prof'))):
+        name = os.path.splitext(os.path.basename(profile_file_url))[0]
+        stats = pstats.Stats(profile_file_url).stats
+        entries = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        for (file_name, line, function), (_, calls, self_time, cumulative_time, _) in entries:
+            rows.append({'feature': name, 'function': pstats.func_std_string((file_name, line, function)),
+                         'calls': calls, 'self_seconds': self_time, 'cumulative_seconds': cumulative_time})
+    return pd.DataFrame(rows, columns=['feature', 'function', 'calls', 'self_seconds', 'cumulative_seconds'])
+
+
+if os.environ.get('PUTEMG_PROFILE_DIR'):
+    set_profile_dir(os.environ['PUTEMG_PROFILE_DIR'])
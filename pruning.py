@@ -0,0 +1,147 @@
+import math
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+
+from . import biolab_utilities
+from .features import calculate_feature
+
+__all__ = ["feature_costs", "subset_accuracy", "pareto_front", "prune_features", "write_feature_subset"]
+
+
+def feature_costs(xml_file_url, record: pd.DataFrame, repeat: int = 3) -> Dict[str, float]:
+    """
+    Measures extraction time of each feature defined in given XML file, with its first windowing configuration
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - putEMG record, all its EMG channels are calculated
+    :param repeat: int - number of measurements of each feature, minimum is taken
+    :return: Dict[str, float] - extraction time in seconds for each feature name
+    """
+    xml_root = ET.parse(xml_file_url).getroot()
+    windowing_options = biolab_utilities.convert_types_in_dict(list(xml_root.iter('windowing'))[0].attrib)
+
+    costs = {}
+    for xml_entry in xml_root.iter('feature'):
+        attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+        best = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            calculate_feature(record, **attrib, verbose=False, window=windowing_options['window'],
+                              step=windowing_options['step'])
+            best = min(best, time.perf_counter() - start)
+        costs[attrib['name']] = best
+    return costs
+
+
+def _input_columns_regex(features: List[str]):
+    return "^input_[0-9]+_((" + ")|(".join(features) + "))_[0-9]+"
+
+
+def subset_accuracy(data: Dict[str, pd.DataFrame], features: List[str], predictor: str = 'LDA',
+                    norm_per_feature: bool = False, **predictor_args) -> float:
+    """
+    Trains predictor on given subset of features of 'train' set and returns its accuracy on 'test' set
+    :param data: Dict[str, pandas.DataFrame] - output of prepare_data with 'train' and 'test' sets
+    :param features: List[str] - feature names, eg. ['RMS', 'WL']
+    :param predictor: string - predictor name, see prepare_pipeline
+    :param norm_per_feature: bool - see prepare_pipeline
+    :param predictor_args: predictor parameters, see prepare_pipeline
+    :return: float - classification accuracy
+    """
+    columns_regex = _input_columns_regex(features)
+    pipe = biolab_utilities.prepare_pipeline(data['train'].filter(regex=columns_regex), data['train']['output_0'],
+                                             predictor, norm_per_feature=norm_per_feature, **predictor_args)
+    return accuracy_score(data['test']['output_0'], pipe.predict(data['test'].filter(regex=columns_regex)))
+
+
+def pareto_front(costs: np.ndarray, accuracies: np.ndarray) -> np.ndarray:
+    """
+    Returns mask of points not dominated by any other point, ie. with no other point as cheap and as accurate, and
+    cheaper or more accurate
+    :param costs: numpy.ndarray - cost of each point
+    :param accuracies: numpy.ndarray - accuracy of each point
+    :return: numpy.ndarray - boolean mask of Pareto front points
+    """
+    costs = np.asarray(costs)
+    accuracies = np.asarray(accuracies)
+    # [i, j] - point j dominates point i
+    no_worse = (costs[np.newaxis, :] <= costs[:, np.newaxis]) & (accuracies[np.newaxis, :] >= accuracies[:, np.newaxis])
+    better = (costs[np.newaxis, :] < costs[:, np.newaxis]) | (accuracies[np.newaxis, :] > accuracies[:, np.newaxis])
+    return ~np.any(no_worse & better, axis=1)
+
+
+def prune_features(xml_file_url, output_xml_url, dfs, s, gestures: List[int], costs: Dict[str, float],
+                   predictor: str = 'LDA', max_accuracy_loss: float = 0.01, norm_per_feature: bool = False,
+                   verbose: bool = True, **predictor_args):
+    """
+    Selects cheapest subset of features defined in given XML file with accuracy close to accuracy of all features,
+    and writes XML file calculating only selected features. Features are removed one by one (backward elimination),
+    each time the one losing least accuracy per second of extraction time saved. Subset is selected from Pareto front
+    of accuracy/cost of all subsets on elimination path.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param output_xml_url: string - url to reduced XML file to write
+    :param dfs: Dict[Record, pandas.DataFrame] - features calculated with given XML file, see prepare_data
+    :param s: Dict[str, List[Record]] - 'train' and 'test' records, see prepare_data
+    :param gestures: List[int] - gestures, see prepare_data
+    :param costs: Dict[str, float] - extraction time of each feature, see feature_costs
+    :param predictor: string - predictor name, see prepare_pipeline
+    :param max_accuracy_loss: float - maximum accuracy loss of selected subset in relation to all features
+    :param norm_per_feature: bool - see prepare_pipeline
+    :param verbose: bool - print elimination progress
+    :param predictor_args: predictor parameters, see prepare_pipeline
+    :return: selected: List[str] - selected feature names, path: pandas.DataFrame - features removed on elimination
+    path with cost, accuracy and Pareto front membership of remaining subset, marginal: pandas.Series - accuracy lost
+    by removing each feature from all features
+    """
+    xml_root = ET.parse(xml_file_url).getroot()
+    selected = [xml_entry.attrib['name'] for xml_entry in xml_root.iter('feature')]
+
+    data = biolab_utilities.prepare_data(dfs, s, selected, gestures)
+
+    def accuracy_of(features):
+        return subset_accuracy(data, features, predictor, norm_per_feature=norm_per_feature, **predictor_args)
+
+    accuracy = accuracy_of(selected)
+    path = [{'removed': None, 'cost': sum(costs[f] for f in selected), 'accuracy': accuracy,
+             'features': list(selected)}]
+    marginal = None
+    while len(selected) > 1:
+        accuracies = {f: accuracy_of([g for g in selected if g != f]) for f in selected}
+        losses = {f: accuracy - accuracies[f] for f in selected}
+        if marginal is None:
+            marginal = pd.Series(losses)
+        removed = min(selected, key=lambda f: (losses[f] / max(costs[f], 1e-12), -costs[f]))
+        selected.remove(removed)
+        accuracy = accuracies[removed]
+        path.append({'removed': removed, 'cost': sum(costs[f] for f in selected), 'accuracy': accuracy,
+                     'features': list(selected)})
+        if verbose:
+            print("Removed {:s}: cost {:.3f}s, accuracy {:.4f}".format(removed, path[-1]['cost'], accuracy))
+
+    path = pd.DataFrame(path)
+    path['pareto'] = pareto_front(path['cost'].values, path['accuracy'].values)
+
+    acceptable = path[path['pareto'] & (path['accuracy'] >= path['accuracy'][0] - max_accuracy_loss)]
+    selected = acceptable.loc[acceptable['cost'].idxmin(), 'features']
+    write_feature_subset(xml_file_url, output_xml_url, selected)
+
+    return selected, path, marginal if marginal is not None else pd.Series(dtype=float)
+
+
+def write_feature_subset(xml_file_url, output_xml_url, features: List[str]):
+    """
+    Writes copy of given XML file containing only given features, windowing and force features are kept
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param output_xml_url: string - url to XML file to write
+    :param features: List[str] - names of features to keep
+    """
+    tree = ET.parse(xml_file_url)
+    for parent in tree.getroot().iter():
+        for xml_entry in list(parent.findall('feature')):
+            if xml_entry.attrib['name'] not in features:
+                parent.remove(xml_entry)
+    tree.write(output_xml_url, xml_declaration=True)
@@ -0,0 +1,502 @@
+import math
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from scipy import signal
+
+from . import biolab_utilities
+from .features import calculate_cross_feature, calculate_feature
+from .feature_registry import get_feature
+from .feature_result import join_results
+
+__all__ = ["LatencyHistogram", "StreamingFilter", "RingBuffer", "StreamingFeatureExtractor",
+           "ScheduledFeatureExtractor", "RealTimeRecognizer", "replay_hdf5"]
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with logarithmic buckets (20 per decade, from 1us to 100s), constant memory and
+    constant time of recording
+    """
+
+    edges = np.logspace(-6, 2, 161)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[np.searchsorted(self.edges, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns upper bound of given percentile of recorded latencies
+        :param q: float - percentile, 0-100
+        :return: float - latency in seconds, NaN if nothing was recorded
+        """
+        if self.count == 0:
+            return np.nan
+        bucket = np.searchsorted(np.cumsum(self.counts), q / 100 * self.count)
+        return min(self.edges[min(bucket, len(self.edges) - 1)], self.max)
+
+    def summary(self) -> Dict[str, float]:
+        """Returns count and mean, median, 90th, 99th percentile and maximum latency in milliseconds"""
+        return {'count': self.count, 'mean_ms': self.total / self.count * 1000 if self.count else np.nan,
+                'p50_ms': self.percentile(50) * 1000, 'p90_ms': self.percentile(90) * 1000,
+                'p99_ms': self.percentile(99) * 1000, 'max_ms': self.max * 1000}
+
+
+class StreamingFilter:
+    """
+    Causal counterpart of pre_process: notch filters followed by Butterworth band-pass filter, applied chunk by chunk
+    with filter state carried between chunks, so output does not depend on chunk sizes
+    """
+
+    def __init__(self, channels: int, fs: float = 5120, low_cutoff: float = 20, high_cutoff: float = 700,
+                 notch_frequencies: List[float] = (50,), order: int = 5, notch_quality: float = 30):
+        """
+        :param channels: int - number of channels
+        :param fs: float - sampling frequency
+        :param low_cutoff: float - band-pass lower cutoff frequency
+        :param high_cutoff: float - band-pass upper cutoff frequency
+        :param notch_frequencies: List[float] - frequencies of power line interference to remove
+        :param order: int - band-pass filter order
+        :param notch_quality: float - notch filters quality factor
+        """
+        sections = [signal.tf2sos(*signal.iirnotch(f, notch_quality, fs=fs)) for f in notch_frequencies]
+        sections.append(signal.butter(order, [low_cutoff, high_cutoff], btype='band', output='sos', fs=fs))
+        self.sos = np.concatenate(sections)
+        self.state = np.zeros((len(self.sos), 2, channels))
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """
+        :param chunk: numpy.ndarray - samples x channels
+        :return: numpy.ndarray - filtered chunk
+        """
+        filtered, self.state = signal.sosfilt(self.sos, chunk, axis=0, zi=self.state)
+        return filtered
+
+
+class RingBuffer:
+    """Fixed-size buffer of most recent samples of all channels"""
+
+    def __init__(self, capacity: int, channels: int):
+        self.data = np.zeros((capacity, channels))
+        self.position = 0  # total number of samples written
+        self.capacity = capacity
+
+    def extend(self, chunk: np.ndarray):
+        self.position += len(chunk)
+        chunk = chunk[-self.capacity:]
+        start = (self.position - len(chunk)) % self.capacity
+        first = min(len(chunk), self.capacity - start)
+        self.data[start:start + first] = chunk[:first]
+        self.data[:len(chunk) - first] = chunk[first:]
+
+    def latest(self, n: int) -> np.ndarray:
+        """Returns copy of n most recent samples, oldest first"""
+        start = (self.position - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n].copy()
+        return np.concatenate((self.data[start:], self.data[:start + n - self.capacity]))
+
+
+class StreamingFeatureExtractor:
+    """
+    Calculates features defined in XML config on stream of EMG samples: samples are kept in ring buffer, and each
+    time a window is complete, features of the window are calculated from the most recent samples, including
+    preceding windows required by features such as MAVSLP. Outputs are equal to features_from_xml_on_df on whole
+    record at the same windows. Features which are not window local (see FeatureInfo.window_local, eg. MDF) depend on
+    other windows calculated at once, so they cannot be calculated on stream and are rejected.
+    """
+
+    def __init__(self, xml_file_url, channels: int, fs: float = 5120):
+        """
+        :param xml_file_url: string or file object - XML file containing feature descriptors, first windowing is used
+        :param channels: int - number of EMG channels, labelled EMG_1 ... EMG_<channels>
+        :param fs: float - sampling frequency
+        """
+        xml_root = ET.parse(xml_file_url).getroot()
+        windowing_options = biolab_utilities.convert_types_in_dict(list(xml_root.iter('windowing'))[0].attrib)
+        self.window = windowing_options['window']
+        self.step = windowing_options['step']
+        self.feature_entries = [biolab_utilities.convert_types_in_dict(e.attrib) for e in xml_root.iter('feature')]
+        self.cross_feature_entries = [biolab_utilities.convert_types_in_dict(e.attrib)
+                                      for e in xml_root.iter('cross_feature')]
+        for attrib, kind in [(attrib, 'emg') for attrib in self.feature_entries] + \
+                            [(attrib, 'cross') for attrib in self.cross_feature_entries]:
+            if not get_feature(attrib['name'], kind=kind).window_local:
+                raise ValueError(attrib['name'] + ' feature is not window local and cannot be calculated on stream')
+
+        # Windows preceding current one required by features depending on previous windows, eg. MAVSLP
+        lookback = max([get_feature(attrib['name']).lookback for attrib in self.feature_entries] + [0])
+        self.history = self.window + lookback * self.step
+
+        self.channels = ['EMG_' + str(i) for i in range(1, channels + 1)]
+        self.fs = fs
+        self.buffer = RingBuffer(self.history, channels)
+        with np.errstate(all='ignore'):
+            self.columns = self._calculate(np.zeros((self.history, channels))).columns
+
+        self._next_window_end = self.history  # number of received samples completing next window
+
+    def _calculate(self, samples: np.ndarray):
+        record = pd.DataFrame(samples, columns=self.channels)
+        return join_results([calculate_feature(record, **attrib, verbose=False, output='result', window=self.window,
+                                               step=self.step) for attrib in self.feature_entries] +
+                            [calculate_cross_feature(record, **attrib, verbose=False, output='result',
+                                                     window=self.window, step=self.step)
+                             for attrib in self.cross_feature_entries])
+
+    def features(self) -> np.ndarray:
+        """Returns feature values of the most recent window, ordered as columns"""
+        return self._calculate(self.buffer.latest(self.history)).values[-1]
+
+    def completed_windows(self, chunk: np.ndarray):
+        """
+        Appends chunk of samples to buffer, stopping at each completed window
+        :param chunk: numpy.ndarray - samples x channels
+        :return: generator of int - sample number of window end, when the window is the most recent one in buffer, see
+        features
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(-1, len(self.channels))
+        position = 0
+        while position < len(chunk):
+            count = min(len(chunk) - position, self._next_window_end - self.buffer.position)
+            self.buffer.extend(chunk[position:position + count])
+            position += count
+            if self.buffer.position < self._next_window_end:
+                break
+            self._next_window_end += self.step
+            yield self.buffer.position - 1
+
+    def process(self, chunk: np.ndarray):
+        """
+        Processes chunk of samples, and returns features of all windows completed by the chunk
+        :param chunk: numpy.ndarray - samples x channels
+        :return: samples: numpy.ndarray - sample numbers of window ends, values: numpy.ndarray - feature values, row for
+        each window, ordered as columns
+        """
+        samples = []
+        values = []
+        for sample in self.completed_windows(chunk):
+            samples.append(sample)
+            values.append(self.features())
+        return np.array(samples, dtype=np.int64), np.array(values).reshape(len(samples), len(self.columns))
+
+
+class ScheduledFeatureExtractor(StreamingFeatureExtractor):
+    """
+    StreamingFeatureExtractor keeping feature calculation of each window within latency budget: each feature entry
+    of XML config has priority and cost measured on previous windows (moving average), and when features do not fit
+    in budget, features of the lowest priority (the most expensive first) are decimated - calculated every 2nd, 4th,
+    ... max_decimation-th window, with value of the last calculated window held in between - and then skipped, holding
+    value of the first window. Decimated features are spread over windows, so that cost of the most loaded window, not
+    only average cost, fits in budget. Every feature is calculated on the first window. Windows exceeding budget are
+    counted as deadline misses and trigger new schedule, schedule is also updated when measured cost of any feature
+    changes by more than cost_tolerance. Features which are not window local are rejected, as by
+    StreamingFeatureExtractor.
+    """
+
+    def __init__(self, xml_file_url, channels: int, fs: float = 5120, budget: float = None,
+                 priorities: Dict[str, int] = None, costs: Dict[str, float] = None, max_decimation: int = 8,
+                 smoothing: float = 0.2, cost_tolerance: float = 0.25):
+        """
+        :param xml_file_url: string or file object - XML file containing feature descriptors, first windowing is used
+        :param channels: int - number of EMG channels, labelled EMG_1 ... EMG_<channels>
+        :param fs: float - sampling frequency
+        :param budget: float - maximum feature calculation time of each window in seconds, half of step duration if
+        None, leaving the rest for classification
+        :param priorities: Dict[str, int] - priority of features by name, higher priority features are decimated last,
+        0 by default
+        :param costs: Dict[str, float] - initial cost estimates of features by name in seconds (all channels), so
+        schedule is ready before the first window, measured on the first window if missing
+        :param max_decimation: int - highest decimation factor before feature is skipped, power of 2
+        :param smoothing: float - weight of the last measurement in moving average of feature cost, 0 keeps initial
+        estimates
+        :param cost_tolerance: float - relative change of feature cost triggering new schedule
+        """
+        super().__init__(xml_file_url, channels, fs)
+        self.budget = budget if budget is not None else self.step / fs / 2
+        self.max_decimation = max_decimation
+        self.smoothing = smoothing
+        self.cost_tolerance = cost_tolerance
+
+        self.entries = [(get_feature(attrib['name']), attrib) for attrib in self.feature_entries] + \
+                       [(get_feature(attrib['name'], kind='cross'), attrib) for attrib in self.cross_feature_entries]
+        priorities = {name.lower(): priority for name, priority in (priorities or {}).items()}
+        costs = {name.lower(): cost for name, cost in (costs or {}).items()}
+        self.priorities = [priorities.get(feature_info.name.lower(), 0) for feature_info, _ in self.entries]
+        self.costs = [costs.get(feature_info.name.lower(), math.nan) for feature_info, _ in self.entries]
+
+        # columns of each entry in feature vector
+        self._slices = []
+        column = 0
+        record = pd.DataFrame(np.zeros((self.history, channels)), columns=self.channels)
+        with np.errstate(all='ignore'):
+            for i in range(len(self.entries)):
+                width = len(self._calculate_entry(record, i).columns)
+                self._slices.append(slice(column, column + width))
+                column += width
+
+        self.values = np.full(len(self.columns), np.nan)  # feature values held between calculations
+        self.decimation = [1] * len(self.entries)  # 0 for skipped features
+        self.phases = [0] * len(self.entries)
+        self.calculated = [0] * len(self.entries)
+        self.windows = 0
+        self.deadline_misses = 0
+        self.latency = LatencyHistogram()
+        self._planned_costs = list(self.costs)
+        if not any(math.isnan(cost) for cost in self.costs):
+            self.schedule()
+
+    def _calculate_entry(self, record: pd.DataFrame, i: int):
+        feature_info, attrib = self.entries[i]
+        if feature_info.kind == 'cross':
+            return calculate_cross_feature(record, **attrib, verbose=False, output='result', window=self.window,
+                                           step=self.step)
+        return calculate_feature(record, **attrib, verbose=False, output='result', window=self.window,
+                                 step=self.step)
+
+    def features(self) -> np.ndarray:
+        """
+        Returns feature values of the most recent window, ordered as columns, features which are not calculated in
+        this window hold their last values, see schedule
+        """
+        start = time.perf_counter()
+        record = pd.DataFrame(self.buffer.latest(self.history), columns=self.channels)
+        slot = self.windows % self.max_decimation
+        for i in range(len(self.entries)):
+            due = self.decimation[i] and (slot - self.phases[i]) % self.decimation[i] == 0
+            if not due and self.calculated[i]:
+                continue
+            entry_start = time.perf_counter()
+            self.values[self._slices[i]] = self._calculate_entry(record, i).values[-1]
+            cost = time.perf_counter() - entry_start
+            if math.isnan(self.costs[i]):
+                self.costs[i] = cost
+            else:
+                self.costs[i] += self.smoothing * (cost - self.costs[i])
+            self.calculated[i] += 1
+
+        elapsed = time.perf_counter() - start
+        self.latency.record(elapsed)
+        self.windows += 1
+        if elapsed > self.budget:
+            self.deadline_misses += 1
+        if elapsed > self.budget or any(abs(cost - planned) > self.cost_tolerance * planned or math.isnan(planned)
+                                        for cost, planned in zip(self.costs, self._planned_costs)):
+            self.schedule()
+        return self.values.copy()
+
+    def schedule(self):
+        """
+        Updates decimation and phase of each feature from its current cost estimate, see ScheduledFeatureExtractor.
+        Feature with decimation k and phase p is calculated in windows w with w % k == p % k.
+        """
+        costs = [0.0 if math.isnan(cost) else cost for cost in self.costs]
+        decimation = [1] * len(self.entries)
+        load = [sum(costs)]  # average cost of window
+
+        def degrade():
+            """Decimates or skips the most expensive feature of the lowest priority, False if all are skipped"""
+            active = [i for i in range(len(decimation)) if decimation[i]]
+            if not active:
+                return False
+            i = min(active, key=lambda j: (self.priorities[j], -costs[j] / decimation[j]))
+            load[0] -= costs[i] / decimation[i]
+            decimation[i] = decimation[i] * 2 if decimation[i] < self.max_decimation else 0
+            load[0] += costs[i] / decimation[i] if decimation[i] else 0
+            return True
+
+        while load[0] > self.budget and degrade():
+            pass
+        while True:
+            phases, max_load = self._assign_phases(decimation, costs)
+            if max_load <= self.budget or not degrade():
+                break
+
+        self.decimation = decimation
+        self.phases = phases
+        self._planned_costs = list(self.costs)
+
+    def _assign_phases(self, decimation, costs):
+        """Assigns phases of decimated features greedily to the least loaded windows, returns cost of the most loaded"""
+        loads = [0.0] * self.max_decimation
+        phases = [0] * len(decimation)
+        for i in sorted((i for i in range(len(decimation)) if decimation[i]), key=lambda i: -costs[i] / decimation[i]):
+            k = decimation[i]
+            phases[i] = min(range(k), key=lambda phase: max(loads[phase::k]))
+            for slot in range(phases[i], self.max_decimation, k):
+                loads[slot] += costs[i]
+        return phases, max(loads)
+
+    def schedule_report(self) -> pd.DataFrame:
+        """
+        Returns schedule of each feature entry: priority, cost_ms (current estimate), decimation (0 for skipped) and
+        number of windows it was calculated in
+        """
+        return pd.DataFrame({'priority': self.priorities, 'cost_ms': np.array(self.costs) * 1000,
+                             'decimation': self.decimation, 'calculated': self.calculated},
+                            index=[feature_info.name for feature_info, _ in self.entries])
+
+
+class RealTimeRecognizer:
+    """
+    Real-time gesture recognition loop: raw EMG chunks are preprocessed with causal filter, and each time a window
+    defined in XML config is complete, its features are calculated with StreamingFeatureExtractor and classified by
+    fitted pipeline (see prepare_pipeline), and raw predictions are smoothed with causal median filter. Latency of each
+    stage is recorded in histograms, latency of each output is checked against deadline, by default one step duration.
+    With feature_budget or priorities, features are calculated by ScheduledFeatureExtractor within feature budget.
+    """
+
+    stages = ['queue', 'preprocess', 'features', 'predict', 'postfilter', 'total']
+
+    def __init__(self, xml_file_url, pipeline, channels: int, fs: float = 5120, preprocessing: StreamingFilter = None,
+                 median_filter: int = 5, deadline: float = None, feature_budget: float = None,
+                 priorities: Dict[str, int] = None):
+        """
+        :param xml_file_url: string - url to XML file containing feature descriptors, first windowing is used
+        :param pipeline: sklearn.pipeline.Pipeline - fitted classifier, see prepare_pipeline. If fitted on DataFrame,
+        its input columns are ordered as in training, also for columns named by prepare_data (input_<i>_<feature>)
+        :param channels: int - number of EMG channels, labelled EMG_1 ... EMG_<channels>
+        :param fs: float - sampling frequency
+        :param preprocessing: StreamingFilter - causal preprocessing, None to use raw signal
+        :param median_filter: int - number of recent predictions filtered prediction is median of
+        :param deadline: float - maximum latency of each output in seconds, step duration if None
+        :param feature_budget: float - maximum feature calculation time of each window, see ScheduledFeatureExtractor
+        :param priorities: Dict[str, int] - priority of features by name, see ScheduledFeatureExtractor
+        """
+        if feature_budget is not None or priorities is not None:
+            self.extractor = ScheduledFeatureExtractor(xml_file_url, channels, fs, budget=feature_budget,
+                                                       priorities=priorities)
+        else:
+            self.extractor = StreamingFeatureExtractor(xml_file_url, channels, fs)
+        self.window = self.extractor.window
+        self.step = self.extractor.step
+        self.channels = self.extractor.channels
+        self.fs = fs
+
+        self.pipeline = pipeline
+        self.preprocessing = preprocessing
+        self.predictions = deque(maxlen=median_filter)
+        self.deadline = deadline if deadline is not None else self.step / fs
+        self.deadline_misses = 0
+        self.latency = {stage: LatencyHistogram() for stage in self.stages}
+
+        self._model_columns = getattr(self.pipeline, 'feature_names_in_', None)
+        if self._model_columns is None:
+            self._column_indexes = np.arange(len(self.extractor.columns))
+        else:
+            labels = [re.sub(r"^input_[0-9]+_", "", c) for c in self._model_columns]
+            self._column_indexes = np.array([self.extractor.columns.index(label) for label in labels])
+
+    def process(self, chunk: np.ndarray, arrival_time: float = None):
+        """
+        Processes chunk of raw EMG samples, and returns outputs for all windows completed by the chunk
+        :param chunk: numpy.ndarray - samples x channels
+        :param arrival_time: float - time.perf_counter() of chunk arrival, now if None
+        :return: List[Tuple[int, int, int]] - (sample number of window end, raw prediction, filtered prediction) of
+        each completed window
+        """
+        start = time.perf_counter()
+        if arrival_time is None:
+            arrival_time = start
+        self.latency['queue'].record(start - arrival_time)
+
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(-1, len(self.channels))
+        if self.preprocessing is not None:
+            chunk = self.preprocessing.process(chunk)
+        stage_end = time.perf_counter()
+        self.latency['preprocess'].record(stage_end - start)
+
+        outputs = []
+        for sample in self.extractor.completed_windows(chunk):
+            stage_start = time.perf_counter()
+            feature_values = self.extractor.features()[self._column_indexes]
+            stage_end = time.perf_counter()
+            self.latency['features'].record(stage_end - stage_start)
+
+            stage_start = stage_end
+            if self._model_columns is not None:
+                model_input = pd.DataFrame(feature_values[np.newaxis], columns=self._model_columns)
+            else:
+                model_input = feature_values[np.newaxis]
+            raw = self.pipeline.predict(model_input)[0]
+            stage_end = time.perf_counter()
+            self.latency['predict'].record(stage_end - stage_start)
+
+            stage_start = stage_end
+            self.predictions.append(raw)
+            filtered = sorted(self.predictions)[len(self.predictions) // 2]
+            stage_end = time.perf_counter()
+            self.latency['postfilter'].record(stage_end - stage_start)
+
+            total = stage_end - arrival_time
+            self.latency['total'].record(total)
+            if total > self.deadline:
+                self.deadline_misses += 1
+
+            outputs.append((sample, raw, filtered))
+        return outputs
+
+    def latency_report(self) -> pd.DataFrame:
+        """
+        Returns latency summary of each stage, see LatencyHistogram.summary, 'total' is latency of each output from
+        chunk arrival, with number of outputs exceeding deadline, 'features' with number of windows exceeding feature
+        budget of ScheduledFeatureExtractor
+        """
+        report = pd.DataFrame({stage: histogram.summary() for stage, histogram in self.latency.items()}).T
+        report['deadline_ms'] = self.deadline * 1000
+        report['deadline_misses'] = np.nan
+        report.loc['total', 'deadline_misses'] = self.deadline_misses
+        if isinstance(self.extractor, ScheduledFeatureExtractor):
+            report.loc['features', 'deadline_ms'] = self.extractor.budget * 1000
+            report.loc['features', 'deadline_misses'] = self.extractor.deadline_misses
+        return report
+
+
+def replay_hdf5(hdf5_file_url, recognizer: RealTimeRecognizer, chunk_size: int = 256, speed: float = 1.0,
+                verbose: bool = True) -> pd.DataFrame:
+    """
+    Feeds EMG channels of putEMG record to real-time recognizer in chunks, at real-time or accelerated speed
+    :param hdf5_file_url: string - url to putEMG hdf5 record file
+    :param recognizer: RealTimeRecognizer - recognizer with the same number of channels as record
+    :param chunk_size: int - number of samples in chunk
+    :param speed: float - replay speed, 1.0 for real-time, None to feed chunks as fast as they are processed
+    :param verbose: bool - print latency report after replay
+    :return: pandas.DataFrame - raw and filtered predictions indexed with record labels of window ends, with TRAJ_GT
+    column if present in record
+    """
+    record: pd.DataFrame = pd.read_hdf(hdf5_file_url)
+    emg = record[recognizer.channels].values
+
+    outputs = []
+    start = time.perf_counter()
+    for chunk_start in range(0, len(emg), chunk_size):
+        chunk = emg[chunk_start:chunk_start + chunk_size]
+        arrival_time = None
+        if speed is not None:  # chunk is complete when its last sample is acquired
+            arrival_time = start + (chunk_start + len(chunk)) / recognizer.fs / speed
+            time.sleep(max(arrival_time - time.perf_counter(), 0))
+        outputs.extend(recognizer.process(chunk, arrival_time=arrival_time))
+
+    samples = np.array([sample for sample, _, _ in outputs], dtype=np.int64)
+    predictions = pd.DataFrame({'raw': [raw for _, raw, _ in outputs],
+                                'filtered': [filtered for _, _, filtered in outputs]}, index=record.index[samples])
+    if 'TRAJ_GT' in record:
+        predictions['TRAJ_GT'] = record['TRAJ_GT'].values[samples]
+
+    if verbose:
+        print(recognizer.latency_report().to_string(float_format="{:.3f}".format))
+    return predictions
@@ -0,0 +1,426 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy import interpolate, signal, stats
+
+from . import biolab_utilities
+from .pyeeg import pyeeg
+
+__all__ = ["reference_kernel", "reference_features"]
+
+
+# Frozen reference implementations of all features: original window by window code (SciPy periodogram, PyEEG
+# entropies, interpreted box counting), converted to window kernel signature, see window_kernel. They define expected
+# output of optimised implementations in features, kernels and spectrum, checked by differential.
+# Do not optimise or otherwise change them.
+_references = {'emg': {}, 'force': {}}
+
+
+def _reference(name, kind='emg'):
+    def decorator(func):
+        _references[kind][name.lower()] = func
+        return func
+    return decorator
+
+
+def reference_kernel(name: str, kind: str = 'emg'):
+    """
+    Returns reference implementation of given feature
+    :param name: string - feature name, case insensitive
+    :param kind: string - 'emg' or 'force'
+    :return: function - window kernel taking numpy.ndarray, window, step and feature parameters, None if feature has
+    no reference implementation, eg. third-party feature
+    """
+    return _references[kind].get(name.lower())
+
+
+def reference_features(kind: str = 'emg'):
+    """Returns names (lower case) of features with reference implementation"""
+    return list(_references[kind].keys())
+
+
+@_reference('IAV')
+def reference_iav(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.abs(windows_strided), axis=1), indexes
+
+
+@_reference('AAC')
+def reference_aac(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.divide(np.sum(np.abs(np.diff(windows_strided)), axis=1), window), indexes
+
+
+@_reference('ApEn')
+def reference_apen(values, window, step, m, r):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.apply_along_axis(lambda win: pyeeg.ap_entropy(win, m, r), axis=1, arr=windows_strided), indexes
+
+
+@_reference('AR')
+def reference_ar(values, window, step, order):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+
+    win_coefs = np.empty((len(windows_strided), order), dtype=np.float64)
+    for widx in range(len(windows_strided)):
+        stride = windows_strided[widx].strides[0]
+        stride_count = len(windows_strided[widx]) - order
+        x = as_strided(windows_strided[widx], shape=[stride_count, order], strides=(stride, stride))
+        y = windows_strided[widx][order:]
+
+        a, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
+
+        win_coefs[widx, :] = a
+    return win_coefs, indexes
+
+
+@_reference('CC')
+def reference_cc(values, window, step, order):
+    coefs, indexes = reference_ar(values, window, step, order)
+    coefs[:, 0] = -coefs[:, 0]
+    for r in range(0, coefs.shape[0]):
+        for p in range(1, order):
+            coefs[r, p] = -coefs[r, p] - np.sum(
+                [1 - (l / (p + 1)) for l in range(1, p + 1)] * np.full(p, coefs[r, p] * coefs[r, p - 1]))
+    return coefs, indexes
+
+
+@_reference('DASDV')
+def reference_dasdv(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sqrt(np.mean(np.square(np.diff(windows_strided)), axis=1)), indexes
+
+
+@_reference('Kurt')
+def reference_kurt(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return stats.kurtosis(windows_strided, axis=1), indexes
+
+
+@_reference('LOG')
+def reference_log(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.exp(np.mean(np.log(np.abs(windows_strided)), axis=1)), indexes
+
+
+@_reference('MAV1')
+def reference_mav1(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    win_weight = [1 if ((0.25*window <= i) & (i <= 0.75*window)) else 0.5 for i in range(1, window+1)]
+    return np.mean(np.abs(windows_strided) * win_weight, axis=1), indexes
+
+
+@_reference('MAV2')
+def reference_mav2(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    win_weight = biolab_utilities.window_trapezoidal(window, 0.25)
+    return np.mean(np.abs(windows_strided) * win_weight, axis=1), indexes
+
+
+@_reference('MAV')
+def reference_mav(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.mean(np.abs(windows_strided), axis=1), indexes
+
+
+@_reference('MAVSLP')
+def reference_mavslp(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.diff(np.mean(np.abs(windows_strided), axis=1)), indexes[1:]
+
+
+@_reference('MHW')
+def reference_mhw(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.square(windows_strided * np.hamming(window)), axis=1), indexes
+
+
+@_reference('MTW')
+def reference_mtw(values, window, step, windowslope):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.square(windows_strided) * biolab_utilities.window_trapezoidal(window, windowslope),
+                  axis=1), indexes
+
+
+@_reference('MYOP')
+def reference_myop(values, window, step, threshold):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(windows_strided > threshold, axis=1) / window, indexes
+
+
+@_reference('RMS')
+def reference_rms(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sqrt(np.mean(np.square(windows_strided), axis=1)), indexes
+
+
+@_reference('SampleEn')
+def reference_sampleen(values, window, step, m, r):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.apply_along_axis(lambda win: pyeeg.samp_entropy(win, m, r), axis=1, arr=windows_strided), indexes
+
+
+@_reference('Skew')
+def reference_skew(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return stats.skew(windows_strided, axis=1), indexes
+
+
+@_reference('SSC')
+def reference_ssc(values, window, step, threshold):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.apply_along_axis(lambda x: np.sum((np.diff(x[:-1]) * np.diff(x[1:])) <= -threshold),
+                               axis=1, arr=windows_strided), indexes
+
+
+@_reference('SSI')
+def reference_ssi(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.square(windows_strided), axis=1), indexes
+
+
+@_reference('TM')
+def reference_tm(values, window, step, order):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.abs(np.mean(np.power(windows_strided, order), axis=1)), indexes
+
+
+@_reference('VAR')
+def reference_var(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.var(windows_strided, axis=1), indexes
+
+
+@_reference('V')
+def reference_v(values, window, step, v):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.power(np.abs(np.mean(np.power(windows_strided, v), axis=1)), 1./v), indexes
+
+
+@_reference('WAMP')
+def reference_wamp(values, window, step, threshold):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.diff(windows_strided) >= threshold, axis=1), indexes
+
+
+@_reference('WL')
+def reference_wl(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.sum(np.diff(windows_strided), axis=1), indexes
+
+
+@_reference('ZC')
+def reference_zc(values, window, step, threshold):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    zc = np.apply_along_axis(lambda x: np.sum(np.diff(x[(x < -threshold) | (x > threshold)] > 0)), axis=1,
+                             arr=windows_strided)
+    return zc, indexes
+
+
+@_reference('MNF')
+def reference_mnf(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    return np.sum(power*freq, axis=1) / np.sum(power, axis=1), indexes
+
+
+@_reference('MDF')
+def reference_mdf(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    ttp_half = np.sum(power, axis=1)/2
+    mdf = np.zeros(len(windows_strided))
+    for w in range(len(power)):
+        for s in range(1, len(power) + 1):
+            if np.sum(power[w, :s]) > ttp_half[w]:
+                mdf[w] = freq[s - 1]
+                break
+    return mdf, indexes
+
+
+@_reference('PKF')
+def reference_pkf(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    return freq[np.argmax(power, axis=1)], indexes
+
+
+@_reference('MNP')
+def reference_mnp(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    return np.mean(power, axis=1), indexes
+
+
+@_reference('TTP')
+def reference_ttp(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    return np.sum(power, axis=1), indexes
+
+
+@_reference('SM')
+def reference_sm(values, window, step, order):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    return np.sum(power * np.power(freq, order), axis=1), indexes
+
+
+@_reference('FR')
+def reference_fr(values, window, step, flb, fhb):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    lb = np.sum(power[:, (flb[0] < freq) & (freq < flb[1])], axis=1)
+    hb = np.sum(power[:, (fhb[0] < freq) & (freq < fhb[1])], axis=1)
+    return lb / hb, indexes
+
+
+@_reference('VCF')
+def reference_vcf(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+
+    def sm(order):
+        return np.sum(power * np.power(freq, order), axis=1)
+
+    return sm(2)/sm(0) - np.square(sm(1)/sm(0)), indexes
+
+
+@_reference('PSR')
+def reference_psr(values, window, step, n):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    PKF_id = np.argmax(power, axis=1)
+    lb = np.where(PKF_id - 20 < 0, 0, PKF_id - 20)
+    hb = np.where(PKF_id + 20 > window, window, PKF_id + 20)
+    return [sum(p[l:h]) for p, l, h in zip(power, lb, hb)] / np.sum(power, axis=1), indexes
+
+
+@_reference('SNR')
+def reference_snr(values, window, step, powerband, noiseband):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    snr = np.apply_along_axis(lambda p:
+                              np.sum(p[(freq > powerband[0]) & (freq < powerband[1])]) /
+                              (np.sum(p[(freq > noiseband[0]) & (freq < noiseband[1])]) * np.max(freq)),
+                              axis=1, arr=power)
+    return snr, indexes
+
+
+@_reference('DPR')
+def reference_dpr(values, window, step, band, n):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+
+    dpr = np.empty(len(power))
+    for pidx in range(len(power)):
+        power_b = power[pidx][(freq > band[0]) & (freq < band[1])]
+        stride = power_b.strides[0]
+        stride_count = len(power_b) - n + 1
+        p_strided = as_strided(power_b, shape=[stride_count, n], strides=(stride, stride))
+        means = np.mean(p_strided, axis=1)
+        dpr[pidx] = np.max(means) / np.min(means)
+    return dpr, indexes
+
+
+@_reference('OHM')
+def reference_ohm(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+
+    def sm(order):
+        return np.sum(power * np.power(freq, order), axis=1)
+
+    return np.sqrt(sm(2)/sm(0)) / (sm(1)/sm(0)), indexes
+
+
+@_reference('MAX')
+def reference_max(values, window, step, order, cutoff):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    fs = 5120
+    b, a = signal.butter(order, cutoff / (0.5 * fs), btype='lowpass', analog=False, output='ba')
+    return np.max(signal.lfilter(b, a, np.abs(windows_strided), axis=1), axis=1), indexes
+
+
+@_reference('SMR')
+def reference_smr(values, window, step, n):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+
+    freq_over35 = freq > 35
+    freq_over35_idx = np.argmax(freq_over35)
+
+    smr = np.empty(len(power))
+    for pidx in range(len(power)):
+        power_b = power[pidx][freq_over35]
+        stride = power_b.strides[0]
+        stride_count = len(power_b) - n + 1
+        p_strided = as_strided(power_b, shape=[stride_count, n], strides=(stride, stride))
+        mean = np.mean(p_strided, axis=1)
+        max_idx = np.argmax(mean) + int(np.floor(n / 2.0)) + freq_over35_idx
+        a = np.max(mean) / freq[max_idx]
+
+        smr[pidx] = np.sum(power[pidx][freq < 600]) / np.sum(power[pidx][power[pidx] > (freq*a)])
+    return smr, indexes
+
+
+def _box_counting_dimension(sig, y_box_size_multiplier, subsampling):
+    n = 2 ** np.floor(np.log(len(sig)) / np.log(2))
+    n = int(np.log(n) / np.log(2))
+    sizes = 2 ** np.arange(n, 1, -1)
+
+    box_count = []
+    for box_size in sizes:
+        x_box_size = box_size
+        y_box_size = box_size * y_box_size_multiplier
+
+        sig_minimum = np.min(sig)
+
+        box_occupation = np.zeros(
+            [int(len(sig) / x_box_size) + 1, int((np.max(sig) - sig_minimum) / y_box_size) + 1])
+
+        interp_func = interpolate.interp1d(np.arange(0, len(sig), 1), sig.reshape(1, len(sig))[0])
+        x_interp = np.arange(0, len(sig) - 1 + 1 / subsampling, 1 / subsampling)
+        sig_interp = interp_func(x_interp)
+
+        for i in range(len(sig_interp)):
+            x_box_id = int(x_interp[i] / x_box_size)
+            y_box_id = int((sig_interp[i] - sig_minimum) / y_box_size)
+            box_occupation[x_box_id, y_box_id] = 1
+
+        box_count.append(np.sum(box_occupation))
+
+    coefs = np.polyfit(np.log(1 / sizes), np.log(box_count), 1)
+    return coefs[0]
+
+
+@_reference('BC')
+def reference_bc(values, window, step, y_box_size_multiplier, subsampling):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.apply_along_axis(lambda sig: _box_counting_dimension(sig, y_box_size_multiplier, subsampling),
+                               axis=1, arr=windows_strided), indexes
+
+
+@_reference('PSDFD')
+def reference_psdfd(values, window, step, power_box_size_multiplier, subsampling):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    freq, power = signal.periodogram(windows_strided, 5120)
+    return np.apply_along_axis(lambda sig: _box_counting_dimension(sig, power_box_size_multiplier, subsampling),
+                               axis=1, arr=power), indexes
+
+
+@_reference('Mean', kind='force')
+def reference_force_mean(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.mean(windows_strided, axis=1), indexes
+
+
+@_reference('Median', kind='force')
+def reference_force_median(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return np.median(windows_strided, axis=1), indexes
+
+
+@_reference('Last', kind='force')
+def reference_force_last(values, window, step):
+    windows_strided, indexes = biolab_utilities.moving_window_stride(values, window, step)
+    return windows_strided[::, -1], indexes
@@ -0,0 +1,126 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy import fft
+
+from . import metrics
+
+__all__ = ["periodogram", "periodogram_frequencies", "window_spectrum", "total_power", "set_spectrum_workers"]
+
+
+_workers = -1  # number of FFT threads, negative values count from number of CPUs (-1 - all CPUs)
+_block_bytes = 2 ** 22  # size of temporary arrays of each block of windows of band-limited spectrum
+
+
+def set_spectrum_workers(workers: int):
+    """
+    Sets number of threads used by periodogram FFT, eg. 1 when windows are already processed in parallel
+    :param workers: int - number of threads, -1 for all available CPUs
+    """
+    global _workers
+    _workers = workers
+
+
+@lru_cache(maxsize=64)
+def _periodogram_constants(window, fs):
+    freq = fft.rfftfreq(window, 1 / fs)
+
+    # 'density' scaling of boxcar window, with one-sided spectrum bins doubled except DC (and Nyquist if present)
+    scale = np.full(len(freq), 2 / (fs * window))
+    scale[0] /= 2
+    if window % 2 == 0:
+        scale[-1] /= 2
+
+    freq.setflags(write=False)
+    scale.setflags(write=False)
+    return freq, scale
+
+
+metrics.register_lru_cache('periodogram_constants', _periodogram_constants)
+
+
+def periodogram_frequencies(window, fs):
+    """
+    Returns frequency grid of periodogram of given window size, shared between calls (read-only)
+    :param window: int - window size
+    :param fs: float - sampling frequency
+    :return: numpy.ndarray - sample frequencies
+    """
+    return _periodogram_constants(window, fs)[0]
+
+
+def periodogram(windows, fs, workers=None, max_frequency=None):
+    """
+    Calculates power spectral density of each window with real FFT. Output is equal to
+    scipy.signal.periodogram(windows, fs) with default parameters (boxcar window, constant detrend, density scaling,
+    one-sided spectrum) up to floating point rounding. Frequency grid and scaling constants are cached per window
+    size and sampling frequency.
+    :param windows: numpy.ndarray - 2D array of windows, eg. view returned by moving_window_stride
+    :param fs: float - sampling frequency
+    :param workers: int - number of FFT threads, see set_spectrum_workers if None
+    :param max_frequency: float - highest frequency used by caller, only bins up to it are returned, so power of
+    features using low frequency band takes less memory and later reductions are shorter. All bins if None.
+    :return: freq: numpy.ndarray - sample frequencies (read-only), power: numpy.ndarray - power spectral density
+    """
+    freq, scale, spectrum = _detrended_spectrum(windows, fs, workers, max_frequency)
+    power = np.square(spectrum.real)
+    power += np.square(spectrum.imag)
+    power *= scale
+    return freq, power
+
+
+def window_spectrum(windows, fs, workers=None, max_frequency=None):
+    """
+    Calculates one-sided spectrum of each detrended window with real FFT, scaled so that product of spectrum of one
+    window and complex conjugate of spectrum of another window of the same length is their cross spectral density,
+    and squared magnitude is periodogram, see periodogram
+    :param windows: numpy.ndarray - array of windows along last axis, eg. channels x windows x samples
+    :param fs: float - sampling frequency
+    :param workers: int - number of FFT threads, see set_spectrum_workers if None
+    :param max_frequency: float - highest frequency used by caller, see periodogram
+    :return: freq: numpy.ndarray - sample frequencies (read-only), spectrum: numpy.ndarray - complex spectrum
+    """
+    freq, scale, spectrum = _detrended_spectrum(windows, fs, workers, max_frequency)
+    spectrum *= np.sqrt(scale)
+    return freq, spectrum
+
+
+def _detrended_spectrum(windows, fs, workers, max_frequency):
+    """
+    Returns frequencies, density scaling and unscaled real FFT of detrended windows up to max_frequency. Band-limited
+    spectrum is calculated in blocks of windows, each block copied up to max_frequency, so detrended copy and full
+    spectrum of all windows are never allocated
+    """
+    workers = _workers if workers is None else workers
+    freq, scale = _periodogram_constants(windows.shape[-1], fs)
+    if max_frequency is None:
+        return freq, scale, _block_spectrum(windows, workers)
+
+    bins = np.searchsorted(freq, max_frequency, side='right')
+    if windows.ndim == 1:
+        return freq[:bins], scale[:bins], _block_spectrum(windows, workers)[:bins].copy()
+
+    spectrum = np.empty(windows.shape[:-1] + (bins,), dtype=np.complex128)
+    block = max(_block_bytes // (16 * windows.shape[-1]), 1)  # float64 copy and complex spectrum of each window
+    for index in np.ndindex(windows.shape[:-2]):
+        for start in range(0, windows.shape[-2], block):
+            block_spectrum = _block_spectrum(windows[index][start:start + block], workers)
+            spectrum[index][start:start + block] = block_spectrum[:, :bins]
+    return freq[:bins], scale[:bins], spectrum
+
+
+def _block_spectrum(windows, workers):
+    detrended = np.array(windows, dtype=np.float64)  # contiguous copy, windows are usually strided view of record
+    detrended -= np.mean(detrended, axis=-1, keepdims=True)
+    return fft.rfft(detrended, axis=-1, workers=workers, overwrite_x=True)
+
+
+def total_power(windows, fs):
+    """
+    Returns sum of periodogram (see periodogram) of each window over all bins, calculated without FFT: by Parseval's
+    theorem it is equal to sum of squared detrended window samples divided by sampling frequency
+    :param windows: numpy.ndarray - 2D array of windows, eg. view returned by moving_window_stride
+    :param fs: float - sampling frequency
+    :return: numpy.ndarray - total power of each window
+    """
+    return np.var(windows, axis=-1) * (windows.shape[-1] / fs)
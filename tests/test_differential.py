@@ -0,0 +1,75 @@
+import unittest
+
+import numpy
+
+from .. import differential
+from .. import features
+from ..feature_registry import get_feature
+from ..feature_result import window_kernel
+
+
+class DifferentialTests(unittest.TestCase):
+    def setUp(self):
+        self.signals = differential.differential_signals(300)
+        self.windowings = [(64, 32), (16, 5)]
+
+    def test_all_features_match_reference(self):
+        for kind in ['emg', 'force']:
+            summary = differential.check_differential(kind=kind, signals=self.signals, windowings=self.windowings,
+                                                      kernel_backends=['numpy'])
+            self.assertTrue(summary['passed'].all())
+        self.assertEqual(len(summary), 3)
+
+    def test_loop_kernels_match_reference(self):
+        summary = differential.check_differential(names=['ApEn', 'SampleEn', 'MDF', 'DPR', 'SMR', 'BC', 'PSDFD'],
+                                                  signals=self.signals, windowings=self.windowings,
+                                                  kernel_backends=['python'], executors=[])
+        self.assertEqual(list(summary.index), ['ApEn', 'SampleEn', 'MDF', 'DPR', 'SMR', 'BC', 'PSDFD'])
+
+    def test_threshold_lists_compared_threshold_by_threshold(self):
+        report = differential.run_differential(names=['WAMP'], signals=self.signals, windowings=self.windowings)
+        self.assertEqual(set(report['parameters']), {"{'threshold': 10}", "{'threshold': [0, 10, 20]}"})
+        self.assertTrue(report['passed'].all())
+
+    def test_detects_wrong_variant(self):
+        feature_info = get_feature('RMS')
+
+        @window_kernel
+        def rms_biased(values, window, step):
+            data, windows = features.feature_rms.kernel(values, window, step)
+            return data * (1 + 1e-6), windows
+
+        feature_info.variants['biased'] = rms_biased
+        try:
+            report = differential.run_differential(names=['RMS'], signals=self.signals, windowings=self.windowings,
+                                                   kernel_backends=['numpy'], executors=[])
+            with self.assertRaises(AssertionError):
+                differential.check_differential(names=['RMS'], signals=self.signals, windowings=self.windowings,
+                                                kernel_backends=['numpy'], executors=[])
+        finally:
+            del feature_info.variants['biased']
+
+        failed = report[~report['passed']]
+        self.assertEqual(set(failed['backend']), {'biased/numpy'})
+        self.assertEqual(set(failed['signal']), {'random', 'integer', 'constant', 'nan', 'segments'})  # not zeros
+        self.assertAlmostEqual(failed['max_rel_error'].max(), 1e-6)
+
+    def test_compare_outputs(self):
+        windows = numpy.arange(3)
+        expected = (numpy.array([1., numpy.nan, 100.]), windows)
+        comparison = differential.compare_outputs(expected, (numpy.array([1., numpy.nan, 100.001]), windows),
+                                                  atol=0, rtol=1e-4)
+        self.assertTrue(comparison['passed'])
+        self.assertAlmostEqual(comparison['max_rel_error'], 1e-5)
+
+        comparison = differential.compare_outputs(expected, (numpy.array([1., 2., 100.]), windows), atol=0, rtol=1)
+        self.assertFalse(comparison['passed'])
+        self.assertEqual(comparison['error'], 'missing values differ')
+
+        comparison = differential.compare_outputs(expected, (expected[0], windows + 1), atol=0, rtol=1)
+        self.assertFalse(comparison['passed'])
+        self.assertEqual(comparison['error'], 'windows differ')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from .. import feature_codec
+from ..feature_writer import FeatureWriter, read_features
+
+
+class FeatureCodecTests(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        length = 1000
+        self.frame = pandas.DataFrame({'RMS_1': rng.rand(length) * 100, 'WL_1': rng.randn(length) * 1e-3,
+                                       'TRAJ_GT': rng.randint(0, 8, length)})
+        self.frame.iloc[3, 0] = numpy.nan
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_precision(self):
+        columns = ['RMS_1', 'WL_1']
+        values = self.frame[columns].to_numpy()
+        ranges = numpy.nanmax(values, axis=0) - numpy.nanmin(values, axis=0)
+        for encoding, relative_to_range, tolerance in [('float32', False, 1e-7), ('float16', False, 1e-3),
+                                                      ('int16', True, 2e-5), ('int8', True, 5e-3)]:
+            encoded, params = feature_codec.encode_frame(self.frame, encoding, block_rows=300)
+            self.assertEqual(list(encoded.dtypes), [numpy.dtype(encoding)] * 2 + [self.frame['TRAJ_GT'].dtype])
+            self.assertEqual(len(params), 4 * 2)
+
+            decoded = feature_codec.decode_frame(encoded, params)
+            self.assertTrue(numpy.isnan(decoded.iloc[3, 0]))
+            numpy.testing.assert_array_equal(decoded['TRAJ_GT'], self.frame['TRAJ_GT'])
+            errors = numpy.abs(decoded[columns].to_numpy() - values)
+            scale = ranges if relative_to_range else numpy.abs(values)
+            self.assertLess(numpy.nanmax(errors / scale), tolerance, encoding)
+
+    def test_invalid_encoding(self):
+        with self.assertRaises(ValueError):
+            feature_codec.encode_frame(self.frame, 'int4')
+
+    def test_writer_round_trip(self):
+        file_formats = ['hdf5']
+        try:
+            import pyarrow  # noqa: F401
+            file_formats.append('arrow')
+        except ImportError:
+            pass
+        expected_codes, params = feature_codec.encode_frame(self.frame, {'RMS_1': 'int16', 'WL_1': 'float16'},
+                                                            block_rows=300)
+        expected = feature_codec.decode_frame(expected_codes, params)
+        for file_format in file_formats:
+            output_url = os.path.join(self.tmp_dir.name, 'features.' + file_format)
+            with FeatureWriter(output_url, file_format, codec={'RMS_1': 'int16', 'WL_1': 'float16'}) as writer:
+                for start in range(0, len(self.frame), 300):
+                    writer.write(self.frame.iloc[start:start + 300])
+            pandas.testing.assert_frame_equal(read_features(output_url, file_format), expected)
+            pandas.testing.assert_frame_equal(read_features(output_url, file_format, columns=['WL_1']),
+                                              expected[['WL_1']])
+
+    def test_codec_report(self):
+        rng = numpy.random.RandomState(0)
+        data = {}
+        for name in ['train', 'test']:
+            gesture = numpy.repeat([0, 1, 2], 100)
+            data[name] = pandas.DataFrame({'output_0': gesture,
+                                           'input_0_RMS_1': gesture + rng.randn(len(gesture)) * 0.1,
+                                           'input_0_RMS_2': -gesture + rng.randn(len(gesture)) * 0.1})
+        report = feature_codec.codec_report(data, ['RMS'], encodings=['float16', 'int8'])
+        self.assertEqual(list(report.index), ['float64', 'float16', 'int8'])
+        self.assertEqual(list(report['size_ratio']), [1., 4., 8.])
+        self.assertEqual(report.loc['float64', 'max_error'], 0.)
+        self.assertLess(report.loc['int8', 'max_error'], 5e-3)
+        self.assertLess(abs(report.loc['int8', 'accuracy_change']), 0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
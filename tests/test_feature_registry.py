@@ -0,0 +1,44 @@
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from ..feature_registry import get_feature, register_feature, registered_features
+
+
+class FeatureRegistryTests(unittest.TestCase):
+    def test_all_feature_functions_registered(self):
+        registered = {info.func for info in registered_features()}
+        for name in dir(features):
+            if name.startswith('feature_'):
+                self.assertIn(getattr(features, name), registered, name)
+
+    def test_lookup_is_case_insensitive(self):
+        self.assertIs(get_feature('apen'), get_feature('ApEn'))
+        self.assertEqual(get_feature('ApEn').complexity, 2)
+        self.assertTrue(get_feature('MNF').spectral)
+        self.assertEqual(get_feature('MAVSLP').lookback, 1)
+        self.assertEqual(get_feature('Mean', kind='force').func, features.force_feature_mean)
+
+    def test_unknown_feature(self):
+        with self.assertRaises(ValueError):
+            get_feature('NotAFeature')
+
+    def test_third_party_feature(self):
+        def feature_peak_to_peak(series, window, step):
+            windows_strided, indexes = features.biolab_utilities.moving_window_stride(series.values, window, step)
+            return pandas.Series(data=numpy.ptp(windows_strided, axis=1), index=series.index[indexes])
+
+        register_feature('P2P', replace=True, ns_per_sample=2)(feature_peak_to_peak)
+        record = pandas.DataFrame({'EMG_1': numpy.arange(10.)})
+        output = features.calculate_feature(record, 'P2P', window=4, step=2)
+        numpy.testing.assert_array_equal(output['P2P_1'].values, [3., 3., 3., 3.])
+        self.assertEqual(get_feature('P2P').cost(window=100, windows=10), 2000)
+
+        with self.assertRaises(ValueError):
+            register_feature('P2P')(feature_peak_to_peak)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from ..feature_result import FeatureResult, join_results
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="300" step="100" />
+    <emg_desc>
+        <feature name="MAVSLP" />
+        <feature name="AR" order="3" />
+        <feature name="ZC" threshold="0.1" />
+    </emg_desc>
+</features_calculation>
+"""
+
+
+class FeatureResultTests(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': rng.randn(4000), 'EMG_2': rng.randn(4000)},
+                                       index=numpy.arange(4000) / 5120.)
+        self.record['TRAJ_GT'] = numpy.arange(4000) // 1000
+
+    def pandas_join(self, names, **kwargs):
+        frame = pandas.DataFrame()
+        for name in names:
+            for column in ['EMG_1', 'EMG_2']:
+                feature = getattr(features, 'feature_' + name.lower())(self.record[column], 300, 100, **kwargs)
+                if isinstance(feature, pandas.Series):
+                    feature = feature.rename(name + '_' + column.split('_')[1])
+                else:
+                    feature = feature.add_prefix(name + '_' + column.split('_')[1] + '_')
+                frame = frame.join(feature, how='outer')
+        return frame
+
+    def test_to_pandas_equals_joined_features(self):
+        results = [features.calculate_feature(self.record, 'WAMP', window=300, step=100, threshold=0.5, verbose=False,
+                                              output='result'),
+                   features.calculate_feature(self.record, 'MAVSLP', window=300, step=100, verbose=False,
+                                              output='result')]
+        expected = self.pandas_join(['WAMP'], threshold=0.5).join(self.pandas_join(['MAVSLP']), how='outer')
+        output = join_results(results).to_pandas()
+        pandas.testing.assert_frame_equal(output, expected)
+        self.assertEqual(output['WAMP_1'].dtype, numpy.int64)
+
+    def test_multi_column_feature(self):
+        result = features.calculate_feature(self.record, 'AR', window=300, step=100, order=3, verbose=False,
+                                            output='result')
+        self.assertEqual(result.columns, ['AR_1_0', 'AR_1_1', 'AR_1_2', 'AR_2_0', 'AR_2_1', 'AR_2_2'])
+        pandas.testing.assert_frame_equal(result.to_pandas(), self.pandas_join(['AR'], order=3))
+
+    def test_raw_arrays(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            xml_file_url = os.path.join(tmp_dir, 'features.xml')
+            with open(xml_file_url, 'w') as xml_file:
+                xml_file.write(FEATURES_XML)
+            result = features.features_from_xml_on_df(xml_file_url, self.record, output='result')
+            frame = features.features_from_xml_on_df(xml_file_url, self.record)
+        self.assertEqual(result.values.shape, (len(frame), len(result.columns)))
+        numpy.testing.assert_array_equal(result.extra['TRAJ_GT'], frame['TRAJ_GT'].values)
+        pandas.testing.assert_frame_equal(result.to_pandas(), frame)
+
+    def test_arrow_export_shares_memory(self):
+        result = FeatureResult.from_feature(numpy.arange(10.), numpy.arange(10) * 2, 'RMS_1', self.record.index)
+        table = result.to_arrow()
+        self.assertEqual(table.column_names, ['RMS_1', '__index_level_0__'])
+        self.assertEqual(table.column(0).chunk(0).buffers()[1].address, result.values[:, 0].ctypes.data)
+        numpy.testing.assert_array_equal(table.column(1).to_numpy(), self.record.index[::2][:10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from ..feature_writer import read_features
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="200" step="50" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAVSLP" />
+        <feature name="AR" order="2" />
+        <feature name="MNF" />
+        <feature name="MDF" />
+    </emg_desc>
+</features_calculation>
+"""
+
+
+class FeatureWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+
+        rng = numpy.random.RandomState(0)
+        length = 3000
+        self.record = pandas.DataFrame({'EMG_1': rng.randn(length), 'EMG_2': rng.randn(length),
+                                        'TRAJ_1': numpy.arange(length) // 500,
+                                        'VIDEO_STAMP': numpy.arange(length)},
+                                       index=numpy.arange(length) / 5120.)
+        self.expected = features.features_from_xml_on_df(self.xml_file_url, self.record)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chunks_equal_single_pass(self):
+        chunked = pandas.concat(features.iter_features_from_xml_on_df(self.xml_file_url, self.record,
+                                                                      chunk_windows=7))
+        pandas.testing.assert_frame_equal(chunked, self.expected, check_dtype=False)
+
+    def test_hdf5_output(self):
+        output_url = os.path.join(self.tmp_dir.name, 'features.hdf5')
+        rows = features.features_from_xml_to_file(self.xml_file_url, self.record, output_url, chunk_windows=10)
+        self.assertEqual(rows, len(self.expected))
+        pandas.testing.assert_frame_equal(read_features(output_url), self.expected, check_dtype=False)
+
+    def test_arrow_output(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest('pyarrow not installed')
+        output_url = os.path.join(self.tmp_dir.name, 'features.arrow')
+        features.features_from_xml_to_file(self.xml_file_url, self.record, output_url, file_format='arrow',
+                                           chunk_windows=10)
+        pandas.testing.assert_frame_equal(read_features(output_url, file_format='arrow'), self.expected,
+                                          check_dtype=False)
+        pandas.testing.assert_frame_equal(read_features(output_url, file_format='arrow', columns=['RMS_1']),
+                                          self.expected[['RMS_1']], check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
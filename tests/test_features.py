@@ -0,0 +1,405 @@
+import math
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from .. import biolab_utilities
+from .. import features
+from .. import instrumentation
+from ..feature_registry import get_feature
+
+
+class CalculateInChunksTests(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': rng.randn(4000), 'EMG_2': rng.randn(4000)},
+                                       index=numpy.arange(4000) / 5120.)
+
+    def assert_threads_equal_serial(self, name, **kwargs):
+        expected = features.calculate_feature(self.record, name, window=300, step=100, verbose=False, **kwargs)
+        output = features.calculate_feature(self.record, name, window=300, step=100, threads=3, verbose=False,
+                                            **kwargs)
+        pandas.testing.assert_frame_equal(output, expected)
+
+    def test_threads_rms(self):
+        self.assert_threads_equal_serial('RMS')
+
+    def test_threads_mavslp(self):
+        self.assert_threads_equal_serial('MAVSLP')
+
+    def test_threads_ar(self):
+        self.assert_threads_equal_serial('AR', order=3)
+
+    def test_threads_spectral(self):
+        self.assert_threads_equal_serial('DPR', band=[35, 600], n=13)
+
+    def test_single_chunk(self):
+        series = self.record['EMG_1'].iloc[:350]
+        output = features.calculate_in_chunks(get_feature('MAV'), series, window=300, step=100, threads=2)
+        pandas.testing.assert_series_equal(output, features.feature_mav(series, 300, 100))
+
+
+MULTI_WINDOWING_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="200" step="50" />
+    <windowing window="500" step="100" />
+    <emg_desc>
+        <feature name="IAV" />
+        <feature name="RMS" />
+        <feature name="DASDV" />
+        <feature name="WAMP" threshold="1" />
+        <feature name="MNF" />
+    </emg_desc>
+</features_calculation>
+"""
+
+
+class MultiWindowingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.record = pandas.DataFrame({'EMG_1': numpy.random.RandomState(0).randn(3000) * 100,
+                                        'TRAJ_1': numpy.zeros(3000)}, index=numpy.arange(3000) / 5120.)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_xml(self, name, content):
+        xml_file_url = os.path.join(self.tmp_dir.name, name)
+        with open(xml_file_url, 'w') as xml_file:
+            xml_file.write(content)
+        return xml_file_url
+
+    def test_frame_per_windowing(self):
+        output = features.features_from_xml_on_df_multi(self.write_xml('multi.xml', MULTI_WINDOWING_XML),
+                                                        self.record)
+        self.assertEqual(list(output.keys()), [(200, 50), (500, 100)])
+
+        for window, step in output:
+            single_xml = MULTI_WINDOWING_XML.replace('    <windowing window="200" step="50" />\n', '')\
+                .replace('window="500" step="100"', 'window="{:d}" step="{:d}"'.format(window, step))
+            expected = features.features_from_xml_on_df(self.write_xml('single.xml', single_xml), self.record)
+            pandas.testing.assert_frame_equal(output[(window, step)], expected, check_dtype=False, rtol=1e-10)
+
+    def test_shared_signals_of_freed_arrays(self):
+        rng = numpy.random.RandomState(0)
+        with features.shared_signals():
+            for _ in range(10):  # temporary arrays of the same size are likely allocated at the same address
+                values = rng.randn(3000)
+                expected = features.feature_rms.kernel(values, 200, 50)[0]
+                output = features._feature_rms_prefix.kernel(values, 200, 50)[0]
+                numpy.testing.assert_allclose(output, expected, rtol=1e-10)
+                del values
+
+
+class MemoryBudgetTests(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': rng.randn(4000), 'EMG_2': rng.randn(4000)},
+                                       index=numpy.arange(4000) / 5120.)
+        instrumentation.clear_events()
+
+    def tearDown(self):
+        features.set_memory_budget(None)
+
+    def assert_budget_equal_unlimited(self, name, **kwargs):
+        expected = features.calculate_feature(self.record, name, window=300, step=100, verbose=False, **kwargs)
+        features.set_memory_budget(get_feature(name).memory(300, 10))
+        output = features.calculate_feature(self.record, name, window=300, step=100, verbose=False, **kwargs)
+        pandas.testing.assert_frame_equal(output, expected)
+
+        events = instrumentation.get_events('chunking')
+        self.assertEqual(len(events), 2)  # one for each channel
+        self.assertLessEqual(events[0]['memory'], events[0]['memory_budget'])
+        self.assertEqual(events[0]['chunks'], math.ceil(events[0]['windows'] / events[0]['chunk_windows']))
+
+    def test_budget_rms(self):
+        self.assert_budget_equal_unlimited('RMS')
+
+    def test_budget_mavslp(self):
+        self.assert_budget_equal_unlimited('MAVSLP')
+
+    def test_budget_ar(self):
+        self.assert_budget_equal_unlimited('AR', order=3)
+
+    def test_budget_not_exceeded(self):
+        features.set_memory_budget(10 ** 9)
+        features.calculate_feature(self.record, 'RMS', window=300, step=100, verbose=False)
+        self.assertEqual(instrumentation.get_events(), [])
+
+    def test_listener(self):
+        received = []
+        instrumentation.add_listener(received.append)
+        try:
+            instrumentation.record_event('test', value=1)
+        finally:
+            instrumentation.remove_listener(received.append)
+        self.assertEqual(received[0]['value'], 1)
+        self.assertEqual(instrumentation.get_events('test'), received)
+
+
+BATCH_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="300" step="100" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAVSLP" />
+        <feature name="ZC" threshold="0.5" />
+        <feature name="AR" order="3" />
+        <feature name="MDF" />
+    </emg_desc>
+    <force_desc>
+        <force_feature name="Mean" />
+    </force_desc>
+    <cross_desc>
+        <cross_feature name="CORR" />
+        <cross_feature name="COH" bands="[[20, 500]]" />
+    </cross_desc>
+</features_calculation>
+"""
+
+
+class BatchTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'batch.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(BATCH_XML)
+
+        rng = numpy.random.RandomState(0)
+        self.records = [pandas.DataFrame({'EMG_1': rng.randn(length), 'EMG_2': rng.randn(length),
+                                          'FORCE_1': rng.rand(length), 'TRAJ_GT': rng.randint(0, 3, length)},
+                                         index=numpy.arange(length) / 5120.)
+                        for length in [1000, 350, 399, 2057, 300]]
+
+    def tearDown(self):
+        features.set_memory_budget(None)
+        self.tmp_dir.cleanup()
+
+    def assert_batch_equal_serial(self):
+        outputs = features.features_from_xml_on_dfs(self.xml_file_url, self.records)
+        self.assertEqual(len(outputs), len(self.records))
+        for record, output in zip(self.records, outputs):
+            expected = features.features_from_xml_on_df(self.xml_file_url, record)
+            pandas.testing.assert_frame_equal(output, expected, rtol=1e-12)
+
+    def test_batch_equal_serial(self):
+        self.assert_batch_equal_serial()
+
+    def test_batch_within_memory_budget(self):
+        features.set_memory_budget(get_feature('AR').memory(300, 15))
+        self.assert_batch_equal_serial()
+
+    def test_calculate_feature_batch(self):
+        outputs = features.calculate_feature_batch(self.records, 'MAVSLP', window=300, step=100)
+        for record, output in zip(self.records, outputs):
+            expected = features.calculate_feature(record, 'MAVSLP', window=300, step=100, verbose=False)
+            pandas.testing.assert_frame_equal(output, expected)
+
+
+class ShardTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'shard.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(BATCH_XML)
+
+        rng = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': rng.randn(4321), 'EMG_2': rng.randn(4321),
+                                        'FORCE_1': rng.rand(4321), 'TRAJ_GT': rng.randint(0, 3, 4321)},
+                                       index=numpy.arange(4321) / 5120.)
+        self.expected = features.features_from_xml_on_df(self.xml_file_url, self.record)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_threads_equal_serial(self):
+        output = features.features_from_xml_on_df_sharded(self.xml_file_url, self.record, shards=5, workers=2,
+                                                          executor='thread')
+        pandas.testing.assert_frame_equal(output, self.expected, rtol=1e-12)
+
+    def test_processes_equal_serial(self):
+        output = features.features_from_xml_on_df_sharded(self.xml_file_url, self.record, shards=3, workers=2)
+        pandas.testing.assert_frame_equal(output, self.expected, rtol=1e-12)
+
+    def test_more_shards_than_windows(self):
+        output = features.features_from_xml_on_df_sharded(self.xml_file_url, self.record.iloc[:650], shards=8,
+                                                          workers=2, executor='thread')
+        expected = features.features_from_xml_on_df(self.xml_file_url, self.record.iloc[:650])
+        pandas.testing.assert_frame_equal(output, expected, rtol=1e-12)
+
+    def test_record_shorter_than_window(self):
+        record = self.record.iloc[:200]
+        expected = features.features_from_xml_on_df(self.xml_file_url, record)
+        self.assertEqual(len(expected), 0)
+        for executor in ['thread', 'process']:
+            output = features.features_from_xml_on_df_sharded(self.xml_file_url, record, shards=3, workers=2,
+                                                              executor=executor)
+            pandas.testing.assert_frame_equal(output, expected)
+
+    def test_lookback_across_shard_boundaries(self):
+        # single window shards, so MAVSLP of every window but the first depends on window of preceding shard
+        for length in [300, 399, 400, 1234]:
+            record = self.record.iloc[:length]
+            expected = features.features_from_xml_on_df(self.xml_file_url, record)
+            for shards in [2, len(expected), len(expected) + 3]:
+                with self.subTest(length=length, shards=shards):
+                    output = features.features_from_xml_on_df_sharded(self.xml_file_url, record, shards=shards,
+                                                                      workers=2, executor='thread')
+                    pandas.testing.assert_frame_equal(output, expected, rtol=1e-12)
+
+
+class CrossFeatureTests(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        common = rng.randn(3000)
+        self.record = pandas.DataFrame({'EMG_' + str(i): common * i + rng.randn(3000) for i in range(1, 5)},
+                                       index=numpy.arange(3000) / 5120.)
+        self.windows = numpy.lib.stride_tricks.sliding_window_view(self.record.values, 500, axis=0)[::200]
+
+    def tearDown(self):
+        features.set_memory_budget(None)
+
+    def test_corr_cov(self):
+        corr = features.calculate_cross_feature(self.record, 'CORR', window=500, step=200, verbose=False)
+        cov = features.calculate_cross_feature(self.record, 'COV', window=500, step=200, verbose=False)
+        self.assertEqual(list(corr.columns), ['CORR_1_2', 'CORR_1_3', 'CORR_1_4', 'CORR_2_3', 'CORR_2_4', 'CORR_3_4'])
+        pandas.testing.assert_index_equal(corr.index, self.record.index[499::200])
+        rows, cols = numpy.triu_indices(4, 1)
+        numpy.testing.assert_allclose(corr.values, [numpy.corrcoef(w)[rows, cols] for w in self.windows], rtol=1e-12)
+        numpy.testing.assert_allclose(cov.values, [numpy.cov(w, bias=True)[rows, cols] for w in self.windows],
+                                      rtol=1e-12)
+
+    def test_coh_equal_scipy(self):
+        from scipy import signal
+
+        coh = features.calculate_cross_feature(self.record, 'COH', window=500, step=200, bands=[[20, 200], [200, 900]],
+                                               verbose=False)
+        self.assertEqual(len(coh.columns), 2 * 6)
+        for band, (low, high) in enumerate([[20, 200], [200, 900]]):
+            freq, expected = signal.coherence(self.windows[:, 1], self.windows[:, 3], fs=5120, window='boxcar',
+                                              nperseg=125, noverlap=0)
+            expected = expected[:, (freq > low) & (freq < high)].mean(axis=1)
+            numpy.testing.assert_allclose(coh['COH_' + str(band) + '_2_4'], expected, rtol=1e-10)
+
+    def test_ibs_equal_pyeeg(self):
+        from ..pyeeg import pyeeg
+
+        record = self.record.round()  # equal samples and word counts, ranked in order of words
+        ibs = features.calculate_cross_feature(record, 'IBS', window=500, step=200, n=3, verbose=False)
+        windows = numpy.lib.stride_tricks.sliding_window_view(record.values, 500, axis=0)[::200]
+        expected = [[pyeeg.information_based_similarity(w[i], w[j], 3) for i in range(4) for j in range(i + 1, 4)]
+                    for w in windows]
+        numpy.testing.assert_allclose(ibs.values, expected, rtol=1e-12)
+
+    def test_chunks_within_memory_budget(self):
+        expected = features.calculate_cross_feature(self.record, 'COH', window=500, step=200, bands=[[20, 500]],
+                                                    verbose=False)
+        features.set_memory_budget(get_feature('COH', kind='cross').memory(500, 4 * 3))
+        output = features.calculate_cross_feature(self.record, 'COH', window=500, step=200, bands=[[20, 500]],
+                                                  verbose=False)
+        pandas.testing.assert_frame_equal(output, expected)
+
+
+class ThresholdSweepTests(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': numpy.round(rng.randn(3000) * 4) / 2, 'EMG_2': rng.randn(3000)},
+                                       index=numpy.arange(3000) / 5120.)
+        self.thresholds = [0.5, 0, 2, 0.5, -1]
+
+    def assert_columns_equal_single(self, name, variant=None):
+        output = features.calculate_feature(self.record, name, window=300, step=100, threshold=self.thresholds,
+                                            variant=variant, verbose=False)
+        for i, threshold in enumerate(self.thresholds):
+            expected = features.calculate_feature(self.record, name, window=300, step=100, threshold=threshold,
+                                                  variant=variant, verbose=False)
+            for channel in ['1', '2']:
+                numpy.testing.assert_array_equal(output[name + '_' + channel + '_' + str(i)],
+                                                 expected[name + '_' + channel])
+
+    def test_wamp(self):
+        self.assert_columns_equal_single('WAMP')
+        self.assert_columns_equal_single('WAMP', variant='prefix')
+
+    def test_myop(self):
+        self.assert_columns_equal_single('MYOP')
+        self.assert_columns_equal_single('MYOP', variant='prefix')
+
+    def test_ssc(self):
+        self.assert_columns_equal_single('SSC')
+
+    def test_zc(self):
+        self.assert_columns_equal_single('ZC')
+
+    def test_zc_equal_per_window(self):
+        values = self.record['EMG_1'].values
+        windows_strided, _ = biolab_utilities.moving_window_stride(values, 300, 70)
+        expected = [numpy.sum(numpy.diff(x[(x < -0.5) | (x > 0.5)] > 0)) for x in windows_strided]
+        numpy.testing.assert_array_equal(features.feature_zc.kernel(values, 300, 70, 0.5)[0], expected)
+
+    def test_zc_threshold_list(self):
+        values = self.record['EMG_1'].values
+        thresholds = [0.5, 0., 1e9, 0.1]
+        expected = numpy.column_stack([features.feature_zc.kernel(values, 300, 70, t)[0] for t in thresholds])
+        numpy.testing.assert_array_equal(features.feature_zc.kernel(values, 300, 70, thresholds)[0], expected)
+
+
+FUSED_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="300" step="100" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAVSLP" />
+        <feature name="MAV1" />
+        <feature name="MTW" windowslope="0.25" />
+        <feature name="WAMP" threshold="[0.5, 1]" />
+        <feature name="AR" order="3" />
+        <feature name="MNF" />
+    </emg_desc>
+    <force_desc>
+        <force_feature name="Mean" />
+    </force_desc>
+</features_calculation>
+"""
+
+
+class FusedTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'fused.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FUSED_XML)
+
+        rng = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': rng.randn(5000), 'EMG_2': rng.randn(5000),
+                                        'FORCE_1': rng.rand(5000), 'TRAJ_GT': rng.randint(0, 3, 5000)},
+                                       index=numpy.arange(5000) / 5120.)
+        self.expected = features.features_from_xml_on_df(self.xml_file_url, self.record)
+        instrumentation.clear_events()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_blocks_equal_serial(self):
+        output = features.features_from_xml_on_df_fused(self.xml_file_url, self.record,
+                                                        cache_bytes=get_feature('MTW').memory(300, 7))
+        pandas.testing.assert_frame_equal(output, self.expected, rtol=1e-12)
+
+        event = instrumentation.get_events('fused_execution')[0]
+        self.assertEqual(event['block_windows'], 7)
+        self.assertEqual(event['blocks'], math.ceil(48 / 7))
+        self.assertEqual(event['features'], ['RMS', 'MAVSLP', 'MAV1', 'MTW', 'WAMP', 'Mean'])
+        self.assertAlmostEqual(event['bandwidth'], event['record_bytes'] / event['seconds'])
+        self.assertEqual(event['record_bytes'], self.record.filter(regex=r"EMG_\d+|FORCE_\d+").values.nbytes)
+        self.assertGreater(event['window_throughput'], event['bandwidth'])  # windows overlap
+
+    def test_single_block(self):
+        output = features.features_from_xml_on_df_fused(self.xml_file_url, self.record)
+        pandas.testing.assert_frame_equal(output, self.expected, rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from .. import kernels
+
+
+class KernelBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.backend = kernels.get_backend()
+        rng = numpy.random.RandomState(0)
+        self.x = rng.randn(300)
+        self.series = pandas.Series(rng.randn(3000) * 50, index=numpy.arange(3000) / 5120.)
+
+    def tearDown(self):
+        kernels.set_backend(self.backend)
+
+    def for_each_backend(self, func):
+        kernels.set_backend('numpy')
+        expected = func()
+        for backend in kernels.available_backends():
+            with self.subTest(backend=backend):
+                kernels.set_backend(backend)
+                numpy.testing.assert_allclose(func(), expected, rtol=1e-10)
+
+    def test_ap_entropy(self):
+        self.for_each_backend(lambda: kernels.ap_entropy(self.x, 2, 0.2))
+
+    def test_samp_entropy(self):
+        self.for_each_backend(lambda: kernels.samp_entropy(self.x, 2, 0.2))
+
+    def test_entropy_constant_signal(self):
+        self.for_each_backend(lambda: kernels.ap_entropy(numpy.ones(50), 2, 0.2))
+
+    def test_permutation_entropy(self):
+        self.for_each_backend(lambda: kernels.permutation_entropy(self.x, 4, 1))
+        self.for_each_backend(lambda: kernels.permutation_entropy(numpy.round(self.x), 3, 2))
+
+    def test_hfd(self):
+        self.for_each_backend(lambda: kernels.hfd(self.x, 6))
+
+    def test_hurst(self):
+        self.for_each_backend(lambda: kernels.hurst(self.x))
+
+    def test_box_counting_feature(self):
+        self.for_each_backend(lambda: features.feature_bc(self.series.iloc[:600], 256, 128, 3, 5).values)
+
+    def test_spectral_features(self):
+        self.for_each_backend(lambda: features.feature_mdf(self.series, 64, 32).values)
+        self.for_each_backend(lambda: features.feature_dpr(self.series, 500, 250, [35, 600], 13).values)
+        self.for_each_backend(lambda: features.feature_smr(self.series, 500, 250, 13).values)
+
+    @unittest.skipIf('numba' not in kernels.available_backends(), 'Numba is not installed')
+    def test_failed_compilation_falls_back_to_numpy(self):
+        kernels.set_backend('numpy')
+        expected = [kernels.ap_entropy(self.x, 2, 0.2), kernels.samp_entropy(self.x, 2, 0.2), kernels.hfd(self.x, 6)]
+
+        def fail(*args):
+            raise kernels.numba.core.errors.TypingError('failed')
+
+        kernels.set_backend('numba')
+        compiled = dict(kernels._compiled)
+        try:
+            for name in ['_match_counts_loop', '_hfd_curve_loop']:
+                kernels._compiled[name] = fail
+            with self.assertWarns(UserWarning):
+                result = [kernels.ap_entropy(self.x, 2, 0.2), kernels.samp_entropy(self.x, 2, 0.2),
+                          kernels.hfd(self.x, 6)]
+            numpy.testing.assert_allclose(result, expected, rtol=1e-10)
+            self.assertIsNone(kernels._compiled['_match_counts_loop'])
+        finally:
+            kernels._compiled.clear()
+            kernels._compiled.update(compiled)
+
+    @unittest.skipIf('numba' not in kernels.available_backends(), 'Numba is not installed')
+    def test_unloadable_disk_cache(self):
+        kernels.set_backend('numpy')
+        expected = kernels.hfd(self.x, 6)
+
+        def fail(*args):
+            raise ModuleNotFoundError("No module named 'package'")
+
+        kernels.set_backend('numba')
+        compiled, uncached = dict(kernels._compiled), set(kernels._uncached)
+        try:
+            kernels._compiled['_hfd_curve_loop'] = fail
+            with self.assertWarnsRegex(UserWarning, 'disk cache'):
+                numpy.testing.assert_allclose(kernels.hfd(self.x, 6), expected, rtol=1e-10)
+            self.assertIsNotNone(kernels._compiled['_hfd_curve_loop'])  # compiled again without disk cache
+
+            kernels._compiled['_hfd_curve_loop'] = fail
+            with self.assertWarnsRegex(UserWarning, 'using NumPy'):
+                numpy.testing.assert_allclose(kernels.hfd(self.x, 6), expected, rtol=1e-10)
+            self.assertIsNone(kernels._compiled['_hfd_curve_loop'])
+        finally:
+            kernels._compiled.clear()
+            kernels._compiled.update(compiled)
+            kernels._uncached.clear()
+            kernels._uncached.update(uncached)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            kernels.set_backend('cuda')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+
+import numpy
+import pandas
+
+from .. import biolab_utilities
+from .. import features
+from .. import metrics
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="256" step="128" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAV1" />
+    </emg_desc>
+    <force_desc>
+        <force_feature name="Mean" />
+    </force_desc>
+</features_calculation>
+"""
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+        random_state = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': random_state.randn(2048), 'EMG_2': random_state.randn(2048),
+                                        'FORCE_1': random_state.randn(2048), 'TRAJ_GT': numpy.zeros(2048)})
+        metrics.reset_metrics()
+
+    def tearDown(self):
+        metrics.reset_metrics()
+        self.tmp_dir.cleanup()
+
+    def test_extraction_counters(self):
+        features.features_from_xml_on_df(self.xml_file_url, self.record)
+        features.features_from_xml_on_df_fused(self.xml_file_url, self.record)
+        self.assertEqual(metrics.RECORDS.get(), 2)
+        self.assertEqual(metrics.SAMPLES.get(stage='features'), 2 * 3 * 2048)
+        self.assertEqual(metrics.WINDOWS.get(feature='RMS'), 2 * 2 * 15)
+        self.assertEqual(metrics.WINDOWS.get(feature='Mean'), 2 * 15)
+        self.assertEqual(metrics.FEATURE_SECONDS.count(feature='MAV1'), 2)
+
+    def test_filter_counters(self):
+        record = self.record[['EMG_1', 'EMG_2']].set_index(numpy.arange(2048) / 5120.)
+        biolab_utilities.apply_filter(record)
+        self.assertEqual(metrics.SAMPLES.get(stage='filter'), 2 * 2048)
+        self.assertEqual(metrics.FILTER_SECONDS.count(), 2)
+
+    def test_cache_counters(self):
+        with features.shared_signals():
+            features.calculate_feature(self.record, 'RMS', window=256, step=128, variant='prefix', verbose=False)
+            features.calculate_feature(self.record, 'RMS', window=512, step=128, variant='prefix', verbose=False)
+        self.assertEqual(metrics.CACHE_MISSES.get(cache='shared_signals'), 2)  # one per channel
+        self.assertEqual(metrics.CACHE_HITS.get(cache='shared_signals'), 2)
+
+        hits = metrics.CACHE_HITS.get(cache='window_weights')
+        features.calculate_feature(self.record, 'MAV1', window=256, step=128, verbose=False)
+        self.assertGreaterEqual(metrics.CACHE_HITS.get(cache='window_weights'), hits + 1)
+
+    def test_text_format(self):
+        features.calculate_feature(self.record, 'RMS', window=256, step=128, verbose=False)
+        lines = metrics.generate_metrics().splitlines()
+        self.assertIn('# TYPE putemg_feature_seconds histogram', lines)
+        self.assertIn('putemg_windows_total{feature="RMS"} 30', lines)
+        self.assertIn('putemg_feature_seconds_bucket{feature="RMS",le="+Inf"} 1', lines)
+        self.assertIn('putemg_feature_seconds_count{feature="RMS"} 1', lines)
+        self.assertIn('putemg_records_total 0', lines)
+
+        buckets = [int(line.split()[-1]) for line in lines if line.startswith('putemg_feature_seconds_bucket')]
+        self.assertEqual(buckets, sorted(buckets))
+
+    def test_file_and_http_export(self):
+        features.calculate_feature(self.record, 'RMS', window=256, step=128, verbose=False)
+        metrics_file_url = os.path.join(self.tmp_dir.name, 'putemg.prom')
+        metrics.write_metrics(metrics_file_url)
+        with open(metrics_file_url) as metrics_file:
+            self.assertIn('putemg_windows_total{feature="RMS"} 30', metrics_file.read())
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['features.xml', 'putemg.prom'])  # no temporary
+
+        server = metrics.start_http_server(port=0)
+        try:
+            host, port = server.server_address[:2]
+            with urllib.request.urlopen('http://{:s}:{:d}/metrics'.format(host, port)) as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.assertIn('putemg_windows_total{feature="RMS"} 30', response.read().decode('utf-8'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from .. import profiling
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="256" step="128" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="ApEn" m="2" r="0.2" />
+    </emg_desc>
+    <force_desc>
+        <force_feature name="Mean" />
+    </force_desc>
+</features_calculation>
+"""
+
+
+class ProfilingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+        self.profile_dir = os.path.join(self.tmp_dir.name, 'profiles')
+        random_state = numpy.random.RandomState(0)
+        self.record = pandas.DataFrame({'EMG_1': random_state.randn(1024), 'EMG_2': random_state.randn(1024),
+                                        'FORCE_1': random_state.randn(1024)})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_profile_file_per_feature(self):
+        expected = features.features_from_xml_on_df(self.xml_file_url, self.record)
+        output = features.features_from_xml_on_df(self.xml_file_url, self.record, profile_dir=self.profile_dir)
+        pandas.testing.assert_frame_equal(output, expected)
+        self.assertIsNone(profiling.get_profile_dir())
+
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), ['ApEn.prof', 'FORCE_Mean.prof', 'RMS.prof'])
+        stats = pstats.Stats(os.path.join(self.profile_dir, 'ApEn.prof')).stats
+        # both channels are merged into feature profile, 7 windows each
+        calls = {function: stat[1] for (_, _, function), stat in stats.items()}
+        self.assertEqual(calls['ap_entropy'], 14)
+
+    def test_summary_sorted_by_self_time(self):
+        with profiling.profile_features(self.profile_dir):
+            features.calculate_feature(self.record, 'ApEn', window=256, step=128, m=2, r=0.2, verbose=False)
+            features.calculate_feature(self.record, 'ApEn', window=256, step=128, m=2, r=0.2, verbose=False)
+
+        summary = profiling.profile_summary(self.profile_dir, top=5)
+        self.assertEqual(set(summary['feature']), {'ApEn'})
+        self.assertEqual(len(summary), 5)
+        self.assertTrue((numpy.diff(summary['self_seconds'].values) <= 0).all())
+        self.assertTrue((summary['cumulative_seconds'] >= summary['self_seconds']).all())
+        self.assertIn('ap_entropy', ' '.join(profiling.profile_summary(self.profile_dir, top=100)['function']))
+
+
+if __name__ == '__main__':
+    unittest.main()
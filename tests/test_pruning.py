@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import numpy
+import pandas
+
+from .. import pruning
+from ..biolab_utilities import Record
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="300" step="100" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAV" />
+        <feature name="Kurt" />
+    </emg_desc>
+</features_calculation>
+"""
+
+
+class PruningTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+
+        # RMS separates gestures, MAV duplicates it, Kurt is noise
+        rng = numpy.random.RandomState(0)
+        self.dfs = {}
+        for i, date in enumerate(['2018-01-01', '2018-01-02']):
+            record = Record('emg_gestures-01-repeats_long-' + date + '-10-00-00-000.hdf5')
+            gesture = numpy.repeat([0, 1, 2, 0], 50)
+            df = pandas.DataFrame({'TRAJ_GT': gesture, 'TRAJ_1': gesture, 'type': record.type, 'subject': record.id,
+                                   'trajectory': record.trajectory, 'date_time': date, 'VIDEO_STAMP': 0})
+            for channel in ['1', '2']:
+                df['RMS_' + channel] = gesture + rng.randn(len(gesture)) * 0.1
+                df['MAV_' + channel] = df['RMS_' + channel] * 0.8
+                df['Kurt_' + channel] = rng.randn(len(gesture))
+            self.dfs[record] = df
+        records = list(self.dfs.keys())
+        self.s = {'train': records[:1], 'test': records[1:]}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_pareto_front(self):
+        mask = pruning.pareto_front([3, 2, 2, 1], [0.9, 0.9, 0.8, 0.5])
+        numpy.testing.assert_array_equal(mask, [False, True, False, True])
+
+    def test_prune_keeps_cheapest_informative_feature(self):
+        output_xml_url = os.path.join(self.tmp_dir.name, 'pruned.xml')
+        selected, path, marginal = pruning.prune_features(self.xml_file_url, output_xml_url, self.dfs, self.s,
+                                                          [0, 1, 2], {'RMS': 1.0, 'MAV': 2.0, 'Kurt': 3.0},
+                                                          verbose=False)
+        self.assertEqual(selected, ['RMS'])
+        self.assertEqual(len(path), 3)
+        self.assertEqual(list(marginal.index), ['RMS', 'MAV', 'Kurt'])
+        self.assertEqual([e.attrib['name'] for e in ET.parse(output_xml_url).getroot().iter('feature')], ['RMS'])
+        self.assertEqual(len(list(ET.parse(output_xml_url).getroot().iter('windowing'))), 1)
+
+    def test_feature_costs(self):
+        record = pandas.DataFrame({'EMG_1': numpy.random.RandomState(0).randn(3000)})
+        costs = pruning.feature_costs(self.xml_file_url, record, repeat=1)
+        self.assertEqual(list(costs.keys()), ['RMS', 'MAV', 'Kurt'])
+        self.assertTrue(all(cost > 0 for cost in costs.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+from scipy import signal
+
+from .. import features
+from ..biolab_utilities import prepare_pipeline
+from ..realtime import LatencyHistogram, RealTimeRecognizer, RingBuffer, ScheduledFeatureExtractor, \
+    StreamingFeatureExtractor, StreamingFilter, replay_hdf5
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="256" step="128" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAVSLP" />
+        <feature name="WL" />
+    </emg_desc>
+    <cross_desc>
+        <cross_feature name="CORR" />
+    </cross_desc>
+</features_calculation>
+"""
+
+
+class RealTimeTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+
+        rng = numpy.random.RandomState(0)
+        gesture = numpy.repeat([0, 1, 2, 0, 1, 2], 1500)
+        self.record = pandas.DataFrame({'EMG_1': rng.randn(len(gesture)) * (1 + gesture),
+                                        'EMG_2': rng.randn(len(gesture)) * (1 + 2 * gesture)},
+                                       index=numpy.arange(len(gesture)) / 5120.)
+        self.record['TRAJ_GT'] = gesture
+
+        self.offline = features.features_from_xml_on_df(self.xml_file_url, self.record).dropna()
+        inputs = self.offline.drop(columns='TRAJ_GT')
+        self.pipeline = prepare_pipeline(inputs.iloc[:, ::-1], self.offline['TRAJ_GT'], 'LDA')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_ring_buffer(self):
+        buffer = RingBuffer(5, 1)
+        for chunk in [[0, 1, 2], [3, 4, 5, 6], [7]]:
+            buffer.extend(numpy.array(chunk, dtype=float)[:, numpy.newaxis])
+        numpy.testing.assert_array_equal(buffer.latest(4)[:, 0], [4, 5, 6, 7])
+        buffer.extend(numpy.arange(10, 20, dtype=float)[:, numpy.newaxis])
+        numpy.testing.assert_array_equal(buffer.latest(5)[:, 0], [15, 16, 17, 18, 19])
+
+    def test_streaming_filter_independent_of_chunks(self):
+        data = numpy.random.RandomState(1).randn(3000, 2)
+        streaming = StreamingFilter(2)
+        output = numpy.concatenate([streaming.process(data[i:i + 100]) for i in range(0, len(data), 100)])
+        numpy.testing.assert_allclose(output, signal.sosfilt(StreamingFilter(2).sos, data, axis=0), atol=1e-10)
+
+    def test_predictions_equal_offline(self):
+        recognizer = RealTimeRecognizer(self.xml_file_url, self.pipeline, channels=2, median_filter=1)
+        outputs = []
+        emg = self.record[['EMG_1', 'EMG_2']].values
+        for start in range(0, len(emg), 100):
+            outputs.extend(recognizer.process(emg[start:start + 100]))
+
+        self.assertEqual([sample for sample, _, _ in outputs],
+                         list(self.record.index.get_indexer(self.offline.index)))
+        expected = self.pipeline.predict(self.offline.drop(columns='TRAJ_GT').iloc[:, ::-1])
+        numpy.testing.assert_array_equal([raw for _, raw, _ in outputs], expected)
+        numpy.testing.assert_array_equal([filtered for _, _, filtered in outputs], expected)
+        self.assertEqual(recognizer.latency['total'].count, len(outputs))
+
+    def test_replay(self):
+        hdf5_file_url = os.path.join(self.tmp_dir.name, 'record.hdf5')
+        self.record.to_hdf(hdf5_file_url, 'data', format='table')
+        recognizer = RealTimeRecognizer(self.xml_file_url, self.pipeline, channels=2,
+                                        preprocessing=StreamingFilter(2))
+        predictions = replay_hdf5(hdf5_file_url, recognizer, chunk_size=512, speed=None, verbose=False)
+        self.assertEqual(len(predictions), len(self.offline))
+        self.assertEqual(list(predictions.columns), ['raw', 'filtered', 'TRAJ_GT'])
+        report = recognizer.latency_report()
+        self.assertEqual(report.loc['total', 'count'], len(predictions))
+        self.assertLessEqual(report.loc['total', 'deadline_misses'], len(predictions))
+
+    def test_rejects_not_window_local_features(self):
+        xml_file_url = os.path.join(self.tmp_dir.name, 'mdf.xml')
+        with open(xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML.replace('<feature name="WL" />', '<feature name="MDF" />'))
+        with self.assertRaisesRegex(ValueError, 'MDF'):
+            StreamingFeatureExtractor(xml_file_url, channels=2)
+        with self.assertRaisesRegex(ValueError, 'MDF'):
+            ScheduledFeatureExtractor(xml_file_url, channels=2, budget=0.025)
+        with self.assertRaisesRegex(ValueError, 'MDF'):
+            RealTimeRecognizer(xml_file_url, self.pipeline, channels=2, feature_budget=0.025)
+
+    def test_schedule_within_budget(self):
+        emg = self.record[['EMG_1', 'EMG_2']].values
+        extractor = ScheduledFeatureExtractor(self.xml_file_url, channels=2, budget=0.025, priorities={'RMS': 1},
+                                              costs={'RMS': 0.01, 'MAVSLP': 0.01, 'WL': 0.01, 'CORR': 0.01},
+                                              max_decimation=4, smoothing=0)
+        self.assertEqual(extractor.decimation[0], 1)  # RMS is never decimated before other features
+        self.assertTrue(all(d > 1 for d in extractor.decimation[1:]))
+        loads = [sum(cost for cost, d, phase in zip(extractor.costs, extractor.decimation, extractor.phases)
+                     if d and (slot - phase) % d == 0) for slot in range(4)]
+        self.assertLessEqual(max(loads), 0.025)
+
+        samples, values = extractor.process(emg)
+        expected = StreamingFeatureExtractor(self.xml_file_url, channels=2).process(emg)[1]
+        self.assertEqual(len(samples), len(expected))
+        for i, (d, phase) in enumerate(zip(extractor.decimation, extractor.phases)):
+            columns = extractor._slices[i]
+            for window in range(len(samples)):  # value of the last window feature was calculated in is held
+                calculated = max([w for w in range(window + 1) if w == 0 or (d and (w - phase) % d == 0)])
+                numpy.testing.assert_array_equal(values[window, columns], expected[calculated, columns])
+        self.assertEqual(extractor.schedule_report()['calculated'].iloc[0], len(samples))
+
+    def test_schedule_skips_and_reports_deadline_misses(self):
+        extractor = ScheduledFeatureExtractor(self.xml_file_url, channels=2, budget=1e-9, smoothing=0,
+                                              costs={'RMS': 1, 'MAVSLP': 1, 'WL': 1, 'CORR': 1})
+        self.assertEqual(extractor.decimation, [0, 0, 0, 0])
+        samples, values = extractor.process(self.record[['EMG_1', 'EMG_2']].values[:2000])
+        numpy.testing.assert_array_equal(values, values[[0] * len(values)])  # first window is held
+        self.assertEqual(extractor.deadline_misses, len(samples))
+
+        recognizer = RealTimeRecognizer(self.xml_file_url, self.pipeline, channels=2, feature_budget=10.0)
+        recognizer.process(self.record[['EMG_1', 'EMG_2']].values)
+        report = recognizer.latency_report()
+        self.assertEqual(report.loc['features', 'deadline_ms'], 10000)
+        self.assertEqual(report.loc['features', 'deadline_misses'], 0)
+
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram()
+        for latency in numpy.linspace(0.001, 0.1, 100):
+            histogram.record(latency)
+        self.assertAlmostEqual(histogram.percentile(50), 0.05, delta=0.007)
+        self.assertEqual(histogram.percentile(100), 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
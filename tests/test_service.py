@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from ..feature_client import FeatureClient
+from ..feature_service import FeatureService
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="256" step="128" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAVSLP" />
+        <feature name="WL" />
+    </emg_desc>
+</features_calculation>
+"""
+
+
+class FeatureServiceTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+
+        self.record = pandas.DataFrame(numpy.random.RandomState(0).randn(5000, 2), columns=['EMG_1', 'EMG_2'])
+        self.offline = features.features_from_xml_on_df(xml_file_url, self.record)
+        self.service = FeatureService(max_workers=2, queue_size=2)
+
+    def tearDown(self):
+        self.service.close()
+        self.tmp_dir.cleanup()
+
+    def _stream(self, client_factory, start_server):
+        async def run():
+            server = await start_server()
+            async with server:
+                client = await client_factory(server)
+                columns = await client.configure(FEATURES_XML, channels=2)
+                emg = self.record.values
+                chunks = [emg[i:i + 300] for i in range(0, len(emg), 300)]
+
+                async def send_all():  # sends ahead of receiving, blocked by backpressure
+                    for chunk in chunks:
+                        await client.send(chunk)
+
+                sending = asyncio.ensure_future(send_all())
+                rows = [await client.receive() for _ in chunks]
+                await sending
+                await client.close()
+            return columns, rows
+
+        return asyncio.run(run())
+
+    def _check_rows(self, columns, rows):
+        samples = numpy.concatenate([s for s, _ in rows])
+        values = numpy.concatenate([v for _, v in rows])
+        expected = self.offline.loc[samples, columns]
+        self.assertEqual(samples[0], 256 + 128 - 1)
+        self.assertEqual(len(samples), self.offline['MAVSLP_1'].notna().sum())
+        numpy.testing.assert_allclose(values, expected.values, rtol=1e-12)
+
+    def test_unix_socket_rows_equal_offline(self):
+        path = os.path.join(self.tmp_dir.name, 'service.sock')
+        columns, rows = self._stream(lambda server: FeatureClient.open_unix(path),
+                                     lambda: self.service.start_unix(path))
+        self._check_rows(columns, rows)
+
+    def test_tcp_rows_equal_offline(self):
+        columns, rows = self._stream(lambda server: FeatureClient.open_tcp(*server.sockets[0].getsockname()[:2]),
+                                     lambda: self.service.start_tcp())
+        self._check_rows(columns, rows)
+
+    def test_invalid_config_returns_error(self):
+        async def run():
+            server = await self.service.start_tcp()
+            async with server:
+                client = await FeatureClient.open_tcp(*server.sockets[0].getsockname()[:2])
+                with self.assertRaisesRegex(RuntimeError, 'NOPE'):
+                    await client.configure(FEATURES_XML.replace('"WL"', '"NOPE"'), channels=2)
+
+        asyncio.run(run())
+        self.assertEqual(self.service.sessions, 0)
+
+    def test_not_window_local_feature_returns_error(self):
+        async def run():
+            server = await self.service.start_tcp()
+            async with server:
+                client = await FeatureClient.open_tcp(*server.sockets[0].getsockname()[:2])
+                with self.assertRaisesRegex(RuntimeError, 'ValueError: MDF'):
+                    await client.configure(FEATURES_XML.replace('"WL"', '"MDF"'), channels=2)
+
+        asyncio.run(run())
+        self.assertEqual(self.service.sessions, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import tracemalloc
+import unittest
+
+import numpy
+from scipy import signal
+
+from .. import spectrum
+from ..biolab_utilities import moving_window_stride
+
+
+class PeriodogramTests(unittest.TestCase):
+    def setUp(self):
+        self.data = numpy.random.RandomState(0).randn(5000) * 100 + 20
+
+    def assert_equal_to_scipy(self, window, step):
+        windows_strided, _ = moving_window_stride(self.data, window, step)
+        freq_expected, power_expected = signal.periodogram(windows_strided, 5120)
+        freq, power = spectrum.periodogram(windows_strided, 5120)
+        numpy.testing.assert_allclose(freq, freq_expected, rtol=1e-12)
+        numpy.testing.assert_allclose(power, power_expected, rtol=1e-9, atol=1e-12 * power_expected.max())
+
+    def test_even_window(self):
+        self.assert_equal_to_scipy(500, 250)
+
+    def test_odd_window(self):
+        self.assert_equal_to_scipy(333, 100)
+
+    def test_single_thread(self):
+        windows_strided, _ = moving_window_stride(self.data, 256, 128)
+        _, power = spectrum.periodogram(windows_strided, 5120)
+        _, power_single = spectrum.periodogram(windows_strided, 5120, workers=1)
+        numpy.testing.assert_array_equal(power, power_single)
+
+    def test_input_not_modified(self):
+        windows_strided, _ = moving_window_stride(self.data, 256, 128)
+        copy = windows_strided.copy()
+        spectrum.periodogram(windows_strided, 5120)
+        numpy.testing.assert_array_equal(windows_strided, copy)
+
+    def test_band_limited(self):
+        windows_strided, _ = moving_window_stride(self.data, 500, 250)
+        freq_full, power_full = spectrum.periodogram(windows_strided, 5120)
+        freq, power = spectrum.periodogram(windows_strided, 5120, max_frequency=600)
+        self.assertEqual(freq[-1], freq_full[freq_full <= 600][-1])
+        numpy.testing.assert_array_equal(power, power_full[:, :len(freq)])
+
+    def test_band_limited_spectrum_in_blocks(self):
+        windows = numpy.random.RandomState(1).randn(3, 2000, 200)
+        freq_full, spectrum_full = spectrum.window_spectrum(windows, 5120)
+        freq, spectrum_limited = spectrum.window_spectrum(windows, 5120, max_frequency=600)
+        numpy.testing.assert_array_equal(spectrum_limited, spectrum_full[..., :len(freq)])
+        freq, spectrum_single = spectrum.window_spectrum(windows[0, 0], 5120, max_frequency=600)
+        numpy.testing.assert_array_equal(spectrum_single, spectrum_full[0, 0, :len(freq)])
+
+    def test_band_limited_peak_memory(self):
+        windows_strided, _ = moving_window_stride(numpy.random.RandomState(1).randn(200000), 500, 50)
+
+        def peak(**kwargs):
+            tracemalloc.start()
+            try:
+                spectrum.periodogram(windows_strided, 5120, **kwargs)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        # full spectrum of all windows is never allocated, only bins up to 600 Hz (12% of bins)
+        self.assertLess(peak(max_frequency=600), peak() / 2)
+
+    def test_total_power(self):
+        for window in [500, 333]:
+            windows_strided, _ = moving_window_stride(self.data, window, 100)
+            _, power = spectrum.periodogram(windows_strided, 5120)
+            numpy.testing.assert_allclose(spectrum.total_power(windows_strided, 5120), numpy.sum(power, axis=1),
+                                          rtol=1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from .. import tuning
+from ..feature_registry import get_feature
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="256" step="128" />
+    <windowing window="1024" step="128" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MTW" windowslope="0.25" />
+        <feature name="Kurt" />
+    </emg_desc>
+</features_calculation>
+"""
+
+
+class TuningTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+        self.tuning_file_url = os.path.join(self.tmp_dir.name, 'tuning.json')
+
+    def tearDown(self):
+        tuning.clear_tuning()
+        self.tmp_dir.cleanup()
+
+    def test_calibrate_and_load(self):
+        timings = tuning.calibrate(self.xml_file_url, tuning_file_url=self.tuning_file_url, length=8192, repeat=1)
+        self.assertEqual(set(timings.keys()), {'256:128', '1024:128'})
+        self.assertEqual(set(timings['256:128'].keys()), {'RMS', 'MTW'})  # Kurt has single implementation
+
+        with open(self.tuning_file_url) as tuning_file:
+            saved = json.load(tuning_file)
+        tuning.clear_tuning()
+        self.assertIsNone(tuning.tuned_variant('RMS', 256, 128))
+
+        tuning.load_tuning(self.tuning_file_url)
+        for windowing, variants in saved['variants'].items():
+            window, step = map(int, windowing.split(':'))
+            for name, variant in variants.items():
+                self.assertEqual(tuning.tuned_variant(name, window, step), variant)
+                self.assertIn(variant, get_feature(name).variants)
+
+    def test_tuned_variant_used(self):
+        record = pandas.DataFrame({'EMG_1': numpy.random.RandomState(0).randn(4096)})
+        expected = features.calculate_feature(record, 'MTW', window=256, step=128, windowslope=0.25, verbose=False)
+        tuning.calibrate(self.xml_file_url, record=record, repeat=1)
+        output = features.calculate_feature(record, 'MTW', window=256, step=128, windowslope=0.25, verbose=False)
+        pandas.testing.assert_frame_equal(output, expected, rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
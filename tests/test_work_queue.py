@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import numpy
+import pandas
+
+from .. import features
+from ..feature_writer import read_features
+from ..work_queue import LeaseQueue, features_from_xml_queue
+
+
+FEATURES_XML = """<?xml version="1.0"?>
+<features_calculation>
+    <windowing window="256" step="128" />
+    <emg_desc>
+        <feature name="RMS" />
+        <feature name="MAVSLP" />
+        <feature name="MDF" />
+    </emg_desc>
+</features_calculation>
+"""
+
+
+class LeaseQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_dir = os.path.join(self.tmp_dir.name, 'queue')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_claim_is_exclusive(self):
+        first = LeaseQueue(self.queue_dir, worker_id='first')
+        second = LeaseQueue(self.queue_dir, worker_id='second')
+        self.assertEqual(first.claim(['a', 'b']), 'a')
+        self.assertEqual(second.claim(['a', 'b']), 'b')
+        self.assertIsNone(second.claim(['a', 'b']))
+
+    def test_completed_item_is_not_claimed_again(self):
+        queue = LeaseQueue(self.queue_dir, worker_id='first')
+        queue.claim(['a'])
+        queue.complete('a', output='a.hdf5')
+        self.assertTrue(queue.is_done('a'))
+        self.assertIsNone(LeaseQueue(self.queue_dir, worker_id='second').claim(['a']))
+        with open(os.path.join(self.queue_dir, 'done', 'a.json')) as done_file:
+            self.assertEqual(json.load(done_file)['output'], 'a.hdf5')
+
+    def test_expired_lease_is_taken_over(self):
+        crashed = LeaseQueue(self.queue_dir, worker_id='crashed', lease_seconds=0.05)
+        crashed.claim(['a'])
+        other = LeaseQueue(self.queue_dir, worker_id='other', lease_seconds=0.05)
+        self.assertIsNone(other.claim(['a']))
+        time.sleep(0.1)
+        self.assertEqual(other.claim(['a']), 'a')
+        self.assertFalse(crashed.renew('a'))
+        self.assertIsNone(LeaseQueue(self.queue_dir, worker_id='third').claim(['a']))
+
+    def test_failed_item_is_released(self):
+        queue = LeaseQueue(self.queue_dir, worker_id='first')
+
+        def fail(item):
+            raise RuntimeError(item)
+
+        with self.assertRaises(RuntimeError):
+            queue.run(['a'], fail)
+        self.assertEqual(queue.run(['a'], lambda item: None), ['a'])
+
+
+class FeaturesQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.xml_file_url = os.path.join(self.tmp_dir.name, 'features.xml')
+        with open(self.xml_file_url, 'w') as xml_file:
+            xml_file.write(FEATURES_XML)
+
+        random = numpy.random.RandomState(0)
+        self.record_urls = []
+        for name in ['emg_gestures-01-sequential-2018-01-01-10-00-00-000',
+                     'emg_gestures-02-sequential-2018-01-01-10-00-00-000']:
+            record = pandas.DataFrame(random.randn(4096, 2) * 100, columns=['EMG_1', 'EMG_2'])
+            record['TRAJ_GT'] = 0
+            url = os.path.join(self.tmp_dir.name, name + '.hdf5')
+            record.to_hdf(url, 'data', format='table')
+            self.record_urls.append(url)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_workers_share_records(self):
+        output_dir = os.path.join(self.tmp_dir.name, 'out')
+        queue_dir = os.path.join(self.tmp_dir.name, 'queue')
+
+        first = features_from_xml_queue(self.xml_file_url, self.record_urls, output_dir, queue_dir, worker_id='first')
+        second = features_from_xml_queue(self.xml_file_url, self.record_urls, output_dir, queue_dir,
+                                         worker_id='second')
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second, [])
+
+        for url in self.record_urls:
+            output_url = os.path.join(output_dir, os.path.basename(url))
+            self.assertEqual(len(pandas.read_hdf(output_url)), 4096 // 128 - 1)
+        self.assertEqual(sorted(os.listdir(output_dir)), sorted(map(os.path.basename, self.record_urls)))
+
+    def test_chunked_output_equals_whole_record(self):
+        output_dir = os.path.join(self.tmp_dir.name, 'out')
+        queue_dir = os.path.join(self.tmp_dir.name, 'queue')
+        features_from_xml_queue(self.xml_file_url, self.record_urls, output_dir, queue_dir, chunk_windows=5)
+
+        for url in self.record_urls:
+            expected = features.features_from_xml_on_df(self.xml_file_url, pandas.read_hdf(url))
+            output = read_features(os.path.join(output_dir, os.path.basename(url)))
+            pandas.testing.assert_frame_equal(output, expected, check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
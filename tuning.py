@@ -0,0 +1,134 @@
+import json
+import os
+import platform
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from . import biolab_utilities
+from . import differential
+from .feature_registry import get_feature
+from .reference import reference_kernel
+
+__all__ = ["calibrate", "load_tuning", "save_tuning", "clear_tuning", "tuned_variant"]
+
+
+# Fastest feature variant for each windowing configuration, {"window:step": {"feature name": "variant"}}
+_tuning: Dict[str, Dict[str, str]] = {}
+
+
+def _windowing_key(window, step):
+    return "{:d}:{:d}".format(window, step)
+
+
+def tuned_variant(name: str, window: int, step: int):
+    """
+    Returns fastest variant of given feature for given windowing configuration, as selected by calibrate
+    :param name: string - feature name
+    :param window: int - window size
+    :param step: int - step lenght
+    :return: string - variant name, None if feature was not calibrated for given windowing
+    """
+    return _tuning.get(_windowing_key(window, step), {}).get(name.lower())
+
+
+def clear_tuning():
+    _tuning.clear()
+
+
+def load_tuning(tuning_file_url: str):
+    """
+    Loads tuning file written by calibrate, selected variants are used by calculate_feature unless other variant is
+    requested explicitly. Tuning file given by PUTEMG_TUNING_FILE environment variable is loaded at import.
+    :param tuning_file_url: string - url to JSON tuning file
+    """
+    with open(tuning_file_url) as tuning_file:
+        tuning = json.load(tuning_file)
+    for windowing, variants in tuning['variants'].items():
+        _tuning.setdefault(windowing, {}).update({name.lower(): variant for name, variant in variants.items()})
+
+
+def save_tuning(tuning_file_url: str, timings: Dict = None):
+    """
+    Saves currently selected variants to JSON tuning file
+    :param tuning_file_url: string - url to JSON tuning file
+    :param timings: Dict - benchmark results stored for reference
+    """
+    with open(tuning_file_url, 'w') as tuning_file:
+        json.dump({'machine': platform.node(), 'processor': platform.processor(),
+                   'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'variants': _tuning, 'timings': timings or {}}, tuning_file, indent=2)
+
+
+def calibrate(xml_file_url, record: pd.DataFrame = None, tuning_file_url: str = None, length: int = 51200,
+              repeat: int = 5, rtol: float = None):
+    """
+    Micro-benchmarks all variants of each feature of given XML config, for each of its windowing configurations, on
+    current machine. Variants with output differing from reference implementation (see differential) by more than
+    feature tolerance, or from default implementation for features without reference implementation, are rejected.
+    Fastest variants are selected for following calculate_feature calls, and optionally saved to tuning file, see
+    load_tuning.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param record: pandas.DataFrame - record to benchmark on (first EMG channel is used), random signal if None
+    :param tuning_file_url: string - url to JSON tuning file to write, not saved if None
+    :param length: int - length of random signal
+    :param repeat: int - number of measurements of each variant, minimum is taken
+    :param rtol: float - relative tolerance of variant output, tolerance of feature in differential.TOLERANCES if
+    None
+    :return: Dict - {"window:step": {"feature name": {"variant": best time in seconds}}}
+    """
+    if record is None:
+        series = pd.Series(np.random.RandomState(0).randn(length) * 100)
+    else:
+        series = record.filter(regex=r"EMG_\d+").iloc[:, 0]
+
+    xml_root = ET.parse(xml_file_url).getroot()
+
+    timings = {}
+    for windowing_entry in xml_root.iter('windowing'):
+        windowing_options = biolab_utilities.convert_types_in_dict(windowing_entry.attrib)
+        window, step = windowing_options['window'], windowing_options['step']
+        windowing_timings = timings.setdefault(_windowing_key(window, step), {})
+
+        for xml_entry in xml_root.iter('feature'):
+            attrib = biolab_utilities.convert_types_in_dict(xml_entry.attrib)
+            feature_info = get_feature(attrib.pop('name'))
+            if len(feature_info.variants) < 2:
+                continue
+
+            atol, feature_rtol = differential.feature_tolerance(feature_info.name)
+            expected = None
+            if reference_kernel(feature_info.name, feature_info.kind) is not None:
+                expected = differential.reference_output(feature_info, series.values, window, step, **attrib)
+            variant_timings = {}
+            for variant, func in feature_info.variants.items():
+                best = np.inf
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    output = func(series, window=window, step=step, **attrib)
+                    best = min(best, time.perf_counter() - start)
+                output = (output.values, series.index.get_indexer(output.index))
+                if expected is None:
+                    expected = output
+                elif not differential.compare_outputs(expected, output, atol,
+                                                      rtol if rtol is not None else feature_rtol)['passed']:
+                    continue
+                variant_timings[variant] = best
+
+            windowing_timings[feature_info.name] = variant_timings
+            if not variant_timings:
+                continue
+            _tuning.setdefault(_windowing_key(window, step), {})[feature_info.name.lower()] = \
+                min(variant_timings, key=variant_timings.get)
+
+    if tuning_file_url is not None:
+        save_tuning(tuning_file_url, timings)
+
+    return timings
+
+
+if os.environ.get('PUTEMG_TUNING_FILE'):
+    load_tuning(os.environ['PUTEMG_TUNING_FILE'])
@@ -0,0 +1,225 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from typing import List
+
+import pandas as pd
+
+__all__ = ["LeaseQueue", "features_from_xml_queue"]
+
+
+class LeaseQueue:
+    """
+    Work queue shared by workers on multiple machines through directory on shared filesystem (or local directory).
+    Each work item is claimed with lease file created atomically (O_CREAT | O_EXCL), lease is renewed by heartbeat
+    while item is processed. Lease not renewed before its expiration (eg. after node crash) is taken over by another
+    worker by creating lease of next generation, so only one of competing workers can succeed. Completed items are
+    marked with checkpoint files and never claimed again, so restarted workers resume where they stopped.
+    Expiration is based on wall clock time, clocks of all machines should be synchronised.
+    Directory layout:
+    leases/<item>.<generation>.lease - JSON with worker id and expiration time
+    done/<item>.json - checkpoint of completed item, JSON with worker id, result and processing time
+    """
+
+    def __init__(self, queue_dir: str, worker_id: str = None, lease_seconds: float = 600):
+        """
+        :param queue_dir: string - url to queue directory, created if missing
+        :param worker_id: string - unique worker identifier, hostname and process id by default
+        :param lease_seconds: float - lease duration, should be much longer than heartbeat period of lease_seconds/3
+        """
+        self.queue_dir = queue_dir
+        self.worker_id = worker_id or "{:s}-{:d}".format(socket.gethostname(), os.getpid())
+        self.lease_seconds = lease_seconds
+
+        self._leases_dir = os.path.join(queue_dir, 'leases')
+        self._done_dir = os.path.join(queue_dir, 'done')
+        os.makedirs(self._leases_dir, exist_ok=True)
+        os.makedirs(self._done_dir, exist_ok=True)
+
+        self._generations = {}  # generation of leases held by this worker
+
+    def _lease_path(self, item, generation):
+        return os.path.join(self._leases_dir, "{:s}.{:d}.lease".format(item, generation))
+
+    def _done_path(self, item):
+        return os.path.join(self._done_dir, item + '.json')
+
+    def _current_generation(self, item):
+        pattern = re.compile("^" + re.escape(item) + r"\.([0-9]+)\.lease$")
+        generations = [int(m.group(1)) for m in map(pattern.match, os.listdir(self._leases_dir)) if m]
+        return max(generations) if generations else None
+
+    def _lease_content(self):
+        return json.dumps({'worker': self.worker_id, 'expires': time.time() + self.lease_seconds})
+
+    def is_done(self, item: str) -> bool:
+        return os.path.exists(self._done_path(item))
+
+    def claim(self, items: List[str]):
+        """
+        Claims first item of given list which is not completed and not leased by other worker
+        :param items: List[str] - item names, valid as file names
+        :return: string - claimed item, None if no item is available
+        """
+        for item in items:
+            if self.is_done(item):
+                continue
+
+            generation = self._current_generation(item)
+            if generation is None:
+                generation = 0
+            else:
+                try:
+                    with open(self._lease_path(item, generation)) as lease_file:
+                        lease = json.load(lease_file)
+                except (OSError, ValueError):
+                    continue  # lease is being created or renewed
+                if lease['expires'] > time.time():
+                    continue
+                generation += 1  # take over expired lease
+
+            try:
+                fd = os.open(self._lease_path(item, generation), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue  # other worker was first
+            with os.fdopen(fd, 'w') as lease_file:
+                lease_file.write(self._lease_content())
+
+            if self.is_done(item):  # completed by previous lease holder in the meantime
+                self.release(item, generation)
+                continue
+
+            self._generations[item] = generation
+            return item
+        return None
+
+    def renew(self, item: str) -> bool:
+        """
+        Extends lease of claimed item
+        :param item: string - claimed item
+        :return: bool - False if lease was taken over by other worker
+        """
+        generation = self._generations[item]
+        if self._current_generation(item) != generation:
+            return False
+        lease_path = self._lease_path(item, generation)
+        tmp_path = lease_path + '.' + self.worker_id + '.tmp'
+        with open(tmp_path, 'w') as lease_file:
+            lease_file.write(self._lease_content())
+        os.replace(tmp_path, lease_path)
+        return True
+
+    def release(self, item: str, generation: int = None):
+        """
+        Releases lease of claimed item without completing it, so it can be claimed again
+        :param item: string - claimed item
+        """
+        if generation is None:
+            generation = self._generations.pop(item)
+        for g in range(generation + 1):
+            try:
+                os.remove(self._lease_path(item, g))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, item: str, **checkpoint):
+        """
+        Marks claimed item as completed with checkpoint file and removes its leases
+        :param item: string - claimed item
+        :param checkpoint: additional checkpoint entries, eg. output file url
+        """
+        if self._current_generation(item) != self._generations[item]:
+            warnings.warn("Lease of " + item + " was taken over by other worker before completion")
+        tmp_path = self._done_path(item) + '.' + self.worker_id + '.tmp'
+        with open(tmp_path, 'w') as done_file:
+            json.dump(dict(checkpoint, worker=self.worker_id, completed=time.time()), done_file)
+        os.replace(tmp_path, self._done_path(item))
+        self.release(item)
+
+    @contextmanager
+    def heartbeat(self, item: str):
+        """
+        Context renewing lease of claimed item every lease_seconds/3 in background thread
+        :param item: string - claimed item
+        """
+        stop = threading.Event()
+
+        def renew_periodically():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.renew(item):
+                    warnings.warn("Lease of " + item + " was taken over by other worker")
+                    return
+
+        thread = threading.Thread(target=renew_periodically, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def run(self, items: List[str], func):
+        """
+        Claims and processes items until all are completed or leased by other workers. Item is released if func
+        raises exception.
+        :param items: List[str] - item names
+        :param func: function - called with item name, returns dictionary stored in item checkpoint
+        :return: List[str] - items completed by this worker
+        """
+        completed = []
+        while True:
+            item = self.claim(items)
+            if item is None:
+                return completed
+
+            start = time.time()
+            try:
+                with self.heartbeat(item):
+                    checkpoint = func(item) or {}
+            except BaseException:
+                self.release(item)
+                raise
+            self.complete(item, elapsed=time.time() - start, **checkpoint)
+            completed.append(item)
+
+
+def features_from_xml_queue(xml_file_url, hdf5_file_urls: List[str], output_dir: str, queue_dir: str,
+                            worker_id: str = None, lease_seconds: float = 600, file_format: str = 'hdf5',
+                            chunk_windows: int = 1000, codec=None):
+    """
+    Calculates features defined in given XML file for putEMG records shared between workers with LeaseQueue. Can be
+    run on many machines with the same arguments, each record is processed once, and remaining records are processed
+    after restart. Output of each record is written to temporary file first and moved to <output_dir>/<record name>
+    when complete, so partially written outputs are never visible.
+    :param xml_file_url: string - url to XML file containing feature descriptors
+    :param hdf5_file_urls: List[str] - urls to putEMG hdf5 record files
+    :param output_dir: string - url to output directory on shared filesystem
+    :param queue_dir: string - url to queue directory on shared filesystem, see LeaseQueue
+    :param worker_id: string - unique worker identifier, see LeaseQueue
+    :param lease_seconds: float - lease duration, see LeaseQueue
+    :param file_format: string - 'hdf5' or 'arrow', see FeatureWriter
+    :param chunk_windows: int - maximum number of windows calculated and written at once
+    :param codec: string or Dict[str, str] - encoding of stored feature columns, see FeatureWriter
+    :return: List[str] - records processed by this worker
+    """
+    from .features import features_from_xml_to_file
+
+    os.makedirs(output_dir, exist_ok=True)
+    record_urls = {os.path.splitext(os.path.basename(url))[0]: url for url in hdf5_file_urls}
+    queue = LeaseQueue(queue_dir, worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def process_record(item):
+        output_url = os.path.join(output_dir, item + ('.hdf5' if file_format == 'hdf5' else '.arrow'))
+        tmp_url = output_url + '.' + queue.worker_id + '.tmp'
+        record: pd.DataFrame = pd.read_hdf(record_urls[item])
+        rows = features_from_xml_to_file(xml_file_url, record, tmp_url, file_format=file_format,
+                                         chunk_windows=chunk_windows, codec=codec)
+        os.replace(tmp_url, output_url)
+        return {'output': output_url, 'rows': rows}
+
+    return queue.run(list(record_urls.keys()), process_record)